@@ -1,7 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import mysql.connector
+import database
 from typing import Dict, Optional
+from app_shell import build_styles
+from repositories import car_repository
+from offline_store import SAVED_OFFLINE_MESSAGE, SyncConflict, is_connection_error, offline_store
 
 class AddCarWindow:
     def __init__(self, root: tk.Tk):
@@ -61,15 +65,9 @@ class AddCarWindow:
 
     def create_styles(self):
         """Create and configure widget styles."""
+        # Entries use the shared style
+        build_styles()
         style = ttk.Style()
-        
-        # Entry style
-        style.configure(
-            'Custom.TEntry',
-            fieldbackground='white',
-            foreground='black',  # Changed to black for better visibility
-            borderwidth=1
-        )
 
         # Combobox style
         style.configure(
@@ -305,6 +303,12 @@ class AddCarWindow:
             command=command
         )
 
+    def refresh(self):
+        """Reset the form for a new entry."""
+        for name in ('brand', 'model', 'plate', 'year', 'price'):
+            getattr(self, f"{name}_field").delete(0, 'end')
+        self.color_field.set("اختر لون السيارة")
+
     def on_entry_click(self, event, placeholder):
         """Handle entry field focus in."""
         pass  # Remove placeholder handling
@@ -333,21 +337,19 @@ class AddCarWindow:
             year = int(year)
             price = float(price)
 
+            if offline_store.offline:
+                self.add_car_offline(brand, model, plate, color, year, price)
+                return
+
             # Connect to database
             with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
                 # Check if plate number already exists
-                cursor.execute("SELECT id FROM cars WHERE plate = %s", (plate,))
-                if cursor.fetchone():
+                if car_repository.find_by_plate(conn, plate):
                     self.show_error("خطأ", "رقم اللوحة موجود مسبقاً")
                     return
 
                 # Insert new car
-                cursor.execute("""
-                    INSERT INTO cars (brand, model, plate, color, year, price, available, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, TRUE, 'متوفرة')
-                """, (brand, model, plate, color, year, price))
+                car_repository.add(conn, brand, model, plate, color, year, price)
                 
                 conn.commit()
                 self.show_success("تمت إضافة السيارة بنجاح")
@@ -356,21 +358,32 @@ class AddCarWindow:
         except ValueError:
             self.show_error("خطأ في البيانات", "يرجى التأكد من صحة السنة والسعر")
         except mysql.connector.Error as err:
-            self.show_error("خطأ في قاعدة البيانات", f"فشل إضافة السيارة: {err}")
+            if is_connection_error(err):
+                offline_store.mark_offline()
+                self.add_car_offline(brand, model, plate, color, year, price)
+            else:
+                self.show_error("خطأ في قاعدة البيانات", f"فشل إضافة السيارة: {err}")
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ غير متوقع: {e}")
 
+    def add_car_offline(self, brand: str, model: str, plate: str, color: str, year: int, price: float):
+        """Queue the car locally while the server is unreachable."""
+        try:
+            offline_store.add_car(brand, model, plate, color, year, price)
+        except SyncConflict as conflict:
+            self.show_error("خطأ", str(conflict))
+            return
+        self.show_success(SAVED_OFFLINE_MESSAGE)
+        self.root.destroy()
+
     def get_db_connection(self) -> mysql.connector.MySQLConnection:
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection()
         except mysql.connector.Error as err:
-            self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
+            # An unreachable server is handled by switching to offline mode
+            if not is_connection_error(err):
+                self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
 
     def show_error(self, title: str, message: str):
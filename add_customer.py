@@ -1,7 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import mysql.connector
+import database
 from typing import Dict, Optional
+from repositories import customer_repository
+from offline_store import SAVED_OFFLINE_MESSAGE, SyncConflict, is_connection_error, offline_store
 
 class AddCustomerWindow:
     def __init__(self, root: tk.Tk):
@@ -62,15 +65,6 @@ class AddCustomerWindow:
     def create_styles(self):
         """Create and configure widget styles."""
         style = ttk.Style()
-        
-        # Entry style
-        style.configure(
-            'Custom.TEntry',
-            fieldbackground=self.colors['surface_dark'],
-            foreground=self.colors['text'],
-            borderwidth=1,
-            relief='solid'
-        )
 
         # Combobox style
         style.configure(
@@ -183,6 +177,7 @@ class AddCustomerWindow:
         form_inner.pack(fill='both', expand=True, padx=40, pady=30)
 
         # Create form fields with increased spacing
+        self.placeholders = {}
         fields = [
             ("الاسم الكامل", "أدخل اسم العميل", 'name', 'entry'),
             ("رقم الهوية", "أدخل رقم الهوية", 'id', 'entry'),
@@ -277,6 +272,7 @@ class AddCustomerWindow:
                 insertbackground=self.colors['text']  # Cursor color
             )
             field.insert(0, placeholder)
+            self.placeholders[field_name] = placeholder
             field.bind('<FocusIn>', lambda e: self.on_entry_click(e, placeholder))
             field.bind('<FocusOut>', lambda e: self.on_entry_leave(e, placeholder))
             field.bind('<Key>', lambda e: self.on_entry_key(e, placeholder))
@@ -317,6 +313,14 @@ class AddCustomerWindow:
         
         return button
 
+    def refresh(self):
+        """Reset the form for a new entry."""
+        for name, placeholder in self.placeholders.items():
+            field = getattr(self, f"{name}_field")
+            field.delete(0, 'end')
+            field.insert(0, placeholder)
+            field.configure(fg=self.colors['text_secondary'])
+
     def on_entry_click(self, event, placeholder):
         """Handle entry field focus in."""
         if event.widget.get() == placeholder:
@@ -350,43 +354,54 @@ class AddCustomerWindow:
             self.show_error("بيانات ناقصة", "يرجى ملء الحقول الإلزامية (الاسم، رقم الهوية، رقم الهاتف)")
             return
 
+        values = (name, id_number, phone, email, address, license_number)
         try:
+            if offline_store.offline:
+                self.add_customer_offline(*values)
+                return
+
             # Connect to database
             with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
                 # Check if ID number already exists
-                cursor.execute("SELECT id FROM customers WHERE national_id = %s", (id_number,))
-                if cursor.fetchone():
+                if customer_repository.find_by_national_id(conn, id_number):
                     self.show_error("خطأ", "رقم الهوية موجود مسبقاً")
                     return
 
                 # Insert new customer
-                cursor.execute("""
-                    INSERT INTO customers (name, national_id, phone, email, address, license_number)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (name, id_number, phone, email, address, license_number))
+                customer_repository.add(conn, *values)
                 
                 conn.commit()
                 self.show_success("تمت إضافة العميل بنجاح")
                 self.root.destroy()
 
         except mysql.connector.Error as err:
-            self.show_error("خطأ في قاعدة البيانات", f"فشل إضافة العميل: {err}")
+            if is_connection_error(err):
+                offline_store.mark_offline()
+                self.add_customer_offline(*values)
+            else:
+                self.show_error("خطأ في قاعدة البيانات", f"فشل إضافة العميل: {err}")
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ غير متوقع: {e}")
 
+    def add_customer_offline(self, name: str, id_number: str, phone: str, email: str, address: str,
+                             license_number: str):
+        """Queue the customer locally while the server is unreachable."""
+        try:
+            offline_store.add_customer(name, id_number, phone, email, address, license_number)
+        except SyncConflict as conflict:
+            self.show_error("خطأ", str(conflict))
+            return
+        self.show_success(SAVED_OFFLINE_MESSAGE)
+        self.root.destroy()
+
     def get_db_connection(self) -> mysql.connector.MySQLConnection:
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection()
         except mysql.connector.Error as err:
-            self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
+            # An unreachable server is handled by switching to offline mode
+            if not is_connection_error(err):
+                self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
 
     def show_error(self, title: str, message: str):
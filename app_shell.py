@@ -0,0 +1,152 @@
+import importlib
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, Tuple
+
+# Window class name -> module that defines it
+WINDOW_MODULES = {
+    'AddCarWindow': 'add_car',
+    'AddCustomerWindow': 'add_customer',
+    'RentCarWindow': 'rent_car',
+    'ReturnCarWindow': 'return_car',
+    'ViewRentalsWindow': 'view_rentals',
+    'SearchWindow': 'search_window',
+    'SettingsWindow': 'settings_window'
+}
+
+# Milliseconds between two hidden window builds; each build holds the Tk thread for a moment
+PREBUILD_INTERVAL = 1500
+
+logger = logging.getLogger(__name__)
+
+_styles_built = False
+
+def build_styles():
+    """Configure the shared entry and table styles once per process; windows do not redefine them."""
+    global _styles_built
+    if _styles_built:
+        return
+    style = ttk.Style()
+    if style.theme_use() != 'clam':
+        style.theme_use('clam')
+    style.configure('Custom.TEntry', fieldbackground='white', foreground='black', borderwidth=1)
+    style.configure('Custom.Treeview', background='#F3F4F6', foreground='black', fieldbackground='#F3F4F6', borderwidth=1)
+    style.configure(
+        'Custom.Treeview.Heading',
+        background='#6B7280',
+        foreground='white',
+        font=('Segoe UI', 12, 'bold'),
+        relief='raised'
+    )
+    _styles_built = True
+
+class CachedToplevel(tk.Toplevel):
+    def __init__(self, master, **kwargs):
+        """Initialize a toplevel that is hidden instead of destroyed while cached."""
+        super().__init__(master, **kwargs)
+        self.cached = True
+
+    def destroy(self):
+        """Hide the window while cached, destroy it otherwise."""
+        if self.cached:
+            self.grab_release()
+            self.withdraw()
+        else:
+            super().destroy()
+
+    def dispose(self):
+        """Really destroy the window."""
+        self.cached = False
+        self.destroy()
+
+class AppShell:
+    def __init__(self, root: tk.Misc):
+        """Initialize the application shell that owns the secondary windows."""
+        self.root = root
+        self.instances: Dict[str, Tuple[CachedToplevel, object]] = {}
+        self._pending_after = set()
+        build_styles()
+
+    def preload(self):
+        """Import the window modules on a background thread."""
+        def worker():
+            for module_name in WINDOW_MODULES.values():
+                try:
+                    importlib.import_module(module_name)
+                except Exception:
+                    # Reported to the user when the window is actually opened
+                    logger.exception("Preloading %s failed", module_name)
+        threading.Thread(target=worker, name="WindowPreloader", daemon=True).start()
+
+    def prebuild(self, window_classes=None, delay: int = PREBUILD_INTERVAL):
+        """Build hidden window instances one at a time, spaced out and only once pending events are handled.
+
+        Windows built hidden skip their initial database reads; open() refreshes them when first shown.
+        """
+        pending = list(window_classes or WINDOW_MODULES.keys())
+
+        def schedule():
+            after_id = self.root.after(delay, lambda: run(after_id))
+            self._pending_after.add(after_id)
+
+        def run(after_id):
+            self._pending_after.discard(after_id)
+            # Wait for the events queued meanwhile, so a build never delays the user's clicks
+            idle_id = self.root.after_idle(lambda: build_idle(idle_id))
+            self._pending_after.add(idle_id)
+
+        def build_idle(idle_id):
+            self._pending_after.discard(idle_id)
+            build_next()
+
+        def build_next():
+            while pending:
+                window_class = pending.pop(0)
+                if window_class in self.instances:
+                    continue
+                try:
+                    self.create(window_class, WINDOW_MODULES[window_class], visible=False)
+                except Exception:
+                    # Reported to the user when the window is actually opened
+                    logger.exception("Prebuilding %s failed", window_class)
+                break
+            if pending:
+                schedule()
+
+        schedule()
+
+    def create(self, window_class: str, module_name: str, visible: bool = True):
+        """Build a new window instance and cache it."""
+        module = importlib.import_module(module_name)
+        toplevel = CachedToplevel(self.root)
+        if not visible:
+            toplevel.withdraw()
+        window = getattr(module, window_class)(toplevel)
+        self.instances[window_class] = (toplevel, window)
+        return window
+
+    def open(self, window_class: str, module_name: str):
+        """Show the cached window instance with refreshed data, building it on first use."""
+        cached = self.instances.get(window_class)
+        if cached and cached[0].winfo_exists():
+            toplevel, window = cached
+            refresh = getattr(window, 'refresh', None)
+            if refresh:
+                refresh()
+            toplevel.deiconify()
+            toplevel.lift()
+            toplevel.focus_force()
+            return window
+        return self.create(window_class, module_name)
+
+    def clear(self):
+        """Cancel pending prebuilds and destroy every cached window."""
+        for after_id in self._pending_after:
+            self.root.after_cancel(after_id)
+        self._pending_after.clear()
+        for toplevel, _ in self.instances.values():
+            if toplevel.winfo_exists():
+                toplevel.dispose()
+        self.instances.clear()
@@ -0,0 +1,106 @@
+import asyncio
+import re
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+import mysql.connector
+from db_instrumentation import find_caller, monitor
+
+# pymysql formats the whole statement with %, so literal % signs must be doubled
+_LITERAL_PERCENT = re.compile(r"%(?![s(])")
+
+def translate_error(err: Exception) -> mysql.connector.Error:
+    """Turn a pymysql error into the mysql.connector error of the same name, keeping its errno.
+
+    The windows and offline_store.is_connection_error only know the mysql.connector errors.
+    """
+    errno, msg = (err.args if len(err.args) == 2 else (None, str(err)))
+    error_class = getattr(mysql.connector.errors, type(err).__name__, mysql.connector.errors.DatabaseError)
+    return error_class(msg=msg, errno=errno)
+
+class AsyncBackend:
+    def __init__(self, config: dict, size: int):
+        """Initialize the asyncio backend; the loop thread and pool start on first use."""
+        self.config = config
+        self.size = size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        """Check whether the optional aiomysql driver is installed."""
+        try:
+            import aiomysql  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the event loop on a daemon thread next to the Tk main loop."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="AsyncDatabase", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _get_pool(self):
+        if self._pool is None:
+            import aiomysql
+            self._pool = await aiomysql.create_pool(
+                host=self.config['host'],
+                port=self.config.get('port', 3306),
+                user=self.config['user'],
+                password=self.config['password'],
+                db=self.config['database'],
+                charset='utf8mb4',
+                connect_timeout=self.config.get('connection_timeout'),
+                autocommit=True,
+                minsize=1,
+                maxsize=self.size
+            )
+        return self._pool
+
+    async def _fetch(self, sql: str, params: Sequence, caller: str) -> List[tuple]:
+        """Run one read on its own pooled connection."""
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        async with pool.acquire() as conn:
+            wait = time.perf_counter() - start
+            start = time.perf_counter()
+            async with conn.cursor() as cursor:
+                if params:
+                    sql = _LITERAL_PERCENT.sub('%%', sql)
+                await cursor.execute(sql, tuple(params) or None)
+                rows = list(await cursor.fetchall())
+        if monitor.enabled:
+            monitor.record(sql, caller, time.perf_counter() - start, len(rows), wait)
+        return rows
+
+    async def _gather(self, queries: List[Tuple[str, Sequence]], caller: str) -> List[List[tuple]]:
+        return list(await asyncio.gather(*(self._fetch(sql, params, caller) for sql, params in queries)))
+
+    def run_queries(self, queries: List[Tuple[str, Sequence]], timeout: float = 30) -> List[List[tuple]]:
+        """Run independent reads concurrently and wait for all of their rows."""
+        import pymysql
+        loop = self.start()
+        future = asyncio.run_coroutine_threadsafe(self._gather(queries, find_caller()), loop)
+        try:
+            return future.result(timeout)
+        except pymysql.err.MySQLError as err:
+            raise translate_error(err) from err
+
+    def close(self):
+        """Close the pool and stop the loop."""
+        with self._lock:
+            loop, pool = self._loop, self._pool
+            self._loop = self._pool = None
+        if loop is None:
+            return
+        if pool is not None:
+            async def shutdown():
+                pool.close()
+                await pool.wait_closed()
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,479 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import mysql.connector
+import database
+from overdue_sweeper import overdue_sweeper
+from notification_scheduler import notification_scheduler
+from rental_settlement import rental_settlement
+from revision import git_revision
+import statement_cache
+import repositories
+from repositories import rental_repository
+
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000
+}
+
+BENCH_DATABASE = "car_rental_bench"
+RESULTS_DIR = "bench_results"
+BATCH_SIZE = 5000
+HISTORY_DAYS = 730
+
+CAR_MODELS = {
+    'Toyota': ['Corolla', 'Yaris', 'Camry', 'RAV4', 'Hilux'],
+    'Hyundai': ['Accent', 'Elantra', 'Tucson', 'i10'],
+    'Kia': ['Picanto', 'Rio', 'Sportage', 'Cerato'],
+    'Dacia': ['Logan', 'Sandero', 'Duster'],
+    'Renault': ['Clio', 'Megane', 'Kadjar'],
+    'Peugeot': ['208', '301', '3008'],
+    'Mercedes': ['C200', 'E220', 'GLA'],
+    'Volkswagen': ['Golf', 'Polo', 'Passat']
+}
+COLORS = ['أبيض', 'أسود', 'رمادي', 'فضي', 'أحمر', 'أزرق']
+FIRST_NAMES = ['محمد', 'أحمد', 'يوسف', 'عمر', 'خالد', 'سعيد', 'فاطمة', 'خديجة', 'مريم', 'سلمى', 'نادية', 'كريم']
+LAST_NAMES = ['العلوي', 'بنعلي', 'الإدريسي', 'التازي', 'الفاسي', 'بناني', 'الشرقاوي', 'المنصوري', 'الحسني', 'القادري']
+
+STATUS_ACTIVE = 'قيد التأجير'
+STATUS_COMPLETED = 'منتهية'
+STATUS_CANCELLED = 'ملغية'
+
+class BenchmarkDataset:
+    def __init__(self, rentals: int, seed: int = 42):
+        """Initialize a deterministic dataset description for the given number of rentals."""
+        self.rentals = rentals
+        self.cars = max(50, rentals // 20)
+        self.customers = max(100, rentals // 5)
+        self.seed = seed
+
+    def ensure_schema(self, cursor):
+        """Create the application tables and the indexes added by the background services."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cars (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                brand VARCHAR(50) NOT NULL,
+                model VARCHAR(50) NOT NULL,
+                plate VARCHAR(20) UNIQUE NOT NULL,
+                color VARCHAR(30),
+                year INT,
+                price DECIMAL(10, 2) NOT NULL,
+                available BOOLEAN DEFAULT TRUE,
+                status VARCHAR(30) DEFAULT 'متوفرة'
+            ) DEFAULT CHARSET = utf8mb4
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS customers (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                national_id VARCHAR(20),
+                phone VARCHAR(20),
+                email VARCHAR(100),
+                address VARCHAR(255),
+                license_number VARCHAR(30)
+            ) DEFAULT CHARSET = utf8mb4
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rentals (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                customer_id INT NOT NULL,
+                car_id INT NOT NULL,
+                rent_date DATETIME NOT NULL,
+                return_date DATE NOT NULL,
+                returned_date DATE NULL,
+                total_price DECIMAL(10, 2),
+                status VARCHAR(30) DEFAULT 'قيد التأجير',
+                notes TEXT,
+                notification_sent BOOLEAN DEFAULT FALSE,
+                FOREIGN KEY (customer_id) REFERENCES customers(id),
+                FOREIGN KEY (car_id) REFERENCES cars(id)
+            ) DEFAULT CHARSET = utf8mb4
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bench_meta (
+                name VARCHAR(50) PRIMARY KEY,
+                value VARCHAR(100) NOT NULL
+            )
+        """)
+        overdue_sweeper.ensure_schema(cursor)
+        notification_scheduler.ensure_schema(cursor)
+        rental_settlement.ensure_schema(cursor)
+
+    def is_seeded(self, cursor) -> bool:
+        """Check whether the database already holds this exact dataset."""
+        cursor.execute("SELECT name, value FROM bench_meta")
+        meta = dict(cursor.fetchall())
+        return meta.get('rentals') == str(self.rentals) and meta.get('seed') == str(self.seed)
+
+    def seed_database(self, conn):
+        """Replace the benchmark tables with a freshly generated dataset."""
+        rng = random.Random(self.seed)
+        cursor = conn.cursor()
+
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in ('overdue_rentals', 'notification_outbox', 'notification_jobs',
+                      'rentals', 'customers', 'cars', 'bench_meta'):
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        conn.commit()
+
+        cars = self.generate_cars(rng)
+        self.insert_batches(conn, cursor, """
+            INSERT INTO cars (brand, model, plate, color, year, price, available, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, cars)
+
+        self.insert_batches(conn, cursor, """
+            INSERT INTO customers (name, national_id, phone, email, address, license_number)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, self.generate_customers(rng))
+
+        rented_cars = set()
+        self.insert_batches(conn, cursor, """
+            INSERT INTO rentals (customer_id, car_id, rent_date, return_date, returned_date,
+                                 total_price, status, notification_sent)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, self.generate_rentals(rng, [car[5] for car in cars], rented_cars))
+
+        # Cars with an open rental are not available, as after RentCarWindow.rent_car
+        rented = sorted(rented_cars)
+        for start in range(0, len(rented), BATCH_SIZE):
+            batch = rented[start:start + BATCH_SIZE]
+            cursor.execute(f"""
+                UPDATE cars SET available = FALSE
+                WHERE id IN ({', '.join(['%s'] * len(batch))})
+            """, batch)
+
+        # Returned rentals get their settlement, as after ReturnCarWindow.return_car
+        rental_settlement.backfill(conn, BATCH_SIZE)
+
+        cursor.executemany("""
+            INSERT INTO bench_meta (name, value) VALUES (%s, %s)
+        """, [('rentals', str(self.rentals)), ('seed', str(self.seed))])
+        conn.commit()
+        cursor.execute("ANALYZE TABLE cars, customers, rentals")
+        cursor.fetchall()
+
+    def insert_batches(self, conn, cursor, sql: str, rows):
+        """Insert rows in multi-row batches, committing after each batch."""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                conn.commit()
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            conn.commit()
+
+    def generate_cars(self, rng: random.Random) -> List[tuple]:
+        """Generate car rows with unique plates."""
+        cars = []
+        for car_id in range(1, self.cars + 1):
+            brand = rng.choice(list(CAR_MODELS))
+            plate = f"{car_id:06d}-{rng.choice('ABDHW')}-{rng.randint(1, 89)}"
+            cars.append((
+                brand, rng.choice(CAR_MODELS[brand]), plate, rng.choice(COLORS),
+                rng.randint(2012, 2025), float(rng.randrange(200, 1500, 50)), True, 'متوفرة'
+            ))
+        return cars
+
+    def generate_customers(self, rng: random.Random):
+        """Generate customer rows."""
+        for customer_id in range(1, self.customers + 1):
+            yield (
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                f"AB{customer_id:07d}",
+                f"06{rng.randint(10000000, 99999999)}",
+                f"customer{customer_id}@example.com",
+                f"الدار البيضاء، حي {rng.randint(1, 300)}",
+                f"L{customer_id:08d}"
+            )
+
+    def generate_rentals(self, rng: random.Random, prices: List[float], rented_cars: set):
+        """Generate rental history; recent rentals may still be open and some of those overdue."""
+        now = datetime.now().replace(microsecond=0)
+        for _ in range(self.rentals):
+            car_id = rng.randint(1, self.cars)
+            rent_date = now - timedelta(days=rng.randint(0, HISTORY_DAYS), minutes=rng.randint(0, 1439))
+            days = rng.randint(1, 14)
+            return_date = rent_date.date() + timedelta(days=days)
+            total_price = prices[car_id - 1] * days
+
+            recent = (now - rent_date).days <= 30
+            if recent and car_id not in rented_cars and rng.random() < 0.3:
+                rented_cars.add(car_id)
+                returned_date, status = None, STATUS_ACTIVE
+            elif rng.random() < 0.05:
+                returned_date, status = None, STATUS_CANCELLED
+            else:
+                returned_date = min(return_date + timedelta(days=rng.randint(-1, 3)), now.date())
+                status = STATUS_COMPLETED
+
+            yield (rng.randint(1, self.customers), car_id, rent_date, return_date,
+                   returned_date, total_price, status, returned_date is not None)
+
+class BenchmarkRunner:
+    def __init__(self, dataset: BenchmarkDataset, iterations: int = 50, warmup: int = 3):
+        """Initialize the runner that replays the application queries."""
+        self.dataset = dataset
+        self.iterations = iterations
+        self.warmup = warmup
+        self.rng = random.Random(dataset.seed)
+        self.available_cars: List[int] = []
+        self.last_rental = None
+
+    def scenarios(self) -> Dict[str, Callable]:
+        """Return the scenarios to time, keyed by the window method they replay."""
+        return {
+            'MainWindow.show_today_bookings': self.today_bookings,
+            'MainWindow.show_late_returns': self.late_returns,
+            'MainWindow.show_quick_report': self.quick_report,
+            'SearchWindow.perform_search[cars]': lambda conn: self.search(conn, 'cars'),
+            'SearchWindow.perform_search[customers]': lambda conn: self.search(conn, 'customers'),
+            'SearchWindow.perform_search[rentals]': lambda conn: self.search(conn, 'rentals'),
+            'SearchWindow.perform_search[all types]': self.search_all,
+            'ViewRentalsWindow.filter_rentals[all]': lambda conn: self.filter_rentals(conn, 'all', ''),
+            'ViewRentalsWindow.filter_rentals[active]': lambda conn: self.filter_rentals(conn, 'active', ''),
+            'ViewRentalsWindow.filter_rentals[search]': self.filter_rentals_search,
+            'ReturnCarWindow.load_active_rentals': self.load_active_rentals,
+            'RentCarWindow.load_data': self.load_rent_form,
+            'RentCarWindow.rent_car': self.rent_car
+        }
+
+    def read_conn(self, conn):
+        """Return no connection for reads the async backend runs concurrently on its own pool, as the windows do.
+
+        With several branches a missing connection would read every branch, so the benchmark one is kept.
+        """
+        return None if database.supports_concurrency() and not database.is_multi_branch() else conn
+
+    def today_bookings(self, conn) -> int:
+        return len(rental_repository.today_bookings(conn))
+
+    def late_returns(self, conn) -> int:
+        return len(rental_repository.late_returns(conn))
+
+    def quick_report(self, conn) -> int:
+        return len(rental_repository.dashboard_totals(self.read_conn(conn))[0])
+
+    def search(self, conn, search_type: str) -> int:
+        if search_type == 'customers':
+            query = self.rng.choice(LAST_NAMES)
+        else:
+            query = self.rng.choice(CAR_MODELS[self.rng.choice(list(CAR_MODELS))])
+        return len(repositories.search([search_type], query, self.read_conn(conn))[search_type])
+
+    def filter_rentals(self, conn, current_filter: str, search_text: str) -> int:
+        return len(rental_repository.list_rentals(current_filter, search_text, conn))
+
+    def filter_rentals_search(self, conn) -> int:
+        return self.filter_rentals(conn, 'all', self.rng.choice(LAST_NAMES))
+
+    def load_active_rentals(self, conn) -> int:
+        return len(rental_repository.active(conn))
+
+    def load_rent_form(self, conn) -> int:
+        customers, cars = rental_repository.form_choices(self.read_conn(conn))
+        return len(customers) + len(cars)
+
+    def search_all(self, conn) -> int:
+        query = self.rng.choice(CAR_MODELS[self.rng.choice(list(CAR_MODELS))])
+        results = repositories.search(repositories.SEARCHES, query, self.read_conn(conn))
+        return sum(len(rows) for rows in results.values())
+
+    def rent_car(self, conn) -> int:
+        """Replay the rental transaction on a random available car; committed by the caller."""
+        car_id = self.available_cars[self.rng.randrange(len(self.available_cars))]
+        start_date = date.today()
+        rental_id = rental_repository.open_rental(conn, self.rng.randint(1, self.dataset.customers), car_id,
+                                                  start_date, start_date + timedelta(days=3), 900)
+        self.last_rental = (rental_id, car_id)
+        return 1
+
+    def undo_rental(self):
+        """Remove the rental created by the last rent_car replay so the dataset stays stable."""
+        rental_id, car_id = self.last_rental
+        with database.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM rentals WHERE id = %s", (rental_id,))
+            cursor.execute("UPDATE cars SET available = TRUE WHERE id = %s", (car_id,))
+            conn.commit()
+
+    def prepare(self):
+        """Refresh derived tables and pick cars the rent scenario can use."""
+        overdue_sweeper.sweep()
+        with database.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM cars WHERE available = TRUE LIMIT 1000")
+            self.available_cars = [row[0] for row in cursor.fetchall()]
+
+    def time_scenario(self, name: str, scenario: Callable) -> dict:
+        """Run one scenario end to end, including taking a pooled connection, and collect latencies."""
+        samples = []
+        rows = 0
+        for iteration in range(self.warmup + self.iterations):
+            start = time.perf_counter()
+            with database.get_db_connection() as conn:
+                rows = scenario(conn)
+                if name == 'RentCarWindow.rent_car':
+                    conn.commit()
+            elapsed = time.perf_counter() - start
+            if name == 'RentCarWindow.rent_car':
+                self.undo_rental()
+            if iteration >= self.warmup:
+                samples.append(elapsed * 1000)
+        return summarize(samples, rows)
+
+    def run(self, only: Optional[List[str]] = None) -> Dict[str, dict]:
+        """Time every scenario and return the summaries."""
+        self.prepare()
+        results = {}
+        for name, scenario in self.scenarios().items():
+            if only and not any(part in name for part in only):
+                continue
+            if name == 'RentCarWindow.rent_car' and not self.available_cars:
+                continue
+            results[name] = self.time_scenario(name, scenario)
+            print_result(name, results[name])
+        return results
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * pct // 100))
+    return samples[int(rank) - 1]
+
+def summarize(samples: List[float], rows: int) -> dict:
+    """Summarize latencies in milliseconds."""
+    samples = sorted(samples)
+    return {
+        'n': len(samples),
+        'rows': rows,
+        'min': round(samples[0], 3),
+        'p50': round(percentile(samples, 50), 3),
+        'p95': round(percentile(samples, 95), 3),
+        'p99': round(percentile(samples, 99), 3),
+        'max': round(samples[-1], 3),
+        'mean': round(sum(samples) / len(samples), 3)
+    }
+
+def print_result(name: str, result: dict):
+    print(f"{name:<45} {result['p50']:>9.2f} {result['p95']:>9.2f} {result['p99']:>9.2f}  rows={result['rows']}")
+
+def compare(results: Dict[str, dict], baseline_path: str):
+    """Print the p50/p95 change against a previous results file."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nCompared with {baseline.get('commit', '')[:10]} ({baseline_path}):")
+    for name, result in results.items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        for key in ('p50', 'p95'):
+            change = (result[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            print(f"{name:<45} {key} {old[key]:>9.2f} -> {result[key]:>9.2f} ms ({change:+.1f}%)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a benchmark database and time the rental workflows.")
+    parser.add_argument('--size', choices=SIZES, default='10k', help="number of rentals to seed")
+    parser.add_argument('--host', default=database.DB_CONFIG['host'])
+    parser.add_argument('--user', default=database.DB_CONFIG['user'])
+    parser.add_argument('--password', default=database.DB_CONFIG['password'])
+    parser.add_argument('--database', default=BENCH_DATABASE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--no-prepared', action='store_true',
+                        help="run the named statements on plain cursors to measure the prepared statement cache")
+    parser.add_argument('--backend', choices=('sync', 'async', 'sqlite'), default=database.DB_BACKEND,
+                        help="data backend; sqlite runs without a server on a local database file")
+    parser.add_argument('--reseed', action='store_true', help="regenerate data even if the dataset matches")
+    parser.add_argument('--only', nargs='*', help="run only scenarios whose name contains one of these")
+    parser.add_argument('--output', default=RESULTS_DIR, help="directory for the JSON results")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database in {branch.config['database'] for branch in database.BRANCHES.values()}:
+        sys.exit(f"Refusing to seed the application database '{args.database}', use a separate one")
+
+    if args.backend == 'sqlite':
+        # A file of its own next to the application's, never the application database itself
+        database.SQLITE_PATH = os.path.join(os.path.dirname(database.SQLITE_PATH), f"{args.database}.sqlite3")
+        server_version = f"SQLite {sqlite3.sqlite_version}"
+    else:
+        config = {'host': args.host, 'user': args.user, 'password': args.password}
+        server = mysql.connector.connect(**config)
+        cursor = server.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}` DEFAULT CHARACTER SET utf8mb4")
+        cursor.execute("SELECT VERSION()")
+        server_version = cursor.fetchone()[0]
+        server.close()
+
+        # Point the shared pool, and every module using it, at the benchmark database
+        config['database'] = args.database
+        database.pool = database.ConnectionPool(config)
+
+    statement_cache.enabled = not args.no_prepared
+    database.replica_reads = False
+    database.DB_BACKEND = args.backend
+    if args.backend == 'async' and not database.supports_concurrency():
+        sys.exit("The async backend needs the aiomysql package")
+
+    dataset = BenchmarkDataset(SIZES[args.size], args.seed)
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        dataset.ensure_schema(cursor)
+        conn.commit()
+        if args.reseed or not dataset.is_seeded(cursor):
+            print(f"Seeding {dataset.rentals} rentals, {dataset.cars} cars, {dataset.customers} customers...")
+            start = time.perf_counter()
+            dataset.seed_database(conn)
+            print(f"Seeded in {time.perf_counter() - start:.1f} s")
+
+    print(f"\n{'scenario':<45} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    runner = BenchmarkRunner(dataset, args.iterations, args.warmup)
+    results = runner.run(args.only)
+
+    revision = git_revision()
+    report = {
+        **revision,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'size': args.size,
+        'rentals': dataset.rentals,
+        'cars': dataset.cars,
+        'customers': dataset.customers,
+        'seed': dataset.seed,
+        'iterations': args.iterations,
+        'prepared_statements': statement_cache.enabled,
+        'backend': args.backend,
+        'server_version': server_version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': results
+    }
+    os.makedirs(args.output, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    mode = f"{args.backend}-{'prepared' if statement_cache.enabled else 'plain'}"
+    path = os.path.join(args.output, f"{args.size}-{mode}-{revision['commit'][:10] or 'nogit'}-{stamp}.json")
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump(report, results_file, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
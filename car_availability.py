@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet, Optional, Tuple
+import mysql.connector
+from repositories import rental_repository
+
+HORIZON_DAYS = 365  # Days ahead whose bookings are read for each car
+CACHE_TTL = 120  # Seconds a car's booked days are reused before being read again
+
+class CarAvailability:
+    def __init__(self, horizon_days: int = HORIZON_DAYS, ttl: float = CACHE_TTL):
+        """Initialize the per-car map of booked days; the loader thread starts on the first prefetch."""
+        self.horizon_days = horizon_days
+        self.ttl = ttl
+        self._booked: Dict[int, Tuple[float, FrozenSet[date]]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the loader thread, shared by every rent window."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="CarAvailability")
+            return self._executor
+
+    def load(self, car_id: int, today: Optional[date] = None) -> FrozenSet[date]:
+        """Read the days from today on that a car is rented or reserved."""
+        today = today or date.today()
+        end = today + timedelta(days=self.horizon_days)
+        booked = set()
+        for booking in rental_repository.car_bookings(car_id, end):
+            first = booking.rent_date.date() if isinstance(booking.rent_date, datetime) else booking.rent_date
+            # A car still out stays booked until it is due, or until today when it is late
+            last = max(booking.return_date, today)
+            day = max(first, today)
+            while day <= min(last, end):
+                booked.add(day)
+                day += timedelta(days=1)
+        return frozenset(booked)
+
+    def booked(self, car_id: int) -> FrozenSet[date]:
+        """Return a car's booked days, cached; nothing is marked when the server cannot be reached."""
+        with self._lock:
+            cached = self._booked.get(car_id)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        try:
+            booked = self.load(car_id)
+        except mysql.connector.Error:
+            return frozenset()
+        with self._lock:
+            self._booked[car_id] = (time.monotonic(), booked)
+        return booked
+
+    def prefetch(self, car_id: int) -> Future:
+        """Read a car's booked days in the background, keeping the rent window responsive."""
+        return self.executor().submit(self.booked, car_id)
+
+    def invalidate(self, car_id: Optional[int] = None):
+        """Forget one car's booked days after it was rented or returned, or every car's."""
+        with self._lock:
+            if car_id is None:
+                self._booked.clear()
+            else:
+                self._booked.pop(car_id, None)
+
+car_availability = CarAvailability()
@@ -0,0 +1,92 @@
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Sequence
+
+# Column kinds; a row type declares one per field
+INT = 'int'
+FLOAT = 'float'
+TEXT = 'text'  # Repeated values such as brands, models and statuses share one string object
+DATE = 'date'
+DATETIME = 'datetime'
+OBJECT = 'object'
+
+_MISSING_INT = -2 ** 63
+_SECONDS_PER_DAY = 86400
+
+def _encode_datetime(value: datetime) -> int:
+    if value is None:
+        return 0
+    return value.toordinal() * _SECONDS_PER_DAY + value.hour * 3600 + value.minute * 60 + value.second
+
+def _decode_datetime(value: int) -> datetime:
+    if not value:
+        return None
+    return datetime.fromordinal(value // _SECONDS_PER_DAY) + timedelta(seconds=value % _SECONDS_PER_DAY)
+
+# Per kind: empty column, encoder of one value, decoder of one stored value (None when stored as is)
+KINDS = {
+    INT: (lambda: array('q'), lambda value: _MISSING_INT if value is None else value,
+          lambda value: None if value == _MISSING_INT else value),
+    FLOAT: (lambda: array('d'), lambda value: float('nan') if value is None else float(value),
+            lambda value: None if value != value else value),
+    DATE: (lambda: array('l'), lambda value: 0 if value is None else value.toordinal(),
+           lambda value: date.fromordinal(value) if value else None),
+    DATETIME: (lambda: array('q'), _encode_datetime, _decode_datetime),
+    TEXT: (list, lambda value: sys.intern(value) if type(value) is str else value, None),
+    OBJECT: (list, lambda value: value, None)
+}
+
+class ColumnarRows(Sequence):
+    """Rows of a large result set kept column by column; each row is rebuilt when it is read."""
+
+    __slots__ = ('row_type', 'kinds', 'columns', '_decoders', '_length')
+
+    def __init__(self, row_type, kinds: Sequence[str], rows: Iterable[tuple]):
+        """Encode rows, which may be streamed, into one compact column per field."""
+        self.row_type = row_type
+        self.kinds = list(kinds)
+        self.columns = [KINDS[kind][0]() for kind in self.kinds]
+        encoders = [KINDS[kind][1] for kind in self.kinds]
+        self._decoders = [KINDS[kind][2] for kind in self.kinds]
+        self._length = 0
+        for row in rows:
+            for index, value in enumerate(row):
+                try:
+                    self.columns[index].append(encoders[index](value))
+                except (TypeError, ValueError, AttributeError, OverflowError):
+                    # A value that does not fit, e.g. a date read as text: keep the column as plain objects
+                    self.columns[index] = self.column(self.row_type._fields[index])
+                    self.columns[index].append(value)
+                    self.kinds[index] = OBJECT
+                    encoders[index] = KINDS[OBJECT][1]
+                    self._decoders[index] = None
+            self._length += 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _row(self, index: int):
+        return self.row_type._make(
+            column[index] if decode is None else decode(column[index])
+            for column, decode in zip(self.columns, self._decoders)
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("row index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator:
+        for index in range(self._length):
+            yield self._row(index)
+
+    def column(self, name: str) -> list:
+        """Return the values of one field as the query returned them."""
+        index = self.row_type._fields.index(name)
+        decode = self._decoders[index]
+        return list(self.columns[index]) if decode is None else [decode(value) for value in self.columns[index]]
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+from typing import NamedTuple, Optional, Tuple
+import database
+from rental_settlement import rental_settlement
+from statement_cache import register
+
+HISTORY_LENGTH = 5  # Recent rentals read with each profile
+CACHE_SIZE = 256
+CACHE_TTL = 300  # Seconds a cached profile is shown without being read again
+
+# The customer and their latest rentals in one round-trip; a customer without rentals still gives one row
+CUSTOMER_PROFILE = register('customer_profile', """
+    SELECT c.id, c.name, c.national_id, c.phone, c.license_number,
+           r.id, r.rent_date, r.return_date, r.returned_date, r.extra_days, r.late_fee
+    FROM customers c
+    LEFT JOIN rentals r ON r.customer_id = c.id
+    WHERE c.id = %s
+    ORDER BY r.rent_date DESC
+    LIMIT %s
+""")
+
+class RecentRental(NamedTuple):
+    id: int
+    rent_date: datetime
+    return_date: date
+    returned_date: Optional[date]
+    extra_days: Optional[int]
+    late_fee: Optional[float]
+
+    @property
+    def late_days(self) -> int:
+        """Days the car came back late, or is late so far when it is still out."""
+        if self.extra_days is not None:
+            return self.extra_days
+        returned = self.returned_date or date.today()
+        return max(0, (returned - self.return_date).days)
+
+class CustomerProfile(NamedTuple):
+    id: int
+    name: str
+    national_id: str
+    phone: Optional[str]
+    license_number: Optional[str]
+    history: Tuple[RecentRental, ...]
+    loaded_at: float
+
+    @property
+    def late_rentals(self) -> int:
+        return sum(1 for rental in self.history if rental.late_days)
+
+    @property
+    def open_rentals(self) -> int:
+        return sum(1 for rental in self.history if rental.returned_date is None)
+
+    @property
+    def late_fees(self) -> float:
+        return sum(float(rental.late_fee or 0) for rental in self.history)
+
+class CustomerProfiles:
+    def __init__(self, history_length: int = HISTORY_LENGTH, size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        """Initialize the profile cache; the loader thread starts on the first prefetch."""
+        self.history_length = history_length
+        self.size = size
+        self.ttl = ttl
+        self._profiles: "OrderedDict[int, CustomerProfile]" = OrderedDict()
+        self._pending = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the loader threads, shared by every rent window."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="CustomerProfile")
+            return self._executor
+
+    def load(self, customer_id: int) -> Optional[CustomerProfile]:
+        """Read a customer and their recent rentals, None if the customer does not exist."""
+        # Installs upgraded from before settlements lack extra_days and late_fee until this runs
+        rental_settlement.ensure_ready()
+        with database.get_db_connection(read_only=True) as conn:
+            rows = database.fetch_rows(conn, CUSTOMER_PROFILE, (customer_id, self.history_length))
+        if not rows:
+            return None
+        history = tuple(RecentRental(*row[5:]) for row in rows if row[5] is not None)
+        return CustomerProfile(*rows[0][:5], history, time.monotonic())
+
+    def cached(self, customer_id: int) -> Optional[CustomerProfile]:
+        """Return a profile read less than ttl seconds ago."""
+        with self._lock:
+            profile = self._profiles.get(customer_id)
+            if profile is None or time.monotonic() - profile.loaded_at > self.ttl:
+                return None
+            self._profiles.move_to_end(customer_id)
+            return profile
+
+    def prefetch(self, customer_id: int) -> Future:
+        """Start reading a profile in the background; a cached or loading profile is not read twice."""
+        profile = self.cached(customer_id)
+        if profile is not None:
+            future = Future()
+            future.set_result(profile)
+            return future
+        executor = self.executor()
+        with self._lock:
+            future = self._pending.get(customer_id)
+            if future is None:
+                future = executor.submit(self._load_and_store, customer_id)
+                self._pending[customer_id] = future
+            return future
+
+    def _load_and_store(self, customer_id: int) -> Optional[CustomerProfile]:
+        try:
+            profile = self.load(customer_id)
+        finally:
+            with self._lock:
+                self._pending.pop(customer_id, None)
+        if profile is not None:
+            with self._lock:
+                self._profiles[customer_id] = profile
+                self._profiles.move_to_end(customer_id)
+                while len(self._profiles) > self.size:
+                    self._profiles.popitem(last=False)
+        return profile
+
+    def invalidate(self, customer_id: Optional[int] = None):
+        """Forget one customer's profile after their rentals changed, or every profile."""
+        with self._lock:
+            if customer_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(customer_id, None)
+
+customer_profiles = CustomerProfiles()
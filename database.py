@@ -0,0 +1,411 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+import mysql.connector
+import startup
+import statement_cache
+from db_instrumentation import InstrumentedCursor, monitor
+
+DB_CONFIG = {
+    'host': "localhost",
+    'user': "root",
+    'password': "",
+    'database': "car_rental"
+}
+
+POOL_NAME = "car_rental"
+POOL_SIZE = 5
+# Pools of other branches only serve federated reads
+BRANCH_POOL_SIZE = 2
+# Seconds before a pool that could not be opened is tried again, doubled after each failure
+POOL_RETRY_INTERVAL = 5
+POOL_RETRY_MAX_INTERVAL = 120
+
+BRANCHES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "branches.json")
+
+# Read-only work goes to a branch's replica while it is at most this many seconds behind
+MAX_REPLICA_LAG = 5
+LAG_CHECK_INTERVAL = 10  # Seconds between replica lag checks
+LAG_RECHECK_INTERVAL = 1  # Minimum seconds between checks while a write is not yet replicated
+REPLICA_CONNECT_TIMEOUT = 2
+
+# Set to False to send every read to the primary, e.g. when benchmarking
+replica_reads = True
+
+# "sync" uses mysql.connector only, "async" also runs independent reads concurrently through aiomysql,
+# "sqlite" keeps everything in a local file for single-counter deployments without a MySQL server
+DB_BACKEND = os.environ.get('CAR_RENTAL_DB_BACKEND', "sync")
+SQLITE_PATH = os.environ.get('CAR_RENTAL_SQLITE_PATH', os.path.join("data", "car_rental.sqlite3"))
+
+class PooledConnection:
+    def __init__(self, connection, wait: float = 0.0):
+        """Wrap a pooled connection so `with` returns it to the pool and its cursors are instrumented."""
+        self._connection = connection
+        self._wait = wait
+        self._cursors = []
+        self.on_commit = None
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def cursor(self, *args, **kwargs):
+        """Create a cursor, timed by the query monitor when it is enabled."""
+        cursor = self._connection.cursor(*args, **kwargs)
+        if not monitor.enabled:
+            return cursor
+        cursor = InstrumentedCursor(cursor, self, monitor)
+        self._cursors.append(cursor)
+        return cursor
+
+    def execute(self, statement, params=()):
+        """Run a named statement on this connection's prepared cursor for it and return its rows."""
+        return statement_cache.execute(self._connection, statement, params, self._instrument)
+
+    def commit(self):
+        """Commit, then tell the replica router this session has written."""
+        self._connection.commit()
+        if self.on_commit:
+            self.on_commit()
+
+    def _instrument(self, cursor):
+        return InstrumentedCursor(cursor, self, monitor) if monitor.enabled else cursor
+
+    def take_wait(self) -> float:
+        """Return the time spent waiting for this connection, once, for the first query."""
+        wait, self._wait = self._wait, 0.0
+        return wait
+
+    def close(self):
+        """Record unfinished queries and return the connection to the pool."""
+        for cursor in self._cursors:
+            cursor.finish()
+        self._cursors.clear()
+        # The pool no longer resets sessions, so end any open transaction and its read view here
+        try:
+            if getattr(self._connection, 'in_transaction', True):
+                self._connection.rollback()
+        except mysql.connector.Error:
+            pass  # A broken connection is replaced by the pool on next use
+        self._connection.close()
+
+class Branch(NamedTuple):
+    code: str
+    name: str
+    config: dict
+    replica: Optional[dict]
+
+def replica_from_env(config: dict) -> Optional[dict]:
+    """Return the replica given by CAR_RENTAL_REPLICA_HOST and CAR_RENTAL_REPLICA_PORT, if any."""
+    host = os.environ.get('CAR_RENTAL_REPLICA_HOST')
+    if not host:
+        return None
+    return {**config, 'host': host, 'port': int(os.environ.get('CAR_RENTAL_REPLICA_PORT', 3306))}
+
+def load_branches(path: str = BRANCHES_PATH) -> Tuple[Dict[str, Branch], str]:
+    """Read the branch databases and the default branch; without a branches file there is one branch."""
+    if not os.path.exists(path):
+        return {'main': Branch('main', "الفرع الرئيسي", DB_CONFIG, replica_from_env(DB_CONFIG))}, 'main'
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    branches = {}
+    for code, branch in data['branches'].items():
+        overrides = {k: v for k, v in branch.items() if k not in ('name', 'replica')}
+        config = {**DB_CONFIG, **overrides}
+        replica = {**config, **branch['replica']} if branch.get('replica') else None
+        branches[code] = Branch(code, branch.get('name', code), config, replica)
+    return branches, data.get('default', next(iter(branches)))
+
+BRANCHES, DEFAULT_BRANCH = load_branches()
+
+# Branch whose database this workstation reads from and writes to
+BRANCH = os.environ.get('CAR_RENTAL_BRANCH', DEFAULT_BRANCH)
+if BRANCH not in BRANCHES:
+    raise ValueError(f"Unknown branch {BRANCH!r}, expected one of: {', '.join(BRANCHES)}")
+
+class ConnectionPool:
+    def __init__(self, config: dict, size: int = POOL_SIZE, name: str = POOL_NAME):
+        """Initialize a lazily created connection pool."""
+        self.config = config
+        self.size = size
+        self.name = name
+        self._pool = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._retry_interval = POOL_RETRY_INTERVAL
+        self._retry_at = 0.0
+
+    def warm_up(self):
+        """Open the pool on a background thread."""
+        with self._lock:
+            if self._thread or self._ready.is_set():
+                return
+            self._thread = threading.Thread(target=self._open, name="PoolWarmUp", daemon=True)
+            self._thread.start()
+
+    def _open(self):
+        """Create the pool, leaving it unset if the server is unreachable."""
+        try:
+            from mysql.connector import pooling
+            self._pool = pooling.MySQLConnectionPool(
+                pool_name=self.name,
+                pool_size=self.size,
+                # Resetting the session would deallocate the cached prepared statements
+                pool_reset_session=False,
+                **self.config
+            )
+            self._retry_interval = POOL_RETRY_INTERVAL
+            startup.mark("database pool ready")
+        except mysql.connector.Error:
+            self._pool = None
+            # Connections are opened directly until the next attempt
+            self._retry_at = time.monotonic() + self._retry_interval
+            self._retry_interval = min(self._retry_interval * 2, POOL_RETRY_MAX_INTERVAL)
+        finally:
+            self._ready.set()
+
+    def get_connection(self, timeout: float = 10):
+        """Get a connection from the pool, opening a direct one if the pool is unavailable."""
+        start = time.perf_counter()
+        if self._pool is None and self._ready.is_set():
+            self.retry()
+        if not self._ready.is_set():
+            self.warm_up()
+            self._ready.wait(timeout)
+
+        if self._pool is not None:
+            try:
+                connection = self._pool.get_connection()
+                return PooledConnection(connection, time.perf_counter() - start)
+            except mysql.connector.errors.PoolError:
+                pass  # Pool exhausted, fall back to a dedicated connection
+
+        connection = mysql.connector.connect(**self.config)
+        return PooledConnection(connection, time.perf_counter() - start)
+
+    def retry(self):
+        """Open the pool again once its retry time has come, if the server was unreachable last time."""
+        with self._lock:
+            if self._pool is None and self._ready.is_set() and time.monotonic() >= self._retry_at:
+                self._thread = None
+                self._ready.clear()
+
+pool = ConnectionPool(BRANCHES[BRANCH].config)
+
+_branch_pools: Dict[str, ConnectionPool] = {}
+_branch_pools_lock = threading.Lock()
+
+def pool_for(branch: str) -> ConnectionPool:
+    """Return the pool of a branch; each branch has its own, so a slow branch cannot starve the others."""
+    if branch == BRANCH:
+        return pool
+    with _branch_pools_lock:
+        if branch not in _branch_pools:
+            _branch_pools[branch] = ConnectionPool(
+                BRANCHES[branch].config, BRANCH_POOL_SIZE, f"{POOL_NAME}_{branch}"
+            )
+        return _branch_pools[branch]
+
+class ReplicaRouter:
+    def __init__(self, config: Optional[dict], name: str):
+        """Initialize the routing of a branch's reads; without a replica config everything stays on the primary."""
+        self.pool = None
+        if config:
+            config = {'connection_timeout': REPLICA_CONNECT_TIMEOUT, **config}
+            self.pool = ConnectionPool(config, POOL_SIZE, name)
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.last_write = 0.0
+        self._lock = threading.Lock()
+        self._checking = False
+
+    @property
+    def replicated_until(self) -> float:
+        """Primary time up to which the replica had applied changes at the last check."""
+        # Seconds behind is reported in whole seconds, so assume up to one more
+        return self.checked_at - (self.lag or 0) - 1
+
+    def note_write(self):
+        """Send reads to the primary until the replica is known to have this write."""
+        self.last_write = time.time()
+
+    def check_lag(self) -> Optional[float]:
+        """Ask the replica how far behind the primary it is; None if it is unreachable or not replicating."""
+        try:
+            with self.pool.get_connection(REPLICA_CONNECT_TIMEOUT) as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except mysql.connector.errors.ProgrammingError:
+                    cursor.execute("SHOW SLAVE STATUS")  # Servers before MySQL 8.0.22
+                rows = cursor.fetchall()
+                columns = cursor.column_names
+        except mysql.connector.Error:
+            return None
+        if not rows:
+            return None
+        column = 'Seconds_Behind_Source' if 'Seconds_Behind_Source' in columns else 'Seconds_Behind_Master'
+        lags = [row[columns.index(column)] for row in rows]
+        if any(lag is None for lag in lags):
+            return None  # Replication thread stopped
+        return float(max(lags))
+
+    def refresh_lag(self):
+        """Measure the lag on a background thread unless a check is already running."""
+        with self._lock:
+            if self._checking:
+                return
+            self._checking = True
+        threading.Thread(target=self._refresh, name="ReplicaLagCheck", daemon=True).start()
+
+    def _refresh(self):
+        measured_at = time.time()
+        lag = None
+        try:
+            lag = self.check_lag()
+        finally:
+            with self._lock:
+                self.lag = lag
+                self.checked_at = measured_at
+                self._checking = False
+
+    def use_replica(self) -> bool:
+        """Check from the last measured lag whether a read may go to the replica; a stale lag is renewed in the background."""
+        if self.pool is None or not replica_reads:
+            return False
+        with self._lock:
+            now = time.time()
+            unreplicated = self.last_write >= self.replicated_until
+            stale = (now - self.checked_at >= LAG_CHECK_INTERVAL
+                     or (unreplicated and now - self.checked_at >= LAG_RECHECK_INTERVAL))
+            usable = (self.lag is not None and self.lag <= MAX_REPLICA_LAG
+                      and self.last_write < self.replicated_until)
+        if stale:
+            self.refresh_lag()
+        return usable
+
+    def mark_down(self):
+        """Stop using the replica until the next lag check."""
+        with self._lock:
+            self.lag = None
+            self.checked_at = time.time()
+
+_replicas: Dict[str, ReplicaRouter] = {}
+_replicas_lock = threading.Lock()
+
+def replica_for(branch: str) -> ReplicaRouter:
+    """Return the read routing of a branch."""
+    with _replicas_lock:
+        if branch not in _replicas:
+            _replicas[branch] = ReplicaRouter(BRANCHES[branch].replica, f"{POOL_NAME}_{branch}_replica")
+        return _replicas[branch]
+
+def is_multi_branch() -> bool:
+    """Check whether reports and searches have to cover several branch databases."""
+    return DB_BACKEND != "sqlite" and len(BRANCHES) > 1
+
+_sqlite_backend = None
+_sqlite_lock = threading.Lock()
+
+def get_sqlite_backend():
+    """Return the embedded backend, created on first use so SQLITE_PATH can still be changed."""
+    global _sqlite_backend
+    with _sqlite_lock:
+        if _sqlite_backend is None:
+            from sqlite_backend import SQLiteBackend
+            _sqlite_backend = SQLiteBackend(SQLITE_PATH)
+        return _sqlite_backend
+
+def warm_up():
+    """Open the shared connection pool in the background."""
+    if DB_BACKEND == "sqlite":
+        return  # Opening the local file takes no noticeable time
+    pool.warm_up()
+
+def get_db_connection(branch: str = None, read_only: bool = False):
+    """Get database connection for this workstation's branch or another one.
+
+    Read-only work goes to the branch's replica when it is caught up, everything else to the primary.
+    """
+    if DB_BACKEND == "sqlite":
+        return PooledConnection(get_sqlite_backend().connect())
+
+    branch = branch or BRANCH
+    router = replica_for(branch)
+    if read_only and router.use_replica():
+        try:
+            return router.pool.get_connection(REPLICA_CONNECT_TIMEOUT)
+        except mysql.connector.Error:
+            router.mark_down()  # Fall back to the primary
+
+    connection = pool_for(branch).get_connection()
+    if router.pool is not None:
+        connection.on_commit = router.note_write
+    return connection
+
+_async_backends: Dict[Tuple[str, bool], object] = {}
+_async_lock = threading.Lock()
+_async_available: Optional[bool] = None
+
+def get_async_backend(branch: str = None, replica: bool = False):
+    """Return the asyncio backend of a branch's primary or replica when it is configured and aiomysql is installed."""
+    global _async_available
+    if DB_BACKEND != "async":
+        return None
+    from async_db import AsyncBackend
+    if _async_available is None:
+        _async_available = AsyncBackend.available()
+    if not _async_available:
+        return None  # Optional driver missing, stay on the blocking driver
+
+    branch = branch or BRANCH
+    key = (branch, replica)
+    with _async_lock:
+        if key not in _async_backends:
+            target = replica_for(branch).pool if replica else pool_for(branch)
+            _async_backends[key] = AsyncBackend(target.config, target.size)
+        return _async_backends[key]
+
+def supports_concurrency() -> bool:
+    """Check whether run_queries runs its reads concurrently."""
+    return get_async_backend() is not None
+
+def run_queries(queries, connection=None, branch: str = None):
+    """Run independent reads given as (statement or SQL, params) pairs and return the rows of each.
+
+    Without a connection they run concurrently on the async backend, on the branch's replica when it is caught up.
+    """
+    backend = get_async_backend(branch) if connection is None else None
+    if backend:
+        queries = [(getattr(query, 'sql', query), params) for query, params in queries]
+        router = replica_for(branch or BRANCH)
+        if router.use_replica():
+            try:
+                return get_async_backend(branch, replica=True).run_queries(queries)
+            except mysql.connector.Error:
+                router.mark_down()  # Fall back to the primary
+        return backend.run_queries(queries)
+
+    if connection is None:
+        with get_db_connection(branch, read_only=True) as connection:
+            return run_queries(queries, connection)
+
+    return [fetch_rows(connection, query, params) for query, params in queries]
+
+def fetch_rows(connection, query, params=()):
+    """Run one read, a named statement or plain SQL, on a connection and return its rows."""
+    if isinstance(query, statement_cache.Statement):
+        return connection.execute(query, params).fetchall()
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
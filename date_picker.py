@@ -0,0 +1,136 @@
+import calendar
+import tkinter as tk
+from datetime import date
+from typing import Callable, Collection, Optional
+
+MONTHS = ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو",
+          "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"]
+WEEKDAYS = ["إث", "ث", "أر", "خ", "ج", "س", "أح"]  # Monday first
+WEEKS = 6  # Rows of the month grid, enough for any month
+
+class DatePicker:
+    """Month calendar popup built once per window; showing it only reconfigures its day cells."""
+
+    def __init__(self, master: tk.Misc, colors: dict):
+        """Build the hidden popup and its fixed grid of day cells."""
+        self.colors = colors
+        self.month = date.today().replace(day=1)
+        self.selected: Optional[date] = None
+        self.blocked: Collection[date] = frozenset()
+        self.min_date: Optional[date] = None
+        self.on_pick: Optional[Callable[[date], None]] = None
+        self.days = []
+        self._weeks = calendar.Calendar(firstweekday=0)
+
+        self.top = tk.Toplevel(master)
+        self.top.withdraw()
+        self.top.title("اختر التاريخ")
+        self.top.resizable(False, False)
+        self.top.transient(master)
+        self.top.configure(bg=colors['surface'])
+        self.top.protocol("WM_DELETE_WINDOW", self.hide)
+        self.top.bind('<Escape>', lambda e: self.hide())
+
+        header = tk.Frame(self.top, bg=colors['surface'])
+        header.pack(fill='x', padx=10, pady=(10, 5))
+        for text, step, side in (("◀", -1, 'left'), ("▶", 1, 'right')):
+            tk.Button(
+                header,
+                text=text,
+                font=("Segoe UI", 10),
+                fg=colors['text'],
+                bg=colors['surface_dark'],
+                bd=0,
+                padx=8,
+                cursor='hand2',
+                command=lambda s=step: self.move_month(s)
+            ).pack(side=side)
+        self.title_label = tk.Label(
+            header,
+            font=("Segoe UI", 11, "bold"),
+            fg=colors['text'],
+            bg=colors['surface']
+        )
+        self.title_label.pack(side='left', expand=True)
+
+        grid = tk.Frame(self.top, bg=colors['surface'])
+        grid.pack(padx=10, pady=(0, 10))
+        for column, name in enumerate(WEEKDAYS):
+            tk.Label(
+                grid,
+                text=name,
+                width=4,
+                font=("Segoe UI", 9),
+                fg=colors['text_secondary'],
+                bg=colors['surface']
+            ).grid(row=0, column=column)
+        self.cells = []
+        for index in range(WEEKS * 7):
+            cell = tk.Label(grid, width=4, pady=4, font=("Segoe UI", 10), cursor='hand2')
+            cell.grid(row=1 + index // 7, column=index % 7, padx=1, pady=1)
+            cell.bind('<Button-1>', lambda e, i=index: self.pick(i))
+            self.cells.append(cell)
+
+    def show(self, anchor: tk.Widget, selected: date, on_pick: Callable[[date], None],
+             blocked: Collection[date] = frozenset(), min_date: Optional[date] = None):
+        """Show the popup under a field, on the month of its date, with blocked days marked."""
+        self.selected = selected
+        self.on_pick = on_pick
+        self.blocked = blocked
+        self.min_date = min_date
+        self.month = selected.replace(day=1)
+        self.render()
+        self.top.geometry(f"+{anchor.winfo_rootx()}+{anchor.winfo_rooty() + anchor.winfo_height()}")
+        self.top.deiconify()
+        self.top.lift()
+        self.top.focus_set()
+
+    def hide(self):
+        """Hide the popup, keeping it for the next time."""
+        self.top.withdraw()
+
+    def move_month(self, step: int):
+        """Show the previous or next month."""
+        month = self.month.month - 1 + step
+        self.month = date(self.month.year + month // 12, month % 12 + 1, 1)
+        self.render()
+
+    def render(self):
+        """Reconfigure the day cells for the current month."""
+        self.title_label.config(text=f"{MONTHS[self.month.month - 1]} {self.month.year}")
+        self.days = [day for week in self._weeks.monthdatescalendar(self.month.year, self.month.month) for day in week]
+        today = date.today()
+        for index, cell in enumerate(self.cells):
+            if index >= len(self.days):
+                cell.config(text="", bg=self.colors['surface'], cursor='')
+                continue
+            day = self.days[index]
+            bg, fg = self.colors['surface_dark'], self.colors['text']
+            if day.month != self.month.month:
+                bg, fg = self.colors['surface'], self.colors['text_secondary']
+            if self.min_date and day < self.min_date:
+                fg = self.colors['text_secondary']
+            elif day in self.blocked:
+                bg = self.colors['danger']
+            if day == self.selected:
+                bg = self.colors['primary']
+            cell.config(
+                text=str(day.day),
+                bg=bg,
+                fg=fg,
+                cursor='hand2' if self.selectable(day) else '',
+                relief='solid' if day == today else 'flat',
+                bd=1 if day == today else 0
+            )
+
+    def selectable(self, day: date) -> bool:
+        """Check whether a day may be picked: not booked and not before the minimum date."""
+        return day not in self.blocked and not (self.min_date and day < self.min_date)
+
+    def pick(self, index: int):
+        """Pick the day of a clicked cell and close the popup."""
+        if index >= len(self.days) or not self.selectable(self.days[index]):
+            return
+        self.hide()
+        if self.on_pick:
+            self.on_pick(self.days[index])
@@ -0,0 +1,220 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+RING_BUFFER_SIZE = 5000
+SLOW_QUERY_THRESHOLD = 0.5  # Seconds
+SLOW_QUERY_LOG = os.path.join("logs", "slow_queries.log")
+
+# Frames from these modules are skipped when looking for the calling window
+_INTERNAL_MODULES = {__name__, 'database', 'async_db', 'federated', 'statement_cache', 'sqlite_backend',
+                     'repositories', 'compact_rows'}
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_PARAM = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+class QueryRecord(NamedTuple):
+    at: datetime
+    caller: str
+    fingerprint: str
+    duration: float
+    rows: int
+    wait: float
+
+class QueryStats(NamedTuple):
+    caller: str
+    fingerprint: str
+    count: int
+    total: float
+    mean: float
+    max: float
+    rows: int
+    wait: float
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so executions with different values group together."""
+    sql = _STRING.sub('?', sql)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _LIST.sub('(?+)', sql)
+
+def find_caller() -> str:
+    """Return the first application frame outside the database layer as Class.method."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module not in _INTERNAL_MODULES and not module.startswith('mysql'):
+            code = frame.f_code
+            qualname = getattr(code, 'co_qualname', code.co_name).replace('<locals>.', '')
+            if '.' in qualname:
+                return qualname
+            instance = frame.f_locals.get('self')
+            if instance is not None:
+                return f"{type(instance).__name__}.{qualname}"
+            return f"{module}.{qualname}"
+        frame = frame.f_back
+    return 'unknown'
+
+class QueryMonitor:
+    def __init__(self, capacity: int = RING_BUFFER_SIZE, slow_threshold: float = SLOW_QUERY_THRESHOLD,
+                 log_path: str = SLOW_QUERY_LOG):
+        """Initialize the monitor that keeps the most recent queries in a ring buffer."""
+        self.enabled = True
+        self.slow_threshold = slow_threshold
+        self.log_path = log_path
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, caller: str, duration: float, rows: int, wait: float):
+        """Store a finished query and log it if it was slow."""
+        record = QueryRecord(datetime.now(), caller, fingerprint(sql), duration, rows, wait)
+        with self._lock:
+            self._records.append(record)
+        if duration >= self.slow_threshold:
+            self.log_slow(record)
+
+    def log_slow(self, record: QueryRecord):
+        """Append a slow query to the local log; values are never written, only the fingerprint."""
+        try:
+            directory = os.path.dirname(self.log_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f"{record.at:%Y-%m-%d %H:%M:%S}\t{record.duration * 1000:.1f} ms\t"
+                        f"rows={record.rows}\twait={record.wait * 1000:.1f} ms\t"
+                        f"{record.caller}\t{record.fingerprint}\n")
+        except OSError:
+            pass  # Diagnostics must never break the query itself
+
+    def records(self) -> List[QueryRecord]:
+        """Return a copy of the buffered queries, oldest first."""
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        """Forget all buffered queries."""
+        with self._lock:
+            self._records.clear()
+
+    def top_offenders(self, limit: int = 20, by_caller: bool = False) -> List[QueryStats]:
+        """Aggregate buffered queries per caller and fingerprint, or per caller only, by total time."""
+        groups: Dict[Tuple[str, str], List[QueryRecord]] = {}
+        for record in self.records():
+            key = (record.caller, '' if by_caller else record.fingerprint)
+            groups.setdefault(key, []).append(record)
+
+        stats = []
+        for (caller, sql), records in groups.items():
+            total = sum(r.duration for r in records)
+            stats.append(QueryStats(
+                caller, sql, len(records), total, total / len(records),
+                max(r.duration for r in records), sum(r.rows for r in records),
+                sum(r.wait for r in records)
+            ))
+        stats.sort(key=lambda s: s.total, reverse=True)
+        return stats[:limit]
+
+class InstrumentedCursor:
+    def __init__(self, cursor, connection, monitor: QueryMonitor):
+        """Wrap a cursor so every statement is timed until its rows are consumed."""
+        self._cursor = cursor
+        self._connection = connection
+        self._monitor = monitor
+        self._pending: Optional[list] = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        """Execute a statement and start timing it."""
+        self.finish()
+        caller = find_caller()
+        wait = self._connection.take_wait()
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._pending = [operation, caller, time.perf_counter() - start, 0, wait]
+            if not getattr(self._cursor, 'with_rows', False):
+                self._pending[3] = max(self._cursor.rowcount, 0)
+                self.finish()
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        """Execute a statement for every parameter set and time the whole batch."""
+        self.finish()
+        caller = find_caller()
+        wait = self._connection.take_wait()
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._pending = [operation, caller, time.perf_counter() - start,
+                             max(self._cursor.rowcount, 0), wait]
+            self.finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        if self._pending:
+            self._pending[2] += time.perf_counter() - start
+            if row is None:
+                self.finish()
+            else:
+                self._pending[3] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        if self._pending:
+            self._pending[2] += time.perf_counter() - start
+            self._pending[3] += len(rows)
+            if not rows:
+                self.finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        if self._pending:
+            self._pending[2] += time.perf_counter() - start
+            self._pending[3] += len(rows)
+            self.finish()
+        return rows
+
+    def finish(self):
+        """Record the current statement, counting the rows fetched so far."""
+        if self._pending:
+            sql, caller, duration, rows, wait = self._pending
+            self._pending = None
+            self._monitor.record(sql, caller, duration, rows, wait)
+
+    def close(self):
+        """Record the current statement and close the cursor."""
+        self.finish()
+        return self._cursor.close()
+
+monitor = QueryMonitor()
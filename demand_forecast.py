@@ -0,0 +1,228 @@
+import math
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import database
+from repositories import FILTER_STATUSES
+
+HORIZONS = (30, 90)
+HISTORY_DAYS = 2 * 365  # Aggregated days the models are fitted on
+REFRESH_DAYS = 7  # Latest aggregated days recomputed on every run, as recent rentals may still change
+LEVEL_HALF_LIFE = 14  # Days after which a day's weight in the demand level halves
+WEEKDAY_PRIOR = 4  # Pseudo-days pulling sparse weekday and month factors towards 1
+MONTH_PRIOR = 15
+SERVICE_Z = 1.28  # Spare cars for about nine days in ten without a shortage
+
+# Rentals started per day, brand and model over a range of days
+AGGREGATE_DAYS = """
+    INSERT INTO rental_demand_daily (day, brand, model, rentals, rental_days, open_rentals)
+    SELECT DATE(r.rent_date), c.brand, c.model, COUNT(*),
+           SUM(DATEDIFF(COALESCE(r.returned_date, r.return_date), r.rent_date) + 1),
+           SUM(CASE WHEN r.returned_date IS NULL THEN 1 ELSE 0 END)
+    FROM rentals r
+    JOIN cars c ON c.id = r.car_id
+    WHERE r.rent_date >= %s
+    AND r.rent_date < %s
+    AND r.status <> %s
+    GROUP BY DATE(r.rent_date), c.brand, c.model
+    ON DUPLICATE KEY UPDATE
+        rentals = VALUES(rentals),
+        rental_days = VALUES(rental_days),
+        open_rentals = VALUES(open_rentals)
+"""
+
+class DailyDemand(NamedTuple):
+    day: date
+    brand: str
+    model: str
+    rentals: int
+    rental_days: int
+
+class SeasonalModel(NamedTuple):
+    level: float  # Deseasonalized rentals started per day
+    weekdays: Tuple[float, ...]
+    months: Tuple[float, ...]
+
+    def predict(self, day: date) -> float:
+        return self.level * self.weekdays[day.weekday()] * self.months[day.month - 1]
+
+class DemandForecast(NamedTuple):
+    brand: str
+    model: str
+    fleet: int  # Cars of this brand and model today
+    daily_rentals: float  # Current deseasonalized demand
+    average_days: float
+    rentals: Dict[int, float]  # Rentals expected to start, per horizon in days
+    cars: Dict[int, int]  # Recommended fleet size, per horizon in days
+
+    @property
+    def gap(self) -> int:
+        """Cars to add, or remove when negative, to cover the longest horizon."""
+        return self.cars[max(self.cars)] - self.fleet
+
+def as_date(value) -> Optional[date]:
+    """Read a day that may come back as text, as aggregates do on SQLite."""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def seasonal_factors(values: Sequence[float], keys: Sequence[int], size: int, prior: int) -> Tuple[float, ...]:
+    """Mean of each season relative to the overall mean, shrunk towards 1 when a season has few days."""
+    overall = sum(values) / len(values) if values else 0.0
+    if not overall:
+        return (1.0,) * size
+    sums, counts = [0.0] * size, [0] * size
+    for value, key in zip(values, keys):
+        sums[key] += value
+        counts[key] += 1
+    return tuple((sums[key] + prior * overall) / ((counts[key] + prior) * overall) for key in range(size))
+
+def fit(first_day: date, values: Sequence[float]) -> SeasonalModel:
+    """Fit weekday and, with a year of history, month factors, then an exponentially weighted level."""
+    days = [first_day + timedelta(days=offset) for offset in range(len(values))]
+    weekdays = seasonal_factors(values, [day.weekday() for day in days], 7, WEEKDAY_PRIOR)
+    if len(values) >= 365:
+        months = seasonal_factors(values, [day.month - 1 for day in days], 12, MONTH_PRIOR)
+    else:
+        months = (1.0,) * 12
+    alpha = 1 - 0.5 ** (1 / LEVEL_HALF_LIFE)
+    level = None
+    for day, value in zip(days, values):
+        value /= weekdays[day.weekday()] * months[day.month - 1]
+        level = value if level is None else level + alpha * (value - level)
+    return SeasonalModel(level or 0.0, weekdays, months)
+
+def day_ranges(days: Sequence[date]) -> List[Tuple[date, date]]:
+    """Group sorted days into runs of consecutive days, each as a start and an exclusive end."""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+def cars_needed(model: SeasonalModel, average_days: float, start: date, horizon: int) -> int:
+    """Cars covering the busiest forecast day of a horizon; rentals out at once follow starts times duration."""
+    peak = max(model.predict(start + timedelta(days=offset)) for offset in range(horizon)) * average_days
+    return math.ceil(peak + SERVICE_Z * math.sqrt(peak)) if peak > 0 else 0
+
+class DemandForecaster:
+    def __init__(self, horizons: Sequence[int] = HORIZONS, history_days: int = HISTORY_DAYS):
+        """Initialize the forecaster; the daily aggregate table is created on first use."""
+        self.horizons = tuple(horizons)
+        self.history_days = history_days
+        self._schema_ready = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def ensure_schema(self, cursor):
+        """Create the table of rentals started per day, brand and model."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rental_demand_daily (
+                day DATE NOT NULL,
+                brand VARCHAR(50) NOT NULL,
+                model VARCHAR(50) NOT NULL,
+                rentals INT NOT NULL,
+                rental_days INT NOT NULL,
+                open_rentals INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, brand, model)
+            )
+        """)
+
+        # Days aggregated before open rentals were counted are all aggregated again once
+        cursor.execute("""
+            ALTER TABLE rental_demand_daily
+            ADD COLUMN IF NOT EXISTS open_rentals INT NOT NULL DEFAULT 1
+        """)
+        self._schema_ready = True
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the single worker thread forecasts are computed on."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DemandForecast")
+            return self._executor
+
+    def submit(self) -> Future:
+        """Refresh the aggregates and forecast in the background."""
+        return self.executor().submit(self.forecast)
+
+    def refresh(self, conn) -> date:
+        """Aggregate the days since the last run, its last few days, and the days whose rentals were still out."""
+        cursor = conn.cursor()
+        try:
+            if not self._schema_ready:
+                self.ensure_schema(cursor)
+            cursor.execute("SELECT MAX(day) FROM rental_demand_daily")
+            last_day = as_date(cursor.fetchone()[0])
+            since = last_day - timedelta(days=REFRESH_DAYS) if last_day else date(1970, 1, 1)
+
+            # A rental out at the last run may have been returned or cancelled since, changing its start day
+            cursor.execute("""
+                SELECT DISTINCT day
+                FROM rental_demand_daily
+                WHERE open_rentals > 0
+                AND day < %s
+            """, (since,))
+            stale = sorted(as_date(row[0]) for row in cursor.fetchall())
+
+            for start, end in day_ranges(stale) + [(since, date.max)]:
+                # Another workstation may be refreshing the same days, so rows are upserted
+                cursor.execute("DELETE FROM rental_demand_daily WHERE day >= %s AND day < %s", (start, end))
+                cursor.execute(AGGREGATE_DAYS, (start, end, FILTER_STATUSES['cancelled']))
+            conn.commit()
+            return since
+        finally:
+            cursor.close()
+
+    def load(self, conn, since: date) -> Tuple[List[DailyDemand], Dict[Tuple[str, str], int]]:
+        """Read the aggregated days and the current fleet per brand and model."""
+        demand = [DailyDemand(*row) for row in database.fetch_rows(conn, """
+            SELECT day, brand, model, rentals, rental_days
+            FROM rental_demand_daily
+            WHERE day >= %s
+        """, (since,))]
+        fleet = {(brand, model): count for brand, model, count in database.fetch_rows(conn, """
+            SELECT brand, model, COUNT(*)
+            FROM cars
+            GROUP BY brand, model
+        """)}
+        return demand, fleet
+
+    def forecast(self, today: Optional[date] = None) -> List[DemandForecast]:
+        """Forecast rentals and fleet size per brand and model, largest shortage first."""
+        today = today or date.today()
+        # Aggregates are written, so this runs on the primary
+        with database.get_db_connection() as conn:
+            self.refresh(conn)
+            demand, fleet = self.load(conn, today - timedelta(days=self.history_days))
+
+        series = defaultdict(dict)
+        for row in demand:
+            day = as_date(row.day)
+            if day < today:  # Today is not over yet
+                series[(row.brand, row.model)][day] = row
+        for key in fleet:
+            series.setdefault(key, {})
+
+        # Every series starts on the first aggregated day, so a model rented once is not fitted on that day alone
+        first_day = min((day for days in series.values() for day in days), default=today - timedelta(days=1))
+        calendar_days = [first_day + timedelta(days=offset) for offset in range((today - first_day).days)]
+        forecasts = []
+        for (brand, model), days in series.items():
+            values = [days[day].rentals if day in days else 0 for day in calendar_days]
+            started = sum(row.rentals for row in days.values())
+            average_days = sum(row.rental_days for row in days.values()) / started if started else 1.0
+            seasonal = fit(first_day, values)
+            forecasts.append(DemandForecast(
+                brand, model, fleet.get((brand, model), 0), seasonal.level, average_days,
+                {horizon: sum(seasonal.predict(today + timedelta(days=offset)) for offset in range(horizon))
+                 for horizon in self.horizons},
+                {horizon: cars_needed(seasonal, average_days, today, horizon) for horizon in self.horizons}
+            ))
+        return sorted(forecasts, key=lambda forecast: forecast.gap, reverse=True)
+
+demand_forecaster = DemandForecaster()
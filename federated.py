@@ -0,0 +1,75 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import database
+
+# Seconds a federated read waits for the slowest branch before reporting it as missing
+BRANCH_TIMEOUT = 10
+
+class BranchResult(NamedTuple):
+    branch: str
+    results: Optional[List[list]]  # Rows of each query, None when the branch did not answer
+    error: Optional[str]
+
+class FederatedReader:
+    def __init__(self, timeout: float = BRANCH_TIMEOUT):
+        """Initialize the reader that fans reads out to every branch database."""
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the worker threads, two per branch so one stuck branch leaves room for the rest."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(4, 2 * len(database.BRANCHES)),
+                    thread_name_prefix="BranchRead"
+                )
+            return self._executor
+
+    def fetch(self, branch: str, queries: Sequence[Tuple[object, Sequence]]) -> List[list]:
+        """Run reads on one branch over a single connection from its own pool."""
+        with database.get_db_connection(branch, read_only=True) as conn:
+            return [database.fetch_rows(conn, query, params) for query, params in queries]
+
+    def run_queries(self, queries: Sequence[Tuple[object, Sequence]],
+                    branches: Optional[Iterable[str]] = None) -> List[BranchResult]:
+        """Run the same reads on every branch in parallel; late or failing branches are reported, not awaited."""
+        branches = list(branches or database.BRANCHES)
+        futures = {self.executor().submit(self.fetch, branch, queries): branch for branch in branches}
+        done, _ = wait(futures, self.timeout)
+
+        results = []
+        for future, branch in futures.items():
+            if future not in done:
+                results.append(BranchResult(branch, None, "timeout"))
+            elif future.exception() is not None:
+                results.append(BranchResult(branch, None, str(future.exception())))
+            else:
+                results.append(BranchResult(branch, future.result(), None))
+        return results
+
+    def search(self, query, params=(), branches=None) -> Tuple[List[tuple], List[str]]:
+        """Merge the rows of one read across branches, each row prefixed with its branch name."""
+        rows, missing = [], []
+        for result in self.run_queries([(query, params)], branches):
+            name = database.BRANCHES[result.branch].name
+            if result.results is None:
+                missing.append(name)
+            else:
+                rows.extend((name, *row) for row in result.results[0])
+        return rows, missing
+
+    def totals(self, queries, branches=None) -> Tuple[List[float], List[str]]:
+        """Add up single-value reads, such as counts and sums, across branches."""
+        totals, missing = [0] * len(queries), []
+        for result in self.run_queries(queries, branches):
+            if result.results is None:
+                missing.append(database.BRANCHES[result.branch].name)
+                continue
+            for index, rows in enumerate(result.results):
+                totals[index] += rows[0][0] or 0
+        return totals, missing
+
+federated_reader = FederatedReader()
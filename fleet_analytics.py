@@ -0,0 +1,188 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional
+import database
+from compact_rows import DATE, FLOAT, INT, ColumnarRows
+from rental_settlement import rental_settlement
+from repositories import FILTER_STATUSES, car_repository, fetch_columns
+
+try:
+    import numpy as np
+except ImportError:  # Optional; the fleet report asks for it when it is missing
+    np = None
+
+CAR_CHUNK = 512  # Cars whose day grid is built at once, so memory stays bounded on large fleets
+
+# Every rental that overlaps the period, read once; open rentals hold their car until they come back
+RENTAL_INTERVALS = """
+    SELECT car_id, rent_date, return_date, returned_date, COALESCE(final_amount, total_price)
+    FROM rentals
+    WHERE rent_date < %s
+    AND (returned_date >= %s OR returned_date IS NULL)
+    AND status <> %s
+"""
+
+class RentalInterval(NamedTuple):
+    car_id: int
+    rent_date: date
+    return_date: date
+    returned_date: Optional[date]
+    amount: Optional[float]
+
+    COLUMNS = (INT, DATE, DATE, DATE, FLOAT)
+
+class CarUtilization(NamedTuple):
+    car_id: int
+    car: str
+    brand: str
+    rented_days: int
+    utilization: float  # Share of the period's days the car was out, 0 to 1
+    longest_idle: int  # Longest run of days without a rental
+    current_idle: int  # Days without a rental at the end of the period
+    revenue: float  # Rental amounts prorated to the days inside the period
+
+class BrandUtilization(NamedTuple):
+    brand: str
+    cars: int
+    utilization: float
+    revenue: float
+
+    @property
+    def revenue_per_car(self) -> float:
+        return self.revenue / self.cars if self.cars else 0.0
+
+class FleetReport(NamedTuple):
+    start: date
+    end: date
+    days: int
+    cars: List[CarUtilization]
+    brands: List[BrandUtilization]
+    utilization: float
+    revenue: float
+
+def ordinals(rows: ColumnarRows, name: str):
+    """Return a date column as day numbers, 0 for missing dates, without decoding each row."""
+    index = rows.row_type._fields.index(name)
+    if rows.kinds[index] == DATE:
+        return np.asarray(rows.columns[index], dtype=np.int64)
+    return np.array([value.toordinal() if value else 0 for value in rows.column(name)], dtype=np.int64)
+
+def idle_streaks(idle):
+    """Longest and trailing run of idle days of each row of a cars x days grid."""
+    counts = np.cumsum(idle, axis=1)
+    # Idle days counted since the last rented day
+    runs = counts - np.maximum.accumulate(np.where(idle, 0, counts), axis=1)
+    return runs.max(axis=1), runs[:, -1]
+
+class FleetAnalytics:
+    def __init__(self, car_chunk: int = CAR_CHUNK):
+        """Initialize the analytics engine; its worker thread starts on the first report."""
+        self.car_chunk = car_chunk
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        """Check whether the optional numpy package is installed."""
+        return np is not None
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the single worker thread reports are computed on."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FleetAnalytics")
+            return self._executor
+
+    def submit(self, start: date, end: date) -> Future:
+        """Compute a report in the background, keeping the window responsive."""
+        return self.executor().submit(self.report, start, end)
+
+    def load(self, start: date, end: date, conn=None):
+        """Read the fleet and the rentals overlapping the period, in bulk."""
+        if conn is None:
+            # Revenue reads final_amount, missing on installs upgraded from before settlements
+            rental_settlement.ensure_ready()
+            with database.get_db_connection(read_only=True) as conn:
+                return self.load(start, end, conn)
+        cars = car_repository.fleet(conn)
+        intervals = fetch_columns(RentalInterval, RENTAL_INTERVALS,
+                                  (end + timedelta(days=1), start, FILTER_STATUSES['cancelled']), conn)
+        return cars, intervals
+
+    def report(self, start: date, end: date, conn=None) -> FleetReport:
+        """Compute per-car and per-brand utilization, idle streaks and revenue over a period."""
+        if np is None:
+            raise RuntimeError("numpy is required for fleet analytics")
+        cars, intervals = self.load(start, end, conn)
+        return self.compute(cars, intervals, start, end)
+
+    def compute(self, cars: ColumnarRows, intervals: ColumnarRows, start: date, end: date,
+                today: Optional[date] = None) -> FleetReport:
+        """Vectorized analysis of rental intervals over the days of a period."""
+        first = start.toordinal()
+        days = end.toordinal() - first + 1
+        today = (today or date.today()).toordinal()
+        car_ids = np.asarray(cars.columns[0], dtype=np.int64)
+
+        # Position of each rental's car, rentals of deleted cars are dropped
+        interval_cars = np.asarray(intervals.columns[0], dtype=np.int64)
+        car_index = np.minimum(np.searchsorted(car_ids, interval_cars), max(len(car_ids) - 1, 0))
+        known = (car_ids[car_index] == interval_cars) if len(car_ids) else np.zeros(len(interval_cars), bool)
+
+        rented_from = ordinals(intervals, 'rent_date')
+        returned = ordinals(intervals, 'returned_date')
+        rented_to = np.where(returned > 0, returned, np.maximum(ordinals(intervals, 'return_date'), today))
+        amounts = np.nan_to_num(np.asarray(intervals.columns[4], dtype=np.float64))
+
+        # Days of each rental inside the period, as offsets from its first day
+        offset_from = np.maximum(rented_from, first) - first
+        offset_to = np.minimum(rented_to, first + days - 1) - first
+        keep = known & (offset_from <= offset_to)
+        car_index, offset_from, offset_to = car_index[keep], offset_from[keep], offset_to[keep]
+        share = (offset_to - offset_from + 1) / np.maximum(rented_to[keep] - rented_from[keep] + 1, 1)
+        revenue = np.bincount(car_index, weights=amounts[keep] * share, minlength=len(car_ids))
+
+        rented_days = np.zeros(len(car_ids), dtype=np.int64)
+        longest_idle = np.zeros(len(car_ids), dtype=np.int64)
+        current_idle = np.zeros(len(car_ids), dtype=np.int64)
+        order = np.argsort(car_index, kind='stable')
+        car_index, offset_from, offset_to = car_index[order], offset_from[order], offset_to[order]
+        for low in range(0, len(car_ids), self.car_chunk):
+            high = min(low + self.car_chunk, len(car_ids))
+            lo, hi = np.searchsorted(car_index, (low, high))
+            # +1 where a rental starts and -1 the day after it ends; the running sum marks rented days
+            changes = np.zeros((high - low, days + 1), dtype=np.int32)
+            np.add.at(changes, (car_index[lo:hi] - low, offset_from[lo:hi]), 1)
+            np.add.at(changes, (car_index[lo:hi] - low, offset_to[lo:hi] + 1), -1)
+            rented = np.cumsum(changes[:, :days], axis=1) > 0
+            rented_days[low:high] = rented.sum(axis=1)
+            longest_idle[low:high], current_idle[low:high] = idle_streaks(~rented)
+
+        utilization = rented_days / days
+        brands = cars.column('brand')
+        names, brand_index = np.unique(np.array(brands, dtype=str), return_inverse=True)
+        brand_cars = np.bincount(brand_index, minlength=len(names))
+        brand_days = np.bincount(brand_index, weights=rented_days, minlength=len(names))
+        brand_revenue = np.bincount(brand_index, weights=revenue, minlength=len(names))
+
+        car_rows = [
+            CarUtilization(car.id, f"{car.brand} {car.model} - {car.plate}", car.brand, int(rented_days[index]),
+                           float(utilization[index]), int(longest_idle[index]), int(current_idle[index]),
+                           round(float(revenue[index]), 2))
+            for index, car in enumerate(cars)
+        ]
+        brand_rows = [
+            BrandUtilization(str(name), int(brand_cars[index]), float(brand_days[index] / (brand_cars[index] * days)),
+                             round(float(brand_revenue[index]), 2))
+            for index, name in enumerate(names)
+        ]
+        return FleetReport(
+            start, end, days,
+            sorted(car_rows, key=lambda row: row.utilization),
+            sorted(brand_rows, key=lambda row: row.revenue, reverse=True),
+            float(utilization.mean()) if len(car_ids) else 0.0,
+            round(float(revenue.sum()), 2)
+        )
+
+fleet_analytics = FleetAnalytics()
@@ -0,0 +1,252 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import date, timedelta
+from app_shell import build_styles
+from demand_forecast import demand_forecaster
+from fleet_analytics import fleet_analytics
+
+POLL_MS = 100  # How often the window checks whether the report finished computing
+
+PERIODS = [("30 يوم", 30), ("90 يوم", 90), ("سنة", 365), ("3 سنوات", 3 * 365)]
+
+class FleetReportWindow:
+    def __init__(self, root: tk.Tk):
+        """Initialize the fleet report window and start computing its first report."""
+        self.root = root
+        self.period_days = 90
+        self.pending = {}
+        self.setup_window()
+        build_styles()
+        self.create_ui()
+        self.load_report()
+        self.load_forecast()
+
+    def setup_window(self):
+        """Configure the main window properties."""
+        self.root.title("تحليلات الأسطول")
+        self.root.geometry("1200x800")
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - 1200) // 2
+        y = (screen_height - 800) // 2
+        self.root.geometry(f"1200x800+{x}+{y}")
+        self.colors = {
+            'primary': '#6366F1',
+            'primary_dark': '#4F46E5',
+            'background': '#0F172A',
+            'surface': '#1E293B',
+            'surface_dark': '#334155',
+            'card': '#1E293B',
+            'text': '#F8FAFC',
+            'text_secondary': '#94A3B8',
+            'warning': '#F59E0B'
+        }
+        self.icons = {
+            'reports': '📊',
+            'car': '🚗',
+            'money': '💰',
+            'time': '⏰'
+        }
+        self.root.configure(bg=self.colors['background'])
+
+    def create_ui(self):
+        """Create the user interface elements."""
+        self.create_top_bar()
+        self.container = tk.Frame(self.root, bg=self.colors['background'])
+        self.container.pack(expand=True, fill='both', padx=40, pady=(0, 40))
+        self.create_period_section()
+        notebook = ttk.Notebook(self.container)
+        notebook.pack(fill='both', expand=True)
+        self.cars_tree = self.create_table(notebook, "حسب السيارة", {
+            'car': ('السيارة', 260),
+            'rented_days': ('أيام التأجير', 120),
+            'utilization': ('نسبة الاستخدام', 130),
+            'longest_idle': ('أطول فترة توقف', 140),
+            'current_idle': ('متوقفة منذ', 120),
+            'revenue': ('الإيرادات', 140)
+        })
+        self.brands_tree = self.create_table(notebook, "حسب العلامة", {
+            'brand': ('العلامة', 200),
+            'cars': ('عدد السيارات', 120),
+            'utilization': ('نسبة الاستخدام', 130),
+            'revenue': ('الإيرادات', 140),
+            'revenue_per_car': ('الإيرادات لكل سيارة', 170)
+        })
+        self.forecast_tree = self.create_table(notebook, "توقع الطلب", {
+            'car': ('العلامة والطراز', 200),
+            'fleet': ('الأسطول الحالي', 120),
+            'daily': ('الطلب اليومي', 110),
+            'rentals_30': ('إيجارات 30 يوم', 120),
+            'rentals_90': ('إيجارات 90 يوم', 120),
+            'cars_30': ('المطلوب 30 يوم', 120),
+            'cars_90': ('المطلوب 90 يوم', 120),
+            'gap': ('الفرق', 90)
+        })
+
+    def create_top_bar(self):
+        """Create the title bar."""
+        top_bar = tk.Frame(self.root, bg=self.colors['surface'])
+        top_bar.pack(fill='x', pady=(0, 15))
+        inner_top = tk.Frame(top_bar, bg=self.colors['surface'])
+        inner_top.pack(fill='x', padx=30, pady=8)
+        tk.Label(
+            inner_top,
+            text=f"{self.icons['reports']} تحليلات الأسطول",
+            font=("Segoe UI", 16, "bold"),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        ).pack(side='left')
+
+    def create_period_section(self):
+        """Create the report summary and the period buttons."""
+        period_frame = tk.Frame(self.container, bg=self.colors['card'])
+        period_frame.pack(fill='x', pady=(0, 20))
+        inner = tk.Frame(period_frame, bg=self.colors['card'])
+        inner.pack(padx=20, pady=15, fill='x')
+        self.summary_label = tk.Label(
+            inner,
+            text="",
+            font=("Segoe UI", 12, "bold"),
+            fg=self.colors['text'],
+            bg=self.colors['card']
+        )
+        self.summary_label.pack(side='left')
+        buttons = tk.Frame(inner, bg=self.colors['card'])
+        buttons.pack(side='right')
+        self.period_buttons = {}
+        for text, days in PERIODS:
+            btn = tk.Button(
+                buttons,
+                text=f"آخر {text}",
+                font=("Segoe UI", 12, "bold"),
+                fg=self.colors['text'],
+                bg=self.colors['primary'] if days == self.period_days else self.colors['surface'],
+                activebackground=self.colors['primary'],
+                bd=0,
+                padx=20,
+                pady=8,
+                cursor='hand2',
+                command=lambda d=days: self.apply_period(d)
+            )
+            btn.pack(side='left', padx=5)
+            self.period_buttons[days] = btn
+
+    def create_table(self, notebook, title, headings):
+        """Add a notebook tab holding a scrollable table."""
+        frame = tk.Frame(notebook, bg=self.colors['card'])
+        notebook.add(frame, text=title)
+        tree = ttk.Treeview(
+            frame,
+            columns=tuple(headings),
+            show='headings',
+            style='Custom.Treeview',
+            height=20,
+            selectmode='browse'
+        )
+        for col, (heading, width) in headings.items():
+            tree.heading(col, text=heading, anchor='center')
+            tree.column(col, width=width, anchor='center', stretch=False)
+        v_scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        v_scrollbar.pack(side='right', fill='y')
+        tree.configure(yscrollcommand=v_scrollbar.set)
+        tree.pack(fill='both', expand=True, padx=10, pady=10)
+        return tree
+
+    def apply_period(self, days):
+        """Highlight the picked period and recompute the report over it."""
+        for d, btn in self.period_buttons.items():
+            btn.configure(bg=self.colors['primary'] if d == days else self.colors['surface'])
+        self.period_days = days
+        self.load_report()
+
+    def load_report(self):
+        """Start computing the utilization report for the selected period."""
+        if not fleet_analytics.available():
+            self.summary_label.config(text="تحليلات الأسطول تتطلب تثبيت مكتبة numpy", fg=self.colors['warning'])
+            return
+        end = date.today()
+        start = end - timedelta(days=self.period_days - 1)
+        self.summary_label.config(text="جاري التحليل...", fg=self.colors['text_secondary'])
+        # Years of history take a few seconds, computed off the Tk thread
+        self.show_when_ready('report', fleet_analytics.submit(start, end), self.show_report)
+
+    def load_forecast(self):
+        """Start computing the demand forecast."""
+        self.show_when_ready('forecast', demand_forecaster.submit(), self.show_forecast)
+
+    def show_when_ready(self, name, future, show):
+        """Show a background result once it is computed."""
+        self.pending[name] = future
+        self.root.after(POLL_MS, lambda: self.poll(name, future, show))
+
+    def poll(self, name, future, show):
+        """Check whether a background result is ready, and show it or its error."""
+        if self.pending.get(name) is not future or not self.root.winfo_exists():
+            return  # Another period was picked meanwhile, or the window is gone
+        if not future.done():
+            self.root.after(POLL_MS, lambda: self.poll(name, future, show))
+            return
+        del self.pending[name]
+        if future.exception() is not None:
+            if name == 'report':
+                self.summary_label.config(text="")
+                self.show_error("خطأ", f"حدث خطأ أثناء تحليل الأسطول: {future.exception()}")
+            else:
+                self.show_error("خطأ", f"حدث خطأ أثناء توقع الطلب: {future.exception()}")
+            return
+        show(future.result())
+
+    def show_report(self, report):
+        """Fill the summary and the per-car and per-brand tables."""
+        self.summary_label.config(
+            text=f"{self.icons['car']} نسبة الاستخدام: {report.utilization:.0%}    {self.icons['money']} الإيرادات: {report.revenue:.2f} درهم",
+            fg=self.colors['text']
+        )
+        for tree in (self.cars_tree, self.brands_tree):
+            tree.delete(*tree.get_children())
+        for car in report.cars:
+            self.cars_tree.insert('', 'end', values=(
+                car.car,
+                car.rented_days,
+                f"{car.utilization:.0%}",
+                f"{car.longest_idle} يوم",
+                f"{car.current_idle} يوم",
+                f"{car.revenue:.2f}"
+            ))
+        for brand in report.brands:
+            self.brands_tree.insert('', 'end', values=(
+                brand.brand,
+                brand.cars,
+                f"{brand.utilization:.0%}",
+                f"{brand.revenue:.2f}",
+                f"{brand.revenue_per_car:.2f}"
+            ))
+
+    def show_forecast(self, forecasts):
+        """Fill the demand forecast table."""
+        self.forecast_tree.delete(*self.forecast_tree.get_children())
+        for forecast in forecasts:
+            self.forecast_tree.insert('', 'end', values=(
+                f"{forecast.brand} {forecast.model}",
+                forecast.fleet,
+                f"{forecast.daily_rentals:.2f}",
+                f"{forecast.rentals[30]:.0f}",
+                f"{forecast.rentals[90]:.0f}",
+                forecast.cars[30],
+                forecast.cars[90],
+                f"{forecast.gap:+d}"
+            ))
+
+    def refresh(self):
+        """Recompute the report and the forecast when the window is shown again."""
+        self.load_report()
+        self.load_forecast()
+
+    def show_error(self, title, message):
+        """Show error message."""
+        messagebox.showerror(title, message)
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    FleetReportWindow(root)
+    root.mainloop()
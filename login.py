@@ -1,12 +1,30 @@
+import startup
+startup.begin()
 import tkinter as tk
 from tkinter import ttk, messagebox
+
+# Heavy modules are only executed on first use
+startup.lazy_import('mysql.connector')
 import mysql.connector
-from main_window import MainWindow
+import database
+from session_manager import SessionManager
+import ui_monitor
+from statement_cache import register
+
+AUTHENTICATE_USER = register('authenticate_user', """
+    SELECT id, username, role FROM users 
+    WHERE username = %s AND password = %s
+""")
 
 class LoginWindow:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, session: SessionManager = None):
         """Initialize the login window with modern UI."""
         self.root = root
+        self.session = session
+
+        # Open the connection pool while the user types credentials
+        database.warm_up()
+
         self.setup_window()
         self.create_styles()
         self.create_ui()
@@ -295,21 +313,21 @@ class LoginWindow:
 
         try:
             with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
                 # Check user credentials
-                cursor.execute("""
-                    SELECT id, username, role FROM users 
-                    WHERE username = %s AND password = %s
-                """, (username, password))
-                
-                user = cursor.fetchone()
+                user = conn.execute(AUTHENTICATE_USER, (username, password)).fetchone()
                 
                 if user:
                     self.show_success("تم تسجيل الدخول بنجاح")
+
+                    # Switch the same root to the main view
+                    if self.session:
+                        self.session.start_session(user)
+                        return
+
                     self.root.withdraw()  # Hide login window
                     
                     # Open main window
+                    from main_window import MainWindow
                     main_root = tk.Toplevel()
                     main_app = MainWindow(main_root)
                     main_root.protocol("WM_DELETE_WINDOW", self.on_main_closing)
@@ -325,15 +343,10 @@ class LoginWindow:
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ غير متوقع: {e}")
 
-    def get_db_connection(self) -> mysql.connector.MySQLConnection:
+    def get_db_connection(self) -> "mysql.connector.MySQLConnection":
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection()
         except mysql.connector.Error as err:
             self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
@@ -353,9 +366,18 @@ class LoginWindow:
 
     def on_closing(self):
         """Handle login window closing."""
-        self.root.destroy()
+        if self.session:
+            self.session.quit()
+        else:
+            self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = LoginWindow(root)
+    startup.watch_first_frame(root)
+    # Installed before any widget so every callback is timed
+    export_ui_report = ui_monitor.begin(root)
+    session = SessionManager(root, LoginWindow)
+    session.show_login()
     root.mainloop()
+    if export_ui_report:
+        print(f"UI latency report written to {ui_monitor.ui_monitor.export()}")
@@ -3,14 +3,34 @@ from tkinter import messagebox
 from typing import List, Tuple, Callable, Dict
 import sys
 import mysql.connector
-from tkinter import ttk
+import database
+from overdue_sweeper import overdue_sweeper
+from repositories import rental_repository
+from offline_store import offline_store
+from notification_scheduler import notification_scheduler
+from rental_settlement import rental_settlement
+from app_shell import AppShell
 
 class MainWindow:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, session=None):
         """Initialize the main window with modern UI."""
         self.root = root
+        self.session = session
+        self.shell = AppShell(self.root)
         self.setup_window()
         self.create_ui()
+        self.start_background_services()
+
+        # Warm up the secondary windows so they open instantly
+        self.shell.preload()
+        self.shell.prebuild()
+
+    def start_background_services(self):
+        """Start background workers that precompute data for the quick views."""
+        overdue_sweeper.start()
+        notification_scheduler.start()
+        offline_store.start()
+        rental_settlement.start_migrations()
 
     def setup_window(self):
         """Set up the main window properties."""
@@ -212,7 +232,9 @@ class MainWindow:
         quick_actions = [
             (self.icons['calendar'], "حجوزات اليوم", self.colors['primary'], self.show_today_bookings),
             (self.icons['time'], "تأخر التسليم", self.colors['warning'], self.show_late_returns),
-            (self.icons['stats'], "تقرير سريع", self.colors['info'], self.show_quick_report)
+            (self.icons['stats'], "تقرير سريع", self.colors['info'], self.show_quick_report),
+            (self.icons['reports'], "تحليلات الأسطول", self.colors['success'], self.open_fleet_report),
+            (self.icons['calendar'], "جدول الإشغال", self.colors['primary'], self.open_occupancy_timeline)
         ]
 
         for icon, label, color, command in quick_actions:
@@ -422,10 +444,7 @@ class MainWindow:
     def open_window(self, window_class: str, module_name: str):
         """Generic method to open a new window."""
         try:
-            module = __import__(module_name)
-            window_class = getattr(module, window_class)
-            new_window = tk.Toplevel(self.root)
-            window_class(new_window)
+            self.shell.open(window_class, module_name)
         except ImportError:
             messagebox.showerror("خطأ", f"الملف {module_name}.py غير موجود!")
         except Exception as e:
@@ -451,9 +470,23 @@ class MainWindow:
         """Open the view rentals window."""
         self.open_window("ViewRentalsWindow", "view_rentals")
 
+    def open_fleet_report(self):
+        """Open the fleet utilization report."""
+        self.open_window("FleetReportWindow", "fleet_report")
+
+    def open_occupancy_timeline(self):
+        """Open the fleet occupancy timeline."""
+        self.open_window("OccupancyTimelineWindow", "occupancy_timeline")
+
     def logout(self):
         """Handle logout action."""
         if messagebox.askyesno("تأكيد", "هل أنت متأكد من تسجيل الخروج؟"):
+            # Switch back to the login view on the same root
+            if self.session:
+                self.session.logout()
+                return
+
+            self.shell.clear()
             self.root.destroy()
             import login
             root = tk.Tk()
@@ -469,9 +502,7 @@ class MainWindow:
     def open_search(self):
         """Open search window."""
         try:
-            new_window = tk.Toplevel(self.root)
-            from search_window import SearchWindow
-            SearchWindow(new_window)
+            self.shell.open("SearchWindow", "search_window")
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء فتح نافذة البحث: {str(e)}")
 
@@ -493,30 +524,15 @@ class MainWindow:
     def open_settings(self):
         """Open settings window."""
         try:
-            new_window = tk.Toplevel(self.root)
-            from settings_window import SettingsWindow
-            SettingsWindow(new_window)
+            self.shell.open("SettingsWindow", "settings_window")
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء فتح الإعدادات: {str(e)}")
 
     def show_today_bookings(self):
         """Show today's bookings."""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        r.id,
-                        CONCAT(c.brand, ' ', c.model) as car,
-                        cu.name as customer,
-                        DATE_FORMAT(r.rent_date, '%H:%i') as time
-                    FROM rentals r
-                    JOIN cars c ON r.car_id = c.id
-                    JOIN customers cu ON r.customer_id = cu.id
-                    WHERE DATE(r.rent_date) = CURDATE()
-                    ORDER BY r.rent_date
-                """)
-                bookings = cursor.fetchall()
+            with self.get_db_connection(read_only=True) as conn:
+                bookings = rental_repository.today_bookings(conn)
                 
                 if not bookings:
                     messagebox.showinfo("حجوزات اليوم", "لا توجد حجوزات لهذا اليوم")
@@ -525,7 +541,7 @@ class MainWindow:
                 # Format bookings into a message
                 message = "حجوزات اليوم:\n\n"
                 for booking in bookings:
-                    message += f"• {booking[1]} - {booking[2]} ({booking[3]})\n"
+                    message += f"• {booking.car} - {booking.customer} ({booking.time})\n"
                 
                 messagebox.showinfo("حجوزات اليوم", message)
         except Exception as e:
@@ -534,22 +550,11 @@ class MainWindow:
     def show_late_returns(self):
         """Show late returns."""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT 
-                        r.id,
-                        CONCAT(c.brand, ' ', c.model) as car,
-                        cu.name as customer,
-                        DATEDIFF(CURDATE(), r.return_date) as days_late
-                    FROM rentals r
-                    JOIN cars c ON r.car_id = c.id
-                    JOIN customers cu ON r.customer_id = cu.id
-                    WHERE r.returned_date IS NULL 
-                    AND r.return_date < CURDATE()
-                    ORDER BY r.return_date
-                """)
-                late_returns = cursor.fetchall()
+            # Days late are precomputed by the background overdue sweeper
+            overdue_sweeper.ensure_swept()
+            # A sweep that just ran keeps this read on the primary until the replica has it
+            with self.get_db_connection(read_only=True) as conn:
+                late_returns = rental_repository.late_returns(conn)
                 
                 if not late_returns:
                     messagebox.showinfo("تأخر التسليم", "لا توجد سيارات متأخرة في التسليم")
@@ -558,7 +563,7 @@ class MainWindow:
                 # Format late returns into a message
                 message = "السيارات المتأخرة في التسليم:\n\n"
                 for late in late_returns:
-                    message += f"• {late[1]} - {late[2]} (متأخر {late[3]} يوم)\n"
+                    message += f"• {late.car} - {late.customer} (متأخر {late.days_late} يوم)\n"
                 
                 messagebox.showinfo("تأخر التسليم", message)
         except Exception as e:
@@ -567,72 +572,34 @@ class MainWindow:
     def show_quick_report(self):
         """Show quick report."""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get total revenue
-                cursor.execute("""
-                    SELECT COALESCE(SUM(c.price * DATEDIFF(r.return_date, r.rent_date)), 0) as total_revenue
-                    FROM rentals r
-                    JOIN cars c ON r.car_id = c.id
-                    WHERE MONTH(r.rent_date) = MONTH(CURDATE())
-                    AND YEAR(r.rent_date) = YEAR(CURDATE())
-                """)
-                revenue = cursor.fetchone()[0]
-                
-                # Get active rentals
-                cursor.execute("""
-                    SELECT COUNT(*) as active_rentals
-                    FROM rentals
-                    WHERE returned_date IS NULL
-                """)
-                active_rentals = cursor.fetchone()[0]
-                
-                # Get available cars
-                cursor.execute("""
-                    SELECT COUNT(*) as available_cars
-                    FROM cars
-                    WHERE available = TRUE
-                """)
-                available_cars = cursor.fetchone()[0]
-                
-                # Format report
-                message = f"""
-                تقرير سريع:
-                
-                الإيرادات الشهرية: {revenue:.2f} درهم
-                الإيجارات النشطة: {active_rentals}
-                السيارات المتوفرة: {available_cars}
-                """
-                
-                messagebox.showinfo("تقرير سريع", message)
+            # At HQ every branch database is read in parallel and the figures are added up
+            totals, missing = rental_repository.dashboard_totals()
+            
+            # Format report
+            scope = " (جميع الفروع)" if database.is_multi_branch() else ""
+            message = f"""
+            تقرير سريع{scope}:
+            
+            الإيرادات المحصلة هذا الشهر (الإيجارات المُرجعة): {totals.revenue:.2f} درهم
+            غرامات التأخير الشهرية: {totals.late_fees:.2f} درهم
+            الإيجارات النشطة: {totals.active_rentals}
+            السيارات المتوفرة: {totals.available_cars}
+            """
+            if missing:
+                message += f"\nفروع لم تصل بياناتها: {', '.join(missing)}"
+            
+            messagebox.showinfo("تقرير سريع", message)
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء إنشاء التقرير: {str(e)}")
 
-    def get_db_connection(self):
-        """Get database connection."""
+    def get_db_connection(self, read_only=False):
+        """Get database connection, from the replica for read-only work when it is caught up."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection(read_only=read_only)
         except mysql.connector.Error as err:
             messagebox.showerror("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
 
-    def create_styles(self):
-        style = ttk.Style()
-        style.configure('Custom.TEntry', fieldbackground='white', foreground='black', borderwidth=1)
-        style.configure('Custom.Treeview', background='#F3F4F6', foreground='black', fieldbackground='#F3F4F6', borderwidth=1)
-        style.configure(
-            'Custom.Treeview.Heading',
-            background='#1E293B',  # Much darker for strong contrast
-            foreground='white',
-            font=('Segoe UI', 14, 'bold')
-        )
-
 if __name__ == "__main__":
     root = tk.Tk()
     MainWindow(root)
@@ -0,0 +1,310 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+import mysql.connector
+import database
+from overdue_sweeper import overdue_sweeper
+from settings_service import settings_service
+
+class Notification(NamedTuple):
+    kind: str
+    rental_id: Optional[int]
+    message: str
+    created_at: datetime
+
+class FileNotificationSink:
+    def __init__(self, path: str = os.path.join("notifications", "notifications.log")):
+        """Initialize a sink that appends notifications to a local file."""
+        self.path = path
+
+    def send(self, notifications: List[Notification]):
+        """Append a batch of notifications to the log file."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for n in notifications:
+                f.write(f"{n.created_at:%Y-%m-%d %H:%M:%S}\t{n.kind}\t{n.rental_id or ''}\t{n.message}\n")
+
+class OutboxNotificationSink:
+    def __init__(self, scheduler: 'NotificationScheduler'):
+        """Initialize a sink that writes notifications to the outbox table."""
+        self.scheduler = scheduler
+
+    def send(self, notifications: List[Notification]):
+        """Insert a batch of notifications into the outbox table."""
+        with self.scheduler.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO notification_outbox (kind, rental_id, message, created_at)
+                VALUES (%s, %s, %s, %s)
+            """, [(n.kind, n.rental_id, n.message, n.created_at) for n in notifications])
+            conn.commit()
+
+class NotificationScheduler:
+    # Recurring jobs: job type -> (setting that enables it, interval in seconds)
+    JOBS = {
+        'new_rental': ('new_rental', 60),
+        'rental_expiry': ('rental_expiry', 300),
+        'late_return': ('late_return', 300),
+        'daily_report': ('daily_report', 86400),
+        'daily_return_report': ('daily_return_report', 86400)
+    }
+
+    def __init__(self, sink=None, tick: int = 60):
+        """Initialize the scheduler with a notification sink and tick interval in seconds."""
+        self.sink = sink or FileNotificationSink()
+        self.tick_interval = tick
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.handlers = {
+            'new_rental': self.run_new_rental,
+            'rental_expiry': self.run_rental_expiry,
+            'late_return': self.run_late_return,
+            'daily_report': self.run_daily_report,
+            'daily_return_report': self.run_daily_return_report
+        }
+
+    def start(self):
+        """Start the background scheduler thread if it is not already running."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="NotificationScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background scheduler thread."""
+        self._stop_event.set()
+
+    def _run(self):
+        """Tick periodically until stopped."""
+        while not self._stop_event.is_set():
+            try:
+                self.tick()
+            except mysql.connector.Error:
+                pass  # Database unavailable, retry on next tick
+            self._stop_event.wait(self.tick_interval)
+
+    def ensure_schema(self, cursor):
+        """Create the job queue, outbox table and supporting indexes."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notification_jobs (
+                job_type VARCHAR(50) PRIMARY KEY,
+                interval_seconds INT NOT NULL,
+                next_run DATETIME NOT NULL,
+                last_run DATETIME NULL,
+                last_id INT NOT NULL DEFAULT 0,
+                INDEX idx_jobs_next_run (next_run)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                kind VARCHAR(50) NOT NULL,
+                rental_id INT NULL,
+                message TEXT NOT NULL,
+                created_at DATETIME NOT NULL,
+                delivered BOOLEAN DEFAULT FALSE,
+                INDEX idx_outbox_delivered (delivered, created_at)
+            )
+        """)
+
+        # Due rentals are found through this index instead of scanning rentals
+        cursor.execute("""
+            ALTER TABLE rentals
+            ADD COLUMN IF NOT EXISTS notification_sent BOOLEAN DEFAULT FALSE
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rentals_notification
+            ON rentals (notification_sent, returned_date, return_date)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rentals_rent_date
+            ON rentals (rent_date)
+        """)
+
+        overdue_sweeper.ensure_schema(cursor)
+
+        # New rentals are picked up from the highest id seen so far
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM rentals")
+        last_rental_id = cursor.fetchone()[0]
+
+        cursor.executemany("""
+            INSERT IGNORE INTO notification_jobs (job_type, interval_seconds, next_run, last_id)
+            VALUES (%s, %s, NOW(), %s)
+        """, [(job_type, interval, last_rental_id if job_type == 'new_rental' else 0)
+              for job_type, (_, interval) in self.JOBS.items()])
+
+    def tick(self):
+        """Run every job that is due and enabled."""
+        with self._lock:
+            with self.get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                if not self._schema_ready:
+                    self.ensure_schema(cursor)
+                    conn.commit()
+                    self._schema_ready = True
+
+                cursor.execute("""
+                    SELECT job_type, interval_seconds, last_id
+                    FROM notification_jobs
+                    WHERE next_run <= NOW()
+                """)
+                due_jobs = cursor.fetchall()
+                if not due_jobs:
+                    return
+
+                settings = self.load_settings()
+
+                for job_type, interval, last_id in due_jobs:
+                    if job_type not in self.handlers:
+                        continue
+
+                    # Claim the job so other workstations skip it this period
+                    cursor.execute("""
+                        UPDATE notification_jobs
+                        SET next_run = NOW() + INTERVAL %s SECOND, last_run = NOW()
+                        WHERE job_type = %s AND next_run <= NOW()
+                    """, (interval, job_type))
+                    conn.commit()
+                    if cursor.rowcount != 1:
+                        continue
+
+                    setting_name = self.JOBS[job_type][0]
+                    if not settings.get(setting_name, True):
+                        if job_type == 'new_rental':
+                            # Skip rentals created while disabled instead of flooding on re-enable
+                            cursor.execute("""
+                                UPDATE notification_jobs
+                                SET last_id = (SELECT COALESCE(MAX(id), 0) FROM rentals)
+                                WHERE job_type = 'new_rental'
+                            """)
+                            conn.commit()
+                        continue
+
+                    self.handlers[job_type](conn, cursor, last_id)
+
+    def load_settings(self) -> Dict[str, bool]:
+        """Load notification toggles from the shared settings cache."""
+        return settings_service.get()._asdict()
+
+    def notify_event(self, kind: str, rental_id: Optional[int], message: str):
+        """Deliver a one-off event notification if its setting is enabled."""
+        if settings_service.get()._asdict().get(kind, True):
+            self.deliver([Notification(kind, rental_id, message, datetime.now())])
+
+    def deliver(self, notifications: List[Notification]):
+        """Send notifications through the configured sink."""
+        if notifications:
+            self.sink.send(notifications)
+
+    def mark_sent(self, cursor, table: str, key: str, column: str, ids: List[int]):
+        """Mark a batch of rows as notified in one statement."""
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"UPDATE {table} SET {column} = TRUE WHERE {key} IN ({placeholders})", ids)
+
+    def run_new_rental(self, conn, cursor, last_id: int):
+        """Notify about rentals created since the last run."""
+        cursor.execute("""
+            SELECT r.id, cu.name, CONCAT(c.brand, ' ', c.model), r.rent_date, r.return_date
+            FROM rentals r
+            JOIN cars c ON r.car_id = c.id
+            JOIN customers cu ON r.customer_id = cu.id
+            WHERE r.id > %s
+            ORDER BY r.id
+        """, (last_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        now = datetime.now()
+        self.deliver([
+            Notification('new_rental', rental_id, f"تأجير جديد: {car} - {customer} ({rent_date} إلى {return_date})", now)
+            for rental_id, customer, car, rent_date, return_date in rows
+        ])
+        cursor.execute("UPDATE notification_jobs SET last_id = %s WHERE job_type = 'new_rental'", (rows[-1][0],))
+        conn.commit()
+
+    def run_rental_expiry(self, conn, cursor, last_id: int):
+        """Remind about open rentals that are due back today or tomorrow."""
+        cursor.execute("""
+            SELECT r.id, cu.name, CONCAT(c.brand, ' ', c.model), r.return_date
+            FROM rentals r
+            JOIN cars c ON r.car_id = c.id
+            JOIN customers cu ON r.customer_id = cu.id
+            WHERE r.notification_sent = FALSE
+            AND r.returned_date IS NULL
+            AND r.return_date BETWEEN CURDATE() AND CURDATE() + INTERVAL 1 DAY
+        """)
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        now = datetime.now()
+        self.deliver([
+            Notification('rental_expiry', rental_id, f"ينتهي التأجير قريباً: {car} - {customer} (التسليم {return_date})", now)
+            for rental_id, customer, car, return_date in rows
+        ])
+        self.mark_sent(cursor, 'rentals', 'id', 'notification_sent', [row[0] for row in rows])
+        conn.commit()
+
+    def run_late_return(self, conn, cursor, last_id: int):
+        """Notify about newly overdue rentals from the precomputed overdue table."""
+        cursor.execute("""
+            SELECT o.rental_id, cu.name, CONCAT(c.brand, ' ', c.model), o.days_late
+            FROM overdue_rentals o
+            JOIN rentals r ON r.id = o.rental_id
+            JOIN cars c ON o.car_id = c.id
+            JOIN customers cu ON o.customer_id = cu.id
+            WHERE o.notified = FALSE
+            AND r.returned_date IS NULL
+        """)
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        now = datetime.now()
+        self.deliver([
+            Notification('late_return', rental_id, f"تأخر في التسليم: {car} - {customer} (متأخر {days_late} يوم)", now)
+            for rental_id, customer, car, days_late in rows
+        ])
+        self.mark_sent(cursor, 'overdue_rentals', 'rental_id', 'notified', [row[0] for row in rows])
+        conn.commit()
+
+    def run_daily_report(self, conn, cursor, last_id: int):
+        """Send the daily rentals report."""
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(total_price), 0)
+            FROM rentals
+            WHERE rent_date >= CURDATE() AND rent_date < CURDATE() + INTERVAL 1 DAY
+        """)
+        count, revenue = cursor.fetchone()
+        self.deliver([
+            Notification('daily_report', None, f"تقرير التأجيرات اليومي: {count} تأجير بقيمة {revenue:.2f} درهم", datetime.now())
+        ])
+
+    def run_daily_return_report(self, conn, cursor, last_id: int):
+        """Send the daily returns report."""
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM rentals
+            WHERE returned_date >= CURDATE() AND returned_date < CURDATE() + INTERVAL 1 DAY
+        """)
+        count = cursor.fetchone()[0]
+        self.deliver([
+            Notification('daily_return_report', None, f"تقرير التسليم اليومي: {count} سيارة تم إرجاعها", datetime.now())
+        ])
+
+    def get_db_connection(self) -> mysql.connector.MySQLConnection:
+        """Get database connection."""
+        return database.get_db_connection()
+
+notification_scheduler = NotificationScheduler()
@@ -0,0 +1,354 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import date, timedelta
+import database
+from date_picker import MONTHS
+from pricing_engine import pricing_engine
+from repositories import car_repository, rental_repository
+
+ROW_HEIGHT = 24
+DAY_WIDTH = 26
+LABEL_WIDTH = 220
+HEADER_HEIGHT = 44
+WINDOW_DAYS = 365  # Days read at once; moving past them reads the next window
+LEAD_DAYS = 30  # Days before today the timeline opens on
+SHIFT_DAYS = 90
+WHEEL_ROWS = 3
+
+class OccupancyTimelineWindow:
+    def __init__(self, root: tk.Tk):
+        """Initialize the timeline window and read the rentals around today."""
+        self.root = root
+        self.window_start = date.today() - timedelta(days=LEAD_DAYS)
+        self.weekend_days = set()
+        self.cars = []
+        self.bars = []  # Per car row: (first day, last day, rental), days as offsets in the window
+        self.x = 0  # Scroll position in pixels
+        self.y = 0
+        self._redraw_id = None
+        self.setup_window()
+        self.create_ui()
+        self.load_data()
+
+    def setup_window(self):
+        """Configure the main window properties."""
+        self.root.title("جدول إشغال الأسطول")
+        self.root.geometry("1200x800")
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - 1200) // 2
+        y = (screen_height - 800) // 2
+        self.root.geometry(f"1200x800+{x}+{y}")
+        self.colors = {
+            'primary': '#6366F1',
+            'background': '#0F172A',
+            'surface': '#1E293B',
+            'surface_dark': '#334155',
+            'card': '#1E293B',
+            'grid': '#27354A',
+            'weekend': '#243044',
+            'text': '#F8FAFC',
+            'text_secondary': '#94A3B8',
+            'danger': '#EF4444',
+            'success': '#10B981',
+            'warning': '#F59E0B'
+        }
+        self.icons = {
+            'calendar': '📅',
+            'previous': '◀',
+            'next': '▶'
+        }
+        self.root.configure(bg=self.colors['background'])
+
+    def create_ui(self):
+        """Create the user interface elements."""
+        self.create_top_bar()
+        container = tk.Frame(
+            self.root,
+            bg=self.colors['card'],
+            highlightbackground=self.colors['primary'],
+            highlightthickness=1
+        )
+        container.pack(expand=True, fill='both', padx=40, pady=(0, 10))
+        canvas_options = dict(bg=self.colors['card'], highlightthickness=0, bd=0)
+        tk.Canvas(container, width=LABEL_WIDTH, height=HEADER_HEIGHT, **canvas_options).grid(row=0, column=0)
+        self.header = tk.Canvas(container, height=HEADER_HEIGHT, **canvas_options)
+        self.header.grid(row=0, column=1, sticky='ew')
+        self.labels = tk.Canvas(container, width=LABEL_WIDTH, **canvas_options)
+        self.labels.grid(row=1, column=0, sticky='ns')
+        self.chart = tk.Canvas(container, **canvas_options)
+        self.chart.grid(row=1, column=1, sticky='nsew')
+        self.v_scrollbar = ttk.Scrollbar(container, orient='vertical', command=self.yview)
+        self.v_scrollbar.grid(row=1, column=2, sticky='ns')
+        self.h_scrollbar = ttk.Scrollbar(container, orient='horizontal', command=self.xview)
+        self.h_scrollbar.grid(row=2, column=1, sticky='ew')
+        container.grid_rowconfigure(1, weight=1)
+        container.grid_columnconfigure(1, weight=1)
+
+        self.status_label = tk.Label(
+            self.root,
+            text="",
+            font=("Segoe UI", 11),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['background'],
+            anchor='e'
+        )
+        self.status_label.pack(fill='x', padx=40, pady=(0, 15))
+
+        self.chart.bind('<Configure>', lambda e: self.schedule_redraw())
+        self.chart.bind('<Button-1>', self.on_click)
+        for widget in (self.chart, self.labels):
+            widget.bind('<MouseWheel>', self.on_wheel)
+            widget.bind('<Shift-MouseWheel>', lambda e: self.on_wheel(e, horizontal=True))
+            widget.bind('<Button-4>', lambda e: self.scroll_by(0, -WHEEL_ROWS * ROW_HEIGHT))
+            widget.bind('<Button-5>', lambda e: self.scroll_by(0, WHEEL_ROWS * ROW_HEIGHT))
+
+    def create_top_bar(self):
+        """Create the title bar and the navigation buttons."""
+        top_bar = tk.Frame(self.root, bg=self.colors['surface'])
+        top_bar.pack(fill='x', pady=(0, 15))
+        inner_top = tk.Frame(top_bar, bg=self.colors['surface'])
+        inner_top.pack(fill='x', padx=30, pady=8)
+        tk.Label(
+            inner_top,
+            text=f"{self.icons['calendar']} جدول إشغال الأسطول",
+            font=("Segoe UI", 16, "bold"),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        ).pack(side='left')
+        buttons = tk.Frame(inner_top, bg=self.colors['surface'])
+        buttons.pack(side='right')
+        for text, command in [(f"{self.icons['previous']} السابق", lambda: self.shift_window(-SHIFT_DAYS)),
+                              ("اليوم", self.go_today),
+                              (f"التالي {self.icons['next']}", lambda: self.shift_window(SHIFT_DAYS))]:
+            tk.Button(
+                buttons,
+                text=text,
+                font=("Segoe UI", 12, "bold"),
+                fg=self.colors['text'],
+                bg=self.colors['surface_dark'],
+                activebackground=self.colors['primary'],
+                bd=0,
+                padx=20,
+                pady=6,
+                cursor='hand2',
+                command=command
+            ).pack(side='left', padx=5)
+
+    def load_data(self):
+        """Read the fleet and the rentals of the current window and group them into bars per car."""
+        window_end = self.window_start + timedelta(days=WINDOW_DAYS)
+        try:
+            with self.get_db_connection() as conn:
+                cars = car_repository.fleet(conn)
+                rentals = rental_repository.occupancy(self.window_start, window_end, conn)
+        except Exception as e:
+            self.show_error("خطأ", f"حدث خطأ أثناء تحميل جدول الإشغال: {str(e)}")
+            return
+
+        # Bars are grouped per car row, so drawing a row never looks at other cars' rentals
+        rows = {car_id: index for index, car_id in enumerate(cars.column('id'))}
+        bars = [[] for _ in range(len(cars))]
+        first = self.window_start.toordinal()
+        today = date.today()
+        for rental in rentals:
+            row = rows.get(rental.car_id)
+            if row is None:
+                continue
+            last_day = rental.returned_date or max(rental.return_date, today)
+            start = max(rental.rent_date.toordinal() - first, 0)
+            end = min(last_day.toordinal() - first, WINDOW_DAYS - 1)
+            if start <= end:
+                bars[row].append((start, end, rental))
+        for row_bars in bars:
+            row_bars.sort(key=lambda bar: bar[0])
+        self.cars, self.bars = cars, bars
+        # Shaded like the pricing rules surcharge them
+        self.weekend_days = pricing_engine.weekend_days()
+        self.status_label.config(text=f"{len(cars)} سيارة - {len(rentals)} إيجار")
+        self.scroll_to(self.x, self.y)
+
+    def shift_window(self, days):
+        """Move the window of read rentals by a number of days."""
+        self.window_start += timedelta(days=days)
+        self.load_data()
+
+    def go_today(self):
+        """Go back to the window around today."""
+        self.window_start = date.today() - timedelta(days=LEAD_DAYS)
+        self.x = 0
+        self.load_data()
+
+    def refresh(self):
+        """Read the rentals again when the window is shown again."""
+        self.load_data()
+
+    def content_size(self):
+        """Size in pixels of the whole chart."""
+        return WINDOW_DAYS * DAY_WIDTH, len(self.cars) * ROW_HEIGHT
+
+    def scroll_to(self, x, y):
+        """Scroll to a position, kept inside the chart."""
+        width, height = self.content_size()
+        self.x = int(max(0, min(x, width - self.chart.winfo_width())))
+        self.y = int(max(0, min(y, height - self.chart.winfo_height())))
+        self.schedule_redraw()
+
+    def scroll_by(self, dx, dy):
+        """Scroll by a number of pixels."""
+        self.scroll_to(self.x + dx, self.y + dy)
+
+    def yview(self, *args):
+        """Vertical scrollbar command, by car rows."""
+        self.view(args, 1, ROW_HEIGHT)
+
+    def xview(self, *args):
+        """Horizontal scrollbar command, by days."""
+        self.view(args, 0, DAY_WIDTH)
+
+    def view(self, args, axis, unit):
+        """Scrollbar commands: moveto a fraction, or scroll by units or pages."""
+        size = self.content_size()[axis]
+        page = (self.chart.winfo_width(), self.chart.winfo_height())[axis]
+        position = (self.x, self.y)[axis]
+        if args[0] == 'moveto':
+            position = float(args[1]) * size
+        elif args[0] == 'scroll':
+            position += int(args[1]) * (page if args[2] == 'pages' else unit)
+        if axis:
+            self.scroll_to(self.x, position)
+        else:
+            self.scroll_to(position, self.y)
+
+    def on_wheel(self, event, horizontal=False):
+        """Scroll rows with the mouse wheel, or days with Shift held."""
+        step = -WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS
+        if horizontal:
+            self.scroll_by(step * DAY_WIDTH, 0)
+        else:
+            self.scroll_by(0, step * ROW_HEIGHT)
+
+    def schedule_redraw(self):
+        """Redraw the viewport once Tk is idle; scroll events come in bursts."""
+        if self._redraw_id is None:
+            self._redraw_id = self.root.after_idle(self.redraw)
+
+    def visible_range(self):
+        """Car rows and days inside the viewport."""
+        width, height = self.chart.winfo_width(), self.chart.winfo_height()
+        rows = (self.y // ROW_HEIGHT, min(len(self.cars), (self.y + height) // ROW_HEIGHT + 1))
+        days = (self.x // DAY_WIDTH, min(WINDOW_DAYS, (self.x + width) // DAY_WIDTH + 1))
+        return rows, days
+
+    def redraw(self):
+        """Draw only the rows and days in view, a few hundred items whatever the fleet size."""
+        self._redraw_id = None
+        if not self.root.winfo_exists():
+            return
+        for canvas in (self.header, self.labels, self.chart):
+            canvas.delete('all')
+        (first_row, last_row), (first_day, last_day) = self.visible_range()
+        width, height = self.chart.winfo_width(), self.chart.winfo_height()
+        today = (date.today() - self.window_start).days
+
+        for day in range(first_day, last_day):
+            x = day * DAY_WIDTH - self.x
+            current = self.window_start + timedelta(days=day)
+            if current.weekday() in self.weekend_days:
+                self.chart.create_rectangle(x, 0, x + DAY_WIDTH, height, fill=self.colors['weekend'], width=0)
+            self.chart.create_line(x, 0, x, height, fill=self.colors['grid'])
+            if current.day == 1 or day == first_day:
+                self.header.create_text(
+                    x + 2, 12,
+                    text=f"{MONTHS[current.month - 1]} {current.year}",
+                    anchor='w',
+                    fill=self.colors['text'],
+                    font=("Segoe UI", 10, "bold")
+                )
+            self.header.create_text(
+                x + DAY_WIDTH / 2, 32,
+                text=str(current.day),
+                fill=self.colors['text_secondary'],
+                font=("Segoe UI", 9)
+            )
+
+        for row in range(first_row, last_row):
+            y = row * ROW_HEIGHT - self.y
+            car = self.cars[row]
+            self.labels.create_text(
+                LABEL_WIDTH - 10, y + ROW_HEIGHT / 2,
+                text=f"{car.brand} {car.model} - {car.plate}",
+                anchor='e',
+                fill=self.colors['text'],
+                font=("Segoe UI", 10)
+            )
+            self.chart.create_line(0, y + ROW_HEIGHT, width, y + ROW_HEIGHT, fill=self.colors['grid'])
+            for start, end, rental in self.bars[row]:
+                if start >= last_day:
+                    break
+                if end < first_day:
+                    continue
+                x0, x1 = start * DAY_WIDTH - self.x, (end + 1) * DAY_WIDTH - self.x
+                self.chart.create_rectangle(
+                    x0 + 1, y + 4, x1 - 1, y + ROW_HEIGHT - 4,
+                    fill=self.bar_color(rental),
+                    width=0
+                )
+                if x1 - x0 > 60:
+                    self.chart.create_text(
+                        max(x0, 0) + 6, y + ROW_HEIGHT / 2,
+                        text=rental.customer,
+                        anchor='w',
+                        fill=self.colors['text'],
+                        font=("Segoe UI", 9)
+                    )
+
+        if first_day <= today < last_day:
+            x = today * DAY_WIDTH - self.x + DAY_WIDTH / 2
+            self.chart.create_line(x, 0, x, height, fill=self.colors['warning'], width=2)
+
+        total_width, total_height = self.content_size()
+        self.h_scrollbar.set(*self.fractions(self.x, width, total_width))
+        self.v_scrollbar.set(*self.fractions(self.y, height, total_height))
+
+    @staticmethod
+    def fractions(position, page, size):
+        """Scrollbar fractions of a viewport."""
+        if size <= 0:
+            return 0.0, 1.0
+        return position / size, min(1.0, (position + page) / size)
+
+    def bar_color(self, rental):
+        """Color of a rental's bar: returned, late or running."""
+        if rental.returned_date:
+            return self.colors['surface_dark']
+        if rental.return_date < date.today():
+            return self.colors['danger']
+        return self.colors['primary']
+
+    def on_click(self, event):
+        """Show the details of the clicked rental in the status line."""
+        row = (event.y + self.y) // ROW_HEIGHT
+        day = (event.x + self.x) // DAY_WIDTH
+        if not 0 <= row < len(self.bars):
+            return
+        for start, end, rental in self.bars[row]:
+            if start <= day <= end:
+                returned = f" | أعيدت: {rental.returned_date:%Y-%m-%d}" if rental.returned_date else ""
+                self.status_label.config(
+                    text=f"#{rental.id} - {rental.customer} | من: {rental.rent_date:%Y-%m-%d} | إلى: {rental.return_date:%Y-%m-%d}{returned}"
+                )
+                return
+
+    def get_db_connection(self):
+        """Get a read-only connection; the timeline may be served by the replica."""
+        return database.get_db_connection(read_only=True)
+
+    def show_error(self, title, message):
+        """Show error message."""
+        messagebox.showerror(title, message)
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    OccupancyTimelineWindow(root)
+    root.mainloop()
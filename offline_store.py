@@ -0,0 +1,455 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import closing
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import mysql.connector
+import database
+from rental_settlement import RentalTerms, rental_settlement
+from repositories import (
+    ActiveRental, CarChoice, CustomerChoice, car_repository, customer_repository, rental_repository
+)
+from statement_cache import register
+
+OFFLINE_DB = os.path.join("offline", "car_rental.sqlite3")
+SYNC_BATCH_SIZE = 50
+SNAPSHOT_INTERVAL = 300  # Seconds between replica refreshes while online
+RETRY_INTERVAL = 30  # Seconds between reconnection attempts while offline
+
+logger = logging.getLogger(__name__)
+
+SAVED_OFFLINE_MESSAGE = "لا يوجد اتصال بقاعدة البيانات، تم حفظ العملية محلياً وستتم مزامنتها عند عودة الاتصال"
+
+# Client errors meaning the server could not be reached, as opposed to a rejected statement
+CONNECTION_ERRNOS = {2003, 2005, 2006, 2013, 2055}
+
+FIND_APPLIED = register('find_offline_applied', "SELECT server_id FROM offline_applied WHERE op_id = %s")
+
+RECORD_APPLIED = register('record_offline_applied', """
+    INSERT INTO offline_applied (op_id, server_id, applied_at)
+    VALUES (%s, %s, NOW())
+""")
+
+
+SNAPSHOT_CARS = register('snapshot_cars', "SELECT id, brand, model, plate, price, available FROM cars")
+
+SNAPSHOT_CUSTOMERS = register('snapshot_customers', "SELECT id, name, national_id FROM customers")
+
+SNAPSHOT_ACTIVE_RENTALS = register('snapshot_active_rentals', """
+    SELECT id, customer_id, car_id, rent_date, return_date, total_price
+    FROM rentals
+    WHERE returned_date IS NULL
+""")
+
+# Operation kind -> entity whose id it creates
+CREATES = {'add_car': 'car', 'add_customer': 'customer', 'rent_car': 'rental'}
+
+OPERATION_NAMES = {
+    'add_car': "إضافة سيارة",
+    'add_customer': "إضافة عميل",
+    'rent_car': "تأجير سيارة",
+    'return_car': "إرجاع سيارة"
+}
+
+def is_connection_error(err: Exception) -> bool:
+    """Check whether a database error means the server is unreachable."""
+    return isinstance(err, mysql.connector.Error) and (
+        err.errno in CONNECTION_ERRNOS or isinstance(err, mysql.connector.errors.PoolError)
+    )
+
+class SyncConflict(Exception):
+    def __init__(self, message: str, server_id: Optional[int] = None):
+        """An operation the server state no longer allows; server_id is the existing row it matches, if any."""
+        super().__init__(message)
+        self.server_id = server_id
+
+class JournalEntry(NamedTuple):
+    seq: int
+    op_id: str
+    kind: str
+    payload: dict
+
+class OfflineStore:
+    def __init__(self, path: str = OFFLINE_DB):
+        """Initialize the local replica and operation journal; the file is created on first use."""
+        self.path = path
+        self.offline = False
+        self._schema_ready = False
+        self._sync_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background sync thread if it is not already running."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="OfflineSync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background sync thread."""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def _run(self):
+        """Replay queued operations and refresh the replica until stopped."""
+        while not self._stop_event.is_set():
+            try:
+                self.sync()
+                if not self.pending_count():
+                    self.snapshot()
+                self.offline = False
+            except mysql.connector.Error as err:
+                if is_connection_error(err):
+                    self.offline = True
+            except sqlite3.Error:
+                pass  # Local file busy or unwritable, retry on next tick
+            except Exception:
+                # Anything else must not end the thread, or nothing would ever sync again
+                logger.exception("Offline sync failed")
+            self._wake_event.wait(RETRY_INTERVAL if self.offline else SNAPSHOT_INTERVAL)
+            self._wake_event.clear()
+
+    def mark_offline(self):
+        """Switch to local operation after a window lost the server, and keep retrying in the background."""
+        self.offline = True
+        self.start()
+        self._wake_event.set()
+
+    def _open(self) -> sqlite3.Connection:
+        """Open the local database; WAL keeps readers and the sync thread from blocking each other."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode = WAL")
+        # Queued operations must survive a power cut
+        db.execute("PRAGMA synchronous = FULL")
+        if not self._schema_ready:
+            self.ensure_schema(db)
+            self._schema_ready = True
+        return db
+
+    def ensure_schema(self, db: sqlite3.Connection):
+        """Create the replica tables, the journal and the local to server id map."""
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS cars (
+                id INTEGER PRIMARY KEY,
+                brand TEXT NOT NULL,
+                model TEXT NOT NULL,
+                plate TEXT NOT NULL,
+                price REAL NOT NULL,
+                available INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cars_available ON cars (available);
+            CREATE INDEX IF NOT EXISTS idx_cars_plate ON cars (plate);
+
+            CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                national_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_customers_national_id ON customers (national_id);
+
+            CREATE TABLE IF NOT EXISTS rentals (
+                id INTEGER PRIMARY KEY,
+                customer_id INTEGER NOT NULL,
+                car_id INTEGER NOT NULL,
+                rent_date TEXT NOT NULL,
+                return_date TEXT NOT NULL,
+                total_price REAL
+            );
+
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op_id TEXT UNIQUE NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, seq);
+
+            CREATE TABLE IF NOT EXISTS id_map (
+                entity TEXT NOT NULL,
+                local_id INTEGER NOT NULL,
+                server_id INTEGER NOT NULL,
+                PRIMARY KEY (entity, local_id)
+            );
+        """)
+
+    def ensure_server_schema(self, conn):
+        """Create the server table that makes replaying an operation twice a no-op."""
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS offline_applied (
+                op_id VARCHAR(36) PRIMARY KEY,
+                server_id INT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+        cursor.close()
+        rental_settlement.ensure_ready()
+
+    def snapshot(self):
+        """Replace the replica with the current cars, customers and active rentals of the server."""
+        with database.get_db_connection(read_only=True) as conn:
+            cars = conn.execute(SNAPSHOT_CARS).fetchall()
+            customers = conn.execute(SNAPSHOT_CUSTOMERS).fetchall()
+            rentals = conn.execute(SNAPSHOT_ACTIVE_RENTALS).fetchall()
+
+        with closing(self._open()) as db, db:
+            db.execute("DELETE FROM cars")
+            db.executemany("INSERT INTO cars VALUES (?, ?, ?, ?, ?, ?)",
+                           [(i, brand, model, plate, float(price), int(bool(available)))
+                            for i, brand, model, plate, price, available in cars])
+            db.execute("DELETE FROM customers")
+            db.executemany("INSERT INTO customers VALUES (?, ?, ?)", customers)
+            db.execute("DELETE FROM rentals")
+            db.executemany("INSERT INTO rentals VALUES (?, ?, ?, ?, ?, ?)",
+                           [(i, customer_id, car_id, str(rent_date), str(return_date),
+                             None if total is None else float(total))
+                            for i, customer_id, car_id, rent_date, return_date, total in rentals])
+
+    # Local reads, with the columns of the matching window statements
+
+    def customer_choices(self) -> List[CustomerChoice]:
+        with closing(self._open()) as db:
+            return [CustomerChoice._make(row) for row in db.execute("SELECT id, name, national_id FROM customers")]
+
+    def available_car_choices(self) -> List[CarChoice]:
+        with closing(self._open()) as db:
+            return [CarChoice._make(row)
+                    for row in db.execute("SELECT id, brand, model, plate, price FROM cars WHERE available = 1")]
+
+    def active_rentals(self) -> List[ActiveRental]:
+        with closing(self._open()) as db:
+            rows = db.execute("""
+                SELECT r.id, c.brand, c.model, cu.name, c.price, r.rent_date, r.return_date, r.total_price
+                FROM rentals r
+                JOIN cars c ON r.car_id = c.id
+                JOIN customers cu ON r.customer_id = cu.id
+            """).fetchall()
+        return [ActiveRental(*row[:5], datetime.fromisoformat(row[5]), date.fromisoformat(row[6]), row[7])
+                for row in rows]
+
+    def pending_count(self) -> int:
+        with closing(self._open()) as db:
+            return db.execute("SELECT COUNT(*) FROM journal WHERE status = 'pending'").fetchone()[0]
+
+    def conflicts(self) -> List[tuple]:
+        """Return the operations the server refused, with the reason, oldest first."""
+        with closing(self._open()) as db:
+            return db.execute("""
+                SELECT seq, kind, payload, created_at, result
+                FROM journal
+                WHERE status = 'conflict'
+                ORDER BY seq
+            """).fetchall()
+
+    def dismiss(self, seq: int):
+        """Mark a refused operation as reviewed so it is no longer listed."""
+        with closing(self._open()) as db, db:
+            db.execute("UPDATE journal SET status = 'dismissed' WHERE seq = ? AND status = 'conflict'", (seq,))
+
+    # Queued writes: journaled and applied to the replica in one local transaction
+
+    def _enqueue(self, db: sqlite3.Connection, kind: str, payload: dict) -> int:
+        """Append an operation to the journal and return its local id, negative so it never clashes."""
+        cursor = db.execute(
+            "INSERT INTO journal (op_id, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+            (str(uuid.uuid4()), kind, json.dumps(payload, default=str), datetime.now().isoformat())
+        )
+        return -cursor.lastrowid
+
+    def add_car(self, brand: str, model: str, plate: str, color: str, year: int, price: float) -> int:
+        """Queue a new car."""
+        with closing(self._open()) as db, db:
+            if db.execute("SELECT 1 FROM cars WHERE plate = ?", (plate,)).fetchone():
+                raise SyncConflict("رقم اللوحة موجود مسبقاً")
+            local_id = self._enqueue(db, 'add_car', {
+                'brand': brand, 'model': model, 'plate': plate, 'color': color, 'year': year, 'price': price
+            })
+            db.execute("INSERT INTO cars VALUES (?, ?, ?, ?, ?, 1)", (local_id, brand, model, plate, price))
+        return local_id
+
+    def add_customer(self, name: str, national_id: str, phone: str, email: str, address: str,
+                     license_number: str) -> int:
+        """Queue a new customer."""
+        with closing(self._open()) as db, db:
+            if db.execute("SELECT 1 FROM customers WHERE national_id = ?", (national_id,)).fetchone():
+                raise SyncConflict("رقم الهوية موجود مسبقاً")
+            local_id = self._enqueue(db, 'add_customer', {
+                'name': name, 'national_id': national_id, 'phone': phone, 'email': email,
+                'address': address, 'license_number': license_number
+            })
+            db.execute("INSERT INTO customers VALUES (?, ?, ?)", (local_id, name, national_id))
+        return local_id
+
+    def rent_car(self, customer_id: int, car_id: int, start: date, end: date, total_price: float) -> int:
+        """Queue a rental and take the car out of the local availability list."""
+        with closing(self._open()) as db, db:
+            row = db.execute("SELECT available FROM cars WHERE id = ?", (car_id,)).fetchone()
+            if not row or not row[0]:
+                raise SyncConflict("عذراً، السيارة غير متوفرة حالياً")
+            local_id = self._enqueue(db, 'rent_car', {
+                'customer_id': customer_id, 'car_id': car_id, 'start': start.isoformat(),
+                'end': end.isoformat(), 'total_price': total_price
+            })
+            db.execute("INSERT INTO rentals VALUES (?, ?, ?, ?, ?, ?)",
+                       (local_id, customer_id, car_id, start.isoformat(), end.isoformat(), total_price))
+            db.execute("UPDATE cars SET available = 0 WHERE id = ?", (car_id,))
+        return local_id
+
+    def return_car(self, rental_id: int, returned_date: date, terms: RentalTerms):
+        """Queue a return, settled on the server with the terms the window showed."""
+        with closing(self._open()) as db, db:
+            row = db.execute("SELECT car_id FROM rentals WHERE id = ?", (rental_id,)).fetchone()
+            if not row:
+                raise SyncConflict("الإيجار غير موجود أو مغلق مسبقاً")
+            self._enqueue(db, 'return_car', {
+                'rental_id': rental_id, 'returned_date': returned_date.isoformat(),
+                'daily_rate': float(terms.daily_rate), 'rent_date': str(terms.rent_date),
+                'return_date': str(terms.return_date),
+                'total_price': None if terms.total_price is None else float(terms.total_price)
+            })
+            db.execute("DELETE FROM rentals WHERE id = ?", (rental_id,))
+            db.execute("UPDATE cars SET available = 1 WHERE id = ?", (row[0],))
+
+    # Replay
+
+    def pending(self, limit: int) -> List[JournalEntry]:
+        with closing(self._open()) as db:
+            rows = db.execute("""
+                SELECT seq, op_id, kind, payload
+                FROM journal
+                WHERE status = 'pending'
+                ORDER BY seq
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return [JournalEntry(seq, op_id, kind, json.loads(payload)) for seq, op_id, kind, payload in rows]
+
+    def id_map(self) -> Dict[Tuple[str, int], int]:
+        with closing(self._open()) as db:
+            return {(entity, local_id): server_id
+                    for entity, local_id, server_id in db.execute("SELECT entity, local_id, server_id FROM id_map")}
+
+    def sync(self) -> Tuple[int, int]:
+        """Replay the journal on the server in batches, oldest first; returns applied and conflicting counts."""
+        applied = conflicts = 0
+        with self._sync_lock:
+            schema_ready = False
+            while True:
+                batch = self.pending(SYNC_BATCH_SIZE)
+                if not batch:
+                    break
+
+                ids = self.id_map()
+                outcomes = []
+                with database.get_db_connection() as conn:
+                    if not schema_ready:
+                        # DDL commits implicitly, so it must run before the batch transaction
+                        self.ensure_server_schema(conn)
+                        schema_ready = True
+                    for entry in batch:
+                        status, result, server_id = self.replay(conn, entry, ids)
+                        if server_id is not None and entry.kind in CREATES:
+                            ids[(CREATES[entry.kind], -entry.seq)] = server_id
+                        outcomes.append((entry, status, result, server_id))
+                    conn.commit()
+
+                with closing(self._open()) as db, db:
+                    for entry, status, result, server_id in outcomes:
+                        db.execute("UPDATE journal SET status = ?, result = ? WHERE seq = ?",
+                                   (status, result, entry.seq))
+                        if server_id is not None and entry.kind in CREATES:
+                            db.execute("INSERT OR REPLACE INTO id_map VALUES (?, ?, ?)",
+                                       (CREATES[entry.kind], -entry.seq, server_id))
+                applied += sum(1 for outcome in outcomes if outcome[1] == 'synced')
+                conflicts += sum(1 for outcome in outcomes if outcome[1] == 'conflict')
+        return applied, conflicts
+
+    def replay(self, conn, entry: JournalEntry, ids: Dict[Tuple[str, int], int]):
+        """Apply one operation unless it already was; returns its status, conflict reason and server id.
+
+        An operation the server rejects is undone alone and kept as a conflict, so it cannot hold back the rest.
+        """
+        row = conn.execute(FIND_APPLIED, (entry.op_id,)).fetchone()
+        if row:
+            return 'synced', None, row[0]  # Committed before the journal could be updated
+        cursor = conn.cursor()
+        cursor.execute("SAVEPOINT offline_entry")
+        try:
+            server_id = getattr(self, f"replay_{entry.kind}")(conn, entry.payload, ids)
+            conn.execute(RECORD_APPLIED, (entry.op_id, server_id))
+        except SyncConflict as conflict:
+            cursor.execute("ROLLBACK TO SAVEPOINT offline_entry")
+            return 'conflict', str(conflict), conflict.server_id
+        except mysql.connector.DatabaseError as err:
+            if is_connection_error(err):
+                raise  # The whole batch is retried once the server is back
+            cursor.execute("ROLLBACK TO SAVEPOINT offline_entry")
+            return 'conflict', err.msg, None
+        except (KeyError, TypeError, ValueError) as err:
+            cursor.execute("ROLLBACK TO SAVEPOINT offline_entry")
+            return 'conflict', f"عملية غير صالحة: {err!r}", None
+        finally:
+            cursor.close()
+        return 'synced', None, server_id
+
+    @staticmethod
+    def resolve(ids: Dict[Tuple[str, int], int], entity: str, local_id: int) -> Optional[int]:
+        """Translate an id created offline to its server id; server ids are positive and kept."""
+        return local_id if local_id > 0 else ids.get((entity, local_id))
+
+    def replay_add_car(self, conn, payload: dict, ids) -> int:
+        existing = car_repository.find_by_plate(conn, payload['plate'])
+        if existing:
+            # Same plate added elsewhere meanwhile: later operations use that car
+            raise SyncConflict("رقم اللوحة موجود مسبقاً", existing)
+        return car_repository.add(
+            conn, payload['brand'], payload['model'], payload['plate'], payload['color'], payload['year'], payload['price']
+        )
+
+    def replay_add_customer(self, conn, payload: dict, ids) -> int:
+        existing = customer_repository.find_by_national_id(conn, payload['national_id'])
+        if existing:
+            raise SyncConflict("رقم الهوية موجود مسبقاً", existing)
+        return customer_repository.add(
+            conn, payload['name'], payload['national_id'], payload['phone'], payload['email'],
+            payload['address'], payload['license_number']
+        )
+
+    def replay_rent_car(self, conn, payload: dict, ids) -> int:
+        customer_id = self.resolve(ids, 'customer', payload['customer_id'])
+        car_id = self.resolve(ids, 'car', payload['car_id'])
+        if customer_id is None or car_id is None:
+            raise SyncConflict("لم تتم مزامنة العميل أو السيارة")
+        rental_id = rental_repository.open_rental(
+            conn, customer_id, car_id, payload['start'], payload['end'], payload['total_price']
+        )
+        if rental_id is None:
+            raise SyncConflict("السيارة لم تعد متوفرة")
+        return rental_id
+
+    def replay_return_car(self, conn, payload: dict, ids) -> int:
+        rental_id = self.resolve(ids, 'rental', payload['rental_id'])
+        if rental_id is None:
+            raise SyncConflict("لم تتم مزامنة الإيجار")
+        if not rental_repository.is_open(conn, rental_id):
+            raise SyncConflict("الإيجار غير موجود أو مغلق مسبقاً")
+        terms = RentalTerms(
+            payload['daily_rate'], datetime.fromisoformat(payload['rent_date']),
+            date.fromisoformat(payload['return_date']), payload['total_price']
+        )
+        rental_repository.close_rental(conn, rental_id, terms, date.fromisoformat(payload['returned_date']))
+        return rental_id
+
+offline_store = OfflineStore()
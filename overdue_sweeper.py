@@ -0,0 +1,130 @@
+import threading
+from typing import Tuple
+import mysql.connector
+import database
+
+class OverdueSweeper:
+    def __init__(self, interval: int = 300):
+        """Initialize the overdue sweeper with its sweep interval in seconds."""
+        self.interval = interval
+        self.has_swept = False
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background sweep thread if it is not already running."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="OverdueSweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background sweep thread."""
+        self._stop_event.set()
+
+    def _run(self):
+        """Sweep periodically until stopped."""
+        while not self._stop_event.is_set():
+            try:
+                self.sweep()
+            except mysql.connector.Error:
+                pass  # Database unavailable, retry on next tick
+            self._stop_event.wait(self.interval)
+
+    def ensure_schema(self, cursor):
+        """Create the overdue rentals table and supporting indexes."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS overdue_rentals (
+                rental_id INT PRIMARY KEY,
+                car_id INT NOT NULL,
+                customer_id INT NOT NULL,
+                return_date DATE NOT NULL,
+                days_late INT NOT NULL,
+                notified BOOLEAN DEFAULT FALSE,
+                swept_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_overdue_days_late (days_late),
+                INDEX idx_overdue_notified (notified)
+            )
+        """)
+
+        # Tables created before late return notifications existed lack the notified flag
+        cursor.execute("""
+            ALTER TABLE overdue_rentals
+            ADD COLUMN IF NOT EXISTS notified BOOLEAN DEFAULT FALSE
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_overdue_notified
+            ON overdue_rentals (notified)
+        """)
+
+        # Open rentals are looked up by return date on every sweep
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rentals_open_return
+            ON rentals (returned_date, return_date)
+        """)
+
+    def sweep(self):
+        """Refresh the overdue rentals table from the rentals table."""
+        with self._lock:
+            with self.get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                if not self._schema_ready:
+                    self.ensure_schema(cursor)
+                    self._schema_ready = True
+
+                # Drop rentals that were returned, extended or deleted since the last sweep
+                cursor.execute("""
+                    DELETE FROM overdue_rentals
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM rentals r
+                        WHERE r.id = overdue_rentals.rental_id
+                        AND r.returned_date IS NULL
+                        AND r.return_date < CURDATE()
+                    )
+                """)
+
+                # Insert newly overdue rentals and refresh days late for the rest
+                cursor.execute("""
+                    INSERT INTO overdue_rentals (rental_id, car_id, customer_id, return_date, days_late)
+                    SELECT id, car_id, customer_id, return_date, DATEDIFF(CURDATE(), return_date)
+                    FROM rentals
+                    WHERE returned_date IS NULL
+                    AND return_date < CURDATE()
+                    ON DUPLICATE KEY UPDATE
+                        car_id = VALUES(car_id),
+                        customer_id = VALUES(customer_id),
+                        return_date = VALUES(return_date),
+                        days_late = VALUES(days_late)
+                """)
+
+                conn.commit()
+                self.has_swept = True
+
+    def ensure_swept(self):
+        """Run a synchronous sweep if the background thread has not swept yet."""
+        if not self.has_swept:
+            self.sweep()
+
+    def summary(self) -> Tuple[int, int]:
+        """Return the number of overdue rentals and the largest delay in days."""
+        self.ensure_swept()
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*), COALESCE(MAX(o.days_late), 0)
+                FROM overdue_rentals o
+                JOIN rentals r ON r.id = o.rental_id
+                WHERE r.returned_date IS NULL
+            """)
+            count, max_days = cursor.fetchone()
+            return int(count), int(max_days)
+
+    def get_db_connection(self) -> mysql.connector.MySQLConnection:
+        """Get database connection."""
+        return database.get_db_connection()
+
+overdue_sweeper = OverdueSweeper()
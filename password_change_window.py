@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import mysql.connector
+import database
 
 class PasswordChangeWindow:
     def __init__(self, parent):
@@ -208,12 +208,7 @@ class PasswordChangeWindow:
 
     def get_db_connection(self):
         """Get database connection."""
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="car_rental"
-        )
+        return database.get_db_connection()
 
     def save_password(self):
         """Save the new password."""
@@ -0,0 +1,165 @@
+import bisect
+import json
+import os
+import threading
+from array import array
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Set
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing_rules.json")
+
+# Days before and after today covered by the precomputed tables
+TABLE_DAYS_BEFORE = 366
+TABLE_DAYS_AFTER = 2 * 366
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Flat pricing, as before rules existed: days * daily rate
+DEFAULT_RULES = {'version': 0, 'defaults': {}, 'classes': [{'name': 'standard', 'max_daily_rate': None}]}
+
+class Quote(NamedTuple):
+    days: int
+    car_class: str
+    base: float
+    adjustments: float
+    discount: float
+    total: float
+    version: int
+
+class Penalty(NamedTuple):
+    late_days: int
+    fee: float
+    version: int
+
+def parse_month_day(value: str):
+    month, day = value.split('-')
+    return int(month), int(day)
+
+class RateTable:
+    def __init__(self, name: str, rules: dict, origin: date, length: int):
+        """Compile the rules of one car class into a prefix sum of daily rate factors."""
+        self.name = name
+        self.origin = origin
+
+        discounts = sorted((d['min_days'], d['percent'] / 100) for d in rules.get('duration_discounts', []))
+        self.discount_days = [min_days for min_days, _ in discounts]
+        self.discount_rates = [rate for _, rate in discounts]
+
+        weekend = rules.get('weekend', {})
+        self.weekend_days = {WEEKDAYS.index(day.lower()) for day in weekend.get('days', [])}
+        self.weekend_factor = 1 + weekend.get('surcharge_percent', 0) / 100
+
+        self.seasons = [(parse_month_day(s['start']), parse_month_day(s['end']), s['multiplier'])
+                        for s in rules.get('seasons', [])]
+
+        late = rules.get('late_return', {})
+        self.grace_days = late.get('grace_days', 0)
+        self.late_multiplier = late.get('multiplier', 1.0)
+        self.late_daily_fee = late.get('daily_fee', 0.0)
+
+        self.prefix = array('d', [0.0])
+        total = 0.0
+        for offset in range(length):
+            total += self.factor(origin + timedelta(days=offset))
+            self.prefix.append(total)
+
+    def factor(self, day: date) -> float:
+        """Rate multiplier of a single day."""
+        factor = 1.0
+        month_day = (day.month, day.day)
+        for start, end, multiplier in self.seasons:
+            # Seasons may wrap around the new year
+            if (start <= month_day <= end) if start <= end else (month_day >= start or month_day <= end):
+                factor *= multiplier
+        if day.weekday() in self.weekend_days:
+            factor *= self.weekend_factor
+        return factor
+
+    def factor_sum(self, first: date, days: int) -> float:
+        """Sum of the day factors of a period, from the table when it covers the period."""
+        if days <= 0:
+            return 0.0
+        start = (first - self.origin).days
+        end = start + days
+        if start >= 0 and end < len(self.prefix):
+            return self.prefix[end] - self.prefix[start]
+        return sum(self.factor(first + timedelta(days=offset)) for offset in range(days))
+
+    def discount_rate(self, days: int) -> float:
+        """Duration discount of the longest tier the rental reaches."""
+        index = bisect.bisect_right(self.discount_days, days) - 1
+        return self.discount_rates[index] if index >= 0 else 0.0
+
+class PricingEngine:
+    def __init__(self, path: str = RULES_PATH):
+        """Initialize the engine; rules are read and compiled on first use."""
+        self.path = path
+        self.version = None
+        self._bounds: List[float] = []
+        self._tables: List[RateTable] = []
+        self._lock = threading.Lock()
+
+    def load(self, today: Optional[date] = None):
+        """Read the versioned rules file and compile a rate table per car class."""
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                rules = json.load(f)
+        else:
+            rules = DEFAULT_RULES
+        self.compile(rules, today)
+
+    def compile(self, rules: dict, today: Optional[date] = None):
+        """Build the lookup tables; classes are ordered by their maximum daily rate."""
+        origin = (today or date.today()) - timedelta(days=TABLE_DAYS_BEFORE)
+        length = TABLE_DAYS_BEFORE + TABLE_DAYS_AFTER
+        defaults = rules.get('defaults', {})
+
+        classes = sorted(rules['classes'], key=lambda c: float('inf') if c.get('max_daily_rate') is None
+                         else c['max_daily_rate'])
+        bounds, tables = [], []
+        for car_class in classes:
+            overrides = {k: v for k, v in car_class.items() if k not in ('name', 'max_daily_rate')}
+            class_rules = {**defaults, **overrides}
+            bound = car_class.get('max_daily_rate')
+            bounds.append(float('inf') if bound is None else float(bound))
+            tables.append(RateTable(car_class['name'], class_rules, origin, length))
+
+        with self._lock:
+            self._bounds, self._tables = bounds, tables
+            self.version = rules.get('version', 0)
+
+    def table_for(self, daily_rate: float) -> RateTable:
+        """Return the rate table of the class a daily rate falls in."""
+        if not self._tables:
+            self.load()
+        index = min(bisect.bisect_left(self._bounds, daily_rate), len(self._tables) - 1)
+        return self._tables[index]
+
+    def weekend_days(self) -> Set[int]:
+        """Weekdays, Monday being 0, that any car class prices as the weekend."""
+        if not self._tables:
+            self.load()
+        return set().union(*(table.weekend_days for table in self._tables))
+
+    def quote(self, daily_rate, start: date, end: date) -> Quote:
+        """Price a rental from start to end, both days included."""
+        daily_rate = float(daily_rate)
+        days = (end - start).days + 1
+        table = self.table_for(daily_rate)
+        base = daily_rate * days
+        adjusted = daily_rate * table.factor_sum(start, days)
+        discount = adjusted * table.discount_rate(days)
+        return Quote(days, table.name, round(base, 2), round(adjusted - base, 2),
+                     round(discount, 2), round(adjusted - discount, 2), self.version)
+
+    def late_penalty(self, daily_rate, return_date: date, returned_date: date) -> Penalty:
+        """Price the days a car was returned after its planned return date."""
+        daily_rate = float(daily_rate)
+        table = self.table_for(daily_rate)
+        late_days = max((returned_date - return_date).days - table.grace_days, 0)
+        first_late_day = return_date + timedelta(days=1 + table.grace_days)
+        fee = (daily_rate * table.factor_sum(first_late_day, late_days) * table.late_multiplier
+               + table.late_daily_fee * late_days)
+        return Penalty(late_days, round(fee, 2), self.version)
+
+pricing_engine = PricingEngine()
@@ -1,19 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import logging
 import mysql.connector
+import database
 from datetime import datetime, timedelta
-from tkcalendar import DateEntry
 from typing import Dict, Optional
-from tkcalendar import Calendar
+from pricing_engine import pricing_engine
+from repositories import rental_repository
+from selection_model import SelectionModel
+from offline_store import SAVED_OFFLINE_MESSAGE, SyncConflict, is_connection_error, offline_store
+from customer_profile import customer_profiles
+from car_availability import car_availability
+from date_picker import DatePicker
+
+PREFETCH_POLL_MS = 50  # How often the window checks whether a prefetched profile or car's bookings arrived
+
+logger = logging.getLogger(__name__)
 
 class RentCarWindow:
     def __init__(self, root: tk.Tk):
         """Initialize the rent car window with modern UI."""
         self.root = root
+        self.booked_dates = frozenset()
         self.setup_window()
         self.create_styles()
         self.create_ui()
-        self.load_data()
+        # One date picker for both date fields, shown and hidden on demand
+        self.date_picker = DatePicker(self.root, self.colors)
+        # A window built hidden ahead of time loads its data through refresh when first shown
+        if self.root.state() != 'withdrawn':
+            self.load_data()
 
     def setup_window(self):
         """Set up the main window properties."""
@@ -57,7 +73,10 @@ class RentCarWindow:
             'check': '✓',             # Checkmark
             'cancel': '✕',            # Close
             'info': 'ℹ',             # Info
-            'save': '💾'              # Save
+            'save': '💾',             # Save
+            'phone': '📱',            # Phone
+            'license': '🪪',          # Driving license
+            'warning': '⚠'           # Warning
         }
         
         self.root.configure(bg=self.colors['background'])
@@ -66,14 +85,6 @@ class RentCarWindow:
     def create_styles(self):
         """Create and configure widget styles."""
         style = ttk.Style()
-        
-        # Entry style
-        style.configure(
-            'Custom.TEntry',
-            fieldbackground=self.colors['surface_dark'],
-            foreground=self.colors['text'],
-            borderwidth=0
-        )
 
         # Combobox style
         style.configure(
@@ -274,6 +285,10 @@ class RentCarWindow:
         self.customer_combobox.pack(fill='x', ipady=8)
         self.customer_combobox.bind('<<ComboboxSelected>>', self.on_customer_selected)
 
+        # Customer profile (filled in when the prefetched profile arrives)
+        self.customer_details_frame = tk.Frame(frame, bg=self.colors['surface_dark'])
+        self.customer_details_frame.pack(fill='x', pady=(15, 0))
+
     def create_car_fields(self, parent):
         """Create car selection fields."""
         frame = tk.Frame(parent, bg=self.colors['surface_dark'])
@@ -406,65 +421,19 @@ class RentCarWindow:
         setattr(self, f"{name}_date", datetime.now().date())
 
     def show_calendar(self, name: str):
-        """Show calendar popup for date selection."""
+        """Show the date picker under a date field, with the selected car's booked days marked."""
         try:
-            # Create a new toplevel window
-            calendar_window = tk.Toplevel(self.root)
-            calendar_window.title("اختر التاريخ")
-            calendar_window.geometry("300x300")
-            calendar_window.configure(bg=self.colors['surface'])
-
-            # Create calendar widget
-            cal = Calendar(
-                calendar_window,
-                selectmode='day',
-                year=datetime.now().year,
-                month=datetime.now().month,
-                day=datetime.now().day,
-                background=self.colors['surface'],
-                foreground=self.colors['text'],
-                selectbackground=self.colors['primary'],
-                normalbackground=self.colors['surface_dark'],
-                normalforeground=self.colors['text'],
-                weekendbackground=self.colors['surface_dark'],
-                weekendforeground=self.colors['text'],
-                othermonthbackground=self.colors['surface'],
-                othermonthforeground=self.colors['text_secondary']
-            )
-            cal.pack(padx=10, pady=10, fill='both', expand=True)
-
-            # Add OK button
-            ok_button = tk.Button(
-                calendar_window,
-                text="موافق",
-                font=("Segoe UI", 10),
-                fg=self.colors['text'],
-                bg=self.colors['primary'],
-                bd=0,
-                padx=15,
-                pady=5,
-                cursor='hand2',
-                command=lambda: self.on_date_selected(name, cal.get_date(), calendar_window)
+            self.date_picker.show(
+                getattr(self, f"{name}_button"),
+                getattr(self, f"{name}_date"),
+                lambda selected_date: self.on_date_selected(name, selected_date),
+                blocked=self.booked_dates,
+                min_date=datetime.now().date()
             )
-            ok_button.pack(pady=10)
-
-            # Center the window
-            calendar_window.update_idletasks()
-            width = calendar_window.winfo_width()
-            height = calendar_window.winfo_height()
-            x = (calendar_window.winfo_screenwidth() // 2) - (width // 2)
-            y = (calendar_window.winfo_screenheight() // 2) - (height // 2)
-            calendar_window.geometry(f'{width}x{height}+{x}+{y}')
-
-            # Make window modal
-            calendar_window.transient(self.root)
-            calendar_window.grab_set()
-            self.root.wait_window(calendar_window)
-
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ في فتح التقويم: {str(e)}")
 
-    def on_date_selected(self, name: str, selected_date: datetime.date, window: tk.Toplevel):
+    def on_date_selected(self, name: str, selected_date: datetime.date):
         """Handle date selection."""
         try:
             # Update the button text
@@ -474,9 +443,6 @@ class RentCarWindow:
             # Store the selected date
             setattr(self, f"{name}_date", selected_date)
             
-            # Close the calendar window
-            window.destroy()
-            
             # Calculate total
             self.calculate_total(None)
             
@@ -508,40 +474,114 @@ class RentCarWindow:
     def load_data(self):
         """Load customers and cars data from database."""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Load customers
-                cursor.execute("SELECT id, name, national_id FROM customers")
-                customers = cursor.fetchall()
-                self.customers = {f"{name} - {id_number}": id for id, name, id_number in customers}
-                self.customer_combobox['values'] = list(self.customers.keys())
-
-                # Load available cars
-                cursor.execute("""
-                    SELECT id, brand, model, plate, price 
-                    FROM cars 
-                    WHERE available = TRUE
-                """)
-                cars = cursor.fetchall()
-                self.cars = {f"{brand} {model} - {plate}": (id, rate) 
-                           for id, brand, model, plate, rate in cars}
-                self.car_combobox['values'] = list(self.cars.keys())
+            customers, cars = self.fetch_choices()
+
+            # Load customers
+            self.customers = SelectionModel(customers, lambda customer: f"{customer.name} - {customer.national_id}")
+            self.customers.attach(self.customer_combobox)
+
+            # Load available cars
+            self.cars = SelectionModel(cars, lambda car: f"{car.brand} {car.model} - {car.plate}")
+            self.cars.attach(self.car_combobox)
 
         except mysql.connector.Error as err:
             self.show_error("خطأ في قاعدة البيانات", f"فشل تحميل البيانات: {err}")
+        except Exception as e:
+            self.show_error("خطأ", f"حدث خطأ غير متوقع: {e}")
+
+    def fetch_choices(self):
+        """Read the customer and car lists, from the local replica while offline."""
+        if not offline_store.offline:
+            try:
+                # Both lists are independent, so the async backend loads them concurrently
+                return rental_repository.form_choices()
+            except mysql.connector.Error as err:
+                if not is_connection_error(err):
+                    raise
+                offline_store.mark_offline()
+        return offline_store.customer_choices(), offline_store.available_car_choices()
+
+    def refresh(self):
+        """Reset the form and reload customers and available cars."""
+        self.customer_combobox.set('')
+        self.car_combobox.set('')
+        for attr in ('selected_customer', 'selected_car', 'daily_rate', 'rental_days', 'total_cost'):
+            if hasattr(self, attr):
+                delattr(self, attr)
+        self.booked_dates = frozenset()
+        self.date_picker.hide()
+        for frame in (self.customer_details_frame, self.car_details_frame):
+            for widget in frame.winfo_children():
+                widget.destroy()
+        today = datetime.now().date()
+        for name in ('start_date', 'end_date'):
+            getattr(self, f"{name}_button").configure(text=today.strftime('%Y-%m-%d'))
+            setattr(self, f"{name}_date", today)
+        self.total_cost_label.config(text="0 درهم")
+        self.load_data()
 
     def on_customer_selected(self, event):
         """Handle customer selection."""
-        self.selected_customer = self.customers.get(self.customer_combobox.get())
+        self.selected_customer = self.customers.selected_id(self.customer_combobox)
+        for widget in self.customer_details_frame.winfo_children():
+            widget.destroy()
+        if self.selected_customer is not None and not offline_store.offline:
+            # The profile is read while the clerk picks the car and dates
+            self.show_profile_when_ready(self.selected_customer, customer_profiles.prefetch(self.selected_customer))
+
+    def show_profile_when_ready(self, customer_id: int, future):
+        """Show a prefetched profile once it arrives, unless another customer was picked meanwhile."""
+        if not self.root.winfo_exists() or getattr(self, 'selected_customer', None) != customer_id:
+            return
+        if not future.done():
+            self.root.after(PREFETCH_POLL_MS, lambda: self.show_profile_when_ready(customer_id, future))
+            return
+        if future.exception() is not None:
+            logger.error("Loading the profile of customer %s failed", customer_id, exc_info=future.exception())
+            return
+        if future.result() is not None:
+            self.show_profile(future.result())
+
+    def show_profile(self, profile):
+        """Show the customer's contact details and a summary of their recent rentals."""
+        tk.Label(
+            self.customer_details_frame,
+            text=f"{self.icons['phone']} {profile.phone or '-'}    {self.icons['license']} {profile.license_number or '-'}",
+            font=("Segoe UI", 11),
+            fg=self.colors['text'],
+            bg=self.colors['surface_dark']
+        ).pack(side='right', padx=5)
+
+        if not profile.history:
+            summary, color = "لا توجد إيجارات سابقة", self.colors['text_secondary']
+        elif profile.late_rentals:
+            summary = f"{self.icons['warning']} تأخر في {profile.late_rentals} من آخر {len(profile.history)} إيجارات"
+            if profile.late_fees:
+                summary += f" - غرامات {profile.late_fees:.2f} درهم"
+            color = self.colors['warning']
+        else:
+            summary, color = f"{self.icons['check']} آخر {len(profile.history)} إيجارات بدون تأخير", self.colors['success']
+        if profile.open_rentals:
+            summary += f" | إيجارات جارية: {profile.open_rentals}"
+
+        tk.Label(
+            self.customer_details_frame,
+            text=summary,
+            font=("Segoe UI", 11),
+            fg=color,
+            bg=self.colors['surface_dark']
+        ).pack(side='right', padx=5)
 
     def on_car_selected(self, event):
         """Handle car selection and update car details."""
-        selected = self.car_combobox.get()
-        if selected in self.cars:
-            car_id, daily_rate = self.cars[selected]
-            self.selected_car = car_id
-            self.daily_rate = daily_rate
+        car = self.cars.selected_row(self.car_combobox)
+        if car is not None:
+            self.selected_car = car.id
+            self.daily_rate = daily_rate = car.price
+            # Days the car is already rented or reserved, read in the background and marked in the date picker
+            self.booked_dates = frozenset()
+            if not offline_store.offline:
+                self.show_bookings_when_ready(car.id, car_availability.prefetch(car.id))
             
             # Update car details
             for widget in self.car_details_frame.winfo_children():
@@ -557,6 +597,21 @@ class RentCarWindow:
 
             self.calculate_total(None)
 
+    def show_bookings_when_ready(self, car_id: int, future):
+        """Mark a car's booked days once they arrive, unless another car was picked meanwhile."""
+        if not self.root.winfo_exists() or getattr(self, 'selected_car', None) != car_id:
+            return
+        if not future.done():
+            self.root.after(PREFETCH_POLL_MS, lambda: self.show_bookings_when_ready(car_id, future))
+            return
+        if future.exception() is not None:
+            logger.error("Loading the bookings of car %s failed", car_id, exc_info=future.exception())
+            return
+        self.booked_dates = future.result()
+        if self.date_picker.top.winfo_ismapped():
+            self.date_picker.blocked = self.booked_dates
+            self.date_picker.render()
+
     def calculate_total(self, event):
         """Calculate total rental cost."""
         try:
@@ -584,11 +639,14 @@ class RentCarWindow:
                         self.total_cost_label.config(text="0 درهم")
                         return
                     
-                    # Calculate total cost
-                    total = days * self.daily_rate
-                    self.total_cost_label.config(text=f"{total:.2f} درهم")
+                    # Price from the precomputed rate tables, no query per date change
+                    quote = pricing_engine.quote(self.daily_rate, start_date, end_date)
+                    text = f"{quote.total:.2f} درهم"
+                    if quote.discount:
+                        text += f" (خصم {quote.discount:.2f})"
+                    self.total_cost_label.config(text=text)
                     self.rental_days = days
-                    self.total_cost = total
+                    self.total_cost = quote.total
             
         except AttributeError:
             pass  # Ignore if not all fields are set yet
@@ -624,54 +682,61 @@ class RentCarWindow:
             if days < 1:
                 self.show_error("خطأ", "مدة التأجير يجب أن تكون يوم واحد على الأقل")
                 return
+
+            if any(start_date + timedelta(days=offset) in self.booked_dates for offset in range(days)):
+                self.show_error("خطأ", "السيارة محجوزة في بعض الأيام المختارة")
+                return
             
             # Calculate total cost
-            total_cost = days * self.daily_rate
+            total_cost = pricing_engine.quote(self.daily_rate, start_date, end_date).total
+
+            if offline_store.offline:
+                self.rent_car_offline(start_date, end_date, total_cost)
+                return
             
             # Connect to database
             with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Check if car is still available
-                cursor.execute("SELECT available FROM cars WHERE id = %s", (self.selected_car,))
-                result = cursor.fetchone()
-                if not result or not result[0]:
+                # Insert the rental and mark the car rented, unless it was rented meanwhile
+                rental_id = rental_repository.open_rental(
+                    conn, self.selected_customer, self.selected_car, start_date, end_date, total_cost
+                )
+                if rental_id is None:
                     self.show_error("خطأ", "عذراً، السيارة غير متوفرة حالياً")
                     return
                 
-                # Insert rental record
-                cursor.execute("""
-                    INSERT INTO rentals (customer_id, car_id, rent_date, return_date, total_price)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (self.selected_customer, self.selected_car, start_date, end_date, total_cost))
-                
-                # Update car availability
-                cursor.execute("""
-                    UPDATE cars 
-                    SET available = FALSE 
-                    WHERE id = %s
-                """, (self.selected_car,))
-                
                 conn.commit()
+                customer_profiles.invalidate(self.selected_customer)
+                car_availability.invalidate(self.selected_car)
                 self.show_success("تم تأجير السيارة بنجاح")
                 self.root.destroy()
                 
         except mysql.connector.Error as err:
-            self.show_error("خطأ في قاعدة البيانات", f"فشل تأجير السيارة: {err}")
+            if is_connection_error(err):
+                offline_store.mark_offline()
+                self.rent_car_offline(start_date, end_date, total_cost)
+            else:
+                self.show_error("خطأ في قاعدة البيانات", f"فشل تأجير السيارة: {err}")
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ غير متوقع: {str(e)}")
 
+    def rent_car_offline(self, start_date, end_date, total_cost: float):
+        """Queue the rental locally while the server is unreachable."""
+        try:
+            offline_store.rent_car(self.selected_customer, self.selected_car, start_date, end_date, total_cost)
+        except SyncConflict as conflict:
+            self.show_error("خطأ", str(conflict))
+            return
+        self.show_success(SAVED_OFFLINE_MESSAGE)
+        self.root.destroy()
+
     def get_db_connection(self) -> mysql.connector.MySQLConnection:
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection()
         except mysql.connector.Error as err:
-            self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
+            # An unreachable server is handled by switching to offline mode
+            if not is_connection_error(err):
+                self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
 
     def show_error(self, title: str, message: str):
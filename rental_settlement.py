@@ -0,0 +1,174 @@
+import logging
+import threading
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+import mysql.connector
+import database
+from pricing_engine import pricing_engine
+from statement_cache import register
+
+BATCH_SIZE = 1000
+BACKFILL_MIGRATION = 'settlement_backfill'  # Marks databases whose old rentals were settled
+
+logger = logging.getLogger(__name__)
+
+SETTLE_RENTAL = register('settle_rental', """
+    UPDATE rentals
+    SET returned_date = %s,
+        extra_days = %s,
+        late_fee = %s,
+        final_amount = %s,
+        settled_at = %s,
+        pricing_version = %s
+    WHERE id = %s
+""")
+
+class RentalTerms(NamedTuple):
+    daily_rate: float
+    rent_date: datetime
+    return_date: date
+    total_price: Optional[float]
+
+class Settlement(NamedTuple):
+    extra_days: int
+    late_fee: float
+    final_amount: float
+    version: int
+
+class RentalSettlement:
+    def __init__(self):
+        """Initialize the settlement service; columns are added at startup or on first use."""
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def ensure_schema(self, cursor):
+        """Add the settlement columns to rentals and the index the revenue reports sum over."""
+        cursor.execute("""
+            ALTER TABLE rentals
+            ADD COLUMN IF NOT EXISTS extra_days INT NULL,
+            ADD COLUMN IF NOT EXISTS late_fee DECIMAL(10, 2) NULL,
+            ADD COLUMN IF NOT EXISTS final_amount DECIMAL(10, 2) NULL,
+            ADD COLUMN IF NOT EXISTS settled_at DATETIME NULL,
+            ADD COLUMN IF NOT EXISTS pricing_version INT NULL
+        """)
+
+        # Monthly revenue and late fees are read from this index alone
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rentals_settlement
+            ON rentals (settled_at, final_amount, late_fee)
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name VARCHAR(64) PRIMARY KEY,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+
+    def ensure_ready(self):
+        """Make sure this branch's columns exist before they are first read or written this session.
+
+        DDL commits implicitly on MySQL, so it runs on a connection of its own and never inside a caller's transaction.
+        """
+        if self._schema_ready:
+            return
+        with self._lock:
+            if self._schema_ready:
+                return
+            with database.get_db_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    self.ensure_schema(cursor)
+                finally:
+                    cursor.close()
+            self._schema_ready = True
+
+    def start_migrations(self):
+        """Migrate every branch database on a background thread, so no window waits for the backfill."""
+        threading.Thread(target=self._migrate_branches, name="SettlementMigration", daemon=True).start()
+
+    def _migrate_branches(self):
+        # This workstation's branch first, its columns are needed by the windows right away
+        branches = [database.BRANCH]
+        if database.is_multi_branch():
+            branches += [branch for branch in database.BRANCHES if branch != database.BRANCH]
+        for branch in branches:
+            try:
+                if branch == database.BRANCH:
+                    self.ensure_ready()
+                with database.get_db_connection(branch) as conn:
+                    self.migrate(conn)
+            except mysql.connector.Error:
+                # Retried on next start or from Settings
+                logger.exception("Migrating the settlements of branch %s failed", branch)
+
+    def migrate(self, conn):
+        """Add the settlement columns and settle the rentals returned before they existed, once per database."""
+        cursor = conn.cursor()
+        self.ensure_schema(cursor)
+        cursor.execute("SELECT 1 FROM schema_migrations WHERE name = %s", (BACKFILL_MIGRATION,))
+        done = cursor.fetchone()
+        if not done:
+            self.backfill(conn)
+            cursor.execute("""
+                INSERT IGNORE INTO schema_migrations (name, applied_at)
+                VALUES (%s, NOW())
+            """, (BACKFILL_MIGRATION,))
+            conn.commit()
+        cursor.close()
+
+    def compute(self, terms: RentalTerms, returned_date: date) -> Settlement:
+        """Price the late days of a rental and its final amount."""
+        penalty = pricing_engine.late_penalty(terms.daily_rate, terms.return_date, returned_date)
+        if terms.total_price is None:
+            rent_date = terms.rent_date.date() if isinstance(terms.rent_date, datetime) else terms.rent_date
+            base = pricing_engine.quote(terms.daily_rate, rent_date, terms.return_date).total
+        else:
+            base = float(terms.total_price)
+        return Settlement(penalty.late_days, penalty.fee, round(base + penalty.fee, 2), penalty.version)
+
+    def settle(self, conn, rental_id: int, terms: RentalTerms, returned_date: date) -> Settlement:
+        """Close a rental with its settlement; the caller commits."""
+        settlement = self.compute(terms, returned_date)
+        conn.execute(SETTLE_RENTAL, (
+            returned_date, settlement.extra_days, settlement.late_fee, settlement.final_amount,
+            datetime.now(), settlement.version, rental_id
+        ))
+        return settlement
+
+    def backfill(self, conn, batch_size: int = BATCH_SIZE) -> int:
+        """Settle returned rentals closed before settlements existed, dated on their return day."""
+        cursor = conn.cursor()
+        self.ensure_schema(cursor)
+        settled = 0
+        last_id = 0
+        while True:
+            cursor.execute("""
+                SELECT r.id, c.price, r.rent_date, r.return_date, r.returned_date, r.total_price
+                FROM rentals r
+                JOIN cars c ON c.id = r.car_id
+                WHERE r.settled_at IS NULL
+                AND r.returned_date IS NOT NULL
+                AND r.id > %s
+                ORDER BY r.id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for rental_id, price, rent_date, return_date, returned_date, total_price in rows:
+                settlement = self.compute(RentalTerms(price, rent_date, return_date, total_price), returned_date)
+                updates.append((
+                    returned_date, settlement.extra_days, settlement.late_fee, settlement.final_amount,
+                    returned_date, settlement.version, rental_id
+                ))
+            cursor.executemany(SETTLE_RENTAL.sql, updates)
+            conn.commit()
+            settled += len(updates)
+            last_id = rows[-1][0]
+        cursor.close()
+        return settled
+
+rental_settlement = RentalSettlement()
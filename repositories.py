@@ -0,0 +1,447 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import database
+from compact_rows import DATE, DATETIME, FLOAT, INT, OBJECT, TEXT, ColumnarRows
+from federated import federated_reader
+from rental_settlement import RentalTerms, Settlement, rental_settlement
+from statement_cache import Statement, register
+
+# Every query of the rental windows, in one place so they can be cached, profiled and replayed by benchmark.py
+
+FIND_CAR_BY_PLATE = register('find_car_by_plate', "SELECT id FROM cars WHERE plate = %s")
+
+INSERT_CAR = register('insert_car', """
+    INSERT INTO cars (brand, model, plate, color, year, price, available, status)
+    VALUES (%s, %s, %s, %s, %s, %s, TRUE, 'متوفرة')
+""")
+
+AVAILABLE_CAR_CHOICES = register('available_car_choices', """
+    SELECT id, brand, model, plate, price
+    FROM cars
+    WHERE available = TRUE
+""")
+
+CHECK_CAR_AVAILABLE = register('check_car_available', "SELECT available FROM cars WHERE id = %s")
+
+MARK_CAR_RENTED = register('mark_car_rented', """
+    UPDATE cars
+    SET available = FALSE
+    WHERE id = %s
+""")
+
+RELEASE_CAR = register('release_car', """
+    UPDATE cars
+    SET available = TRUE, status = 'متوفرة'
+    WHERE id = (SELECT car_id FROM rentals WHERE id = %s)
+""")
+
+AVAILABLE_CARS_COUNT = register('available_cars_count', """
+    SELECT COUNT(*) as available_cars
+    FROM cars
+    WHERE available = TRUE
+""")
+
+SEARCH_CARS = register('search_cars', """
+    SELECT id, CONCAT(brand, ' ', model) as name,
+           CONCAT('اللون: ', color, ' | السعر: ', price, ' درهم') as details
+    FROM cars
+    WHERE brand LIKE %s OR model LIKE %s OR plate LIKE %s
+""")
+
+FIND_CUSTOMER_BY_NATIONAL_ID = register('find_customer_by_national_id',
+                                        "SELECT id FROM customers WHERE national_id = %s")
+
+INSERT_CUSTOMER = register('insert_customer', """
+    INSERT INTO customers (name, national_id, phone, email, address, license_number)
+    VALUES (%s, %s, %s, %s, %s, %s)
+""")
+
+CUSTOMER_CHOICES = register('customer_choices', "SELECT id, name, national_id FROM customers")
+
+SEARCH_CUSTOMERS = register('search_customers', """
+    SELECT id, name, CONCAT('الهاتف: ', phone) as details
+    FROM customers
+    WHERE name LIKE %s OR phone LIKE %s
+""")
+
+TODAY_BOOKINGS = register('today_bookings', """
+    SELECT
+        r.id,
+        CONCAT(c.brand, ' ', c.model) as car,
+        cu.name as customer,
+        DATE_FORMAT(r.rent_date, '%H:%i') as time
+    FROM rentals r
+    JOIN cars c ON r.car_id = c.id
+    JOIN customers cu ON r.customer_id = cu.id
+    WHERE DATE(r.rent_date) = CURDATE()
+    ORDER BY r.rent_date
+""")
+
+LATE_RETURNS = register('late_returns', """
+    SELECT
+        o.rental_id,
+        CONCAT(c.brand, ' ', c.model) as car,
+        cu.name as customer,
+        o.days_late
+    FROM overdue_rentals o
+    JOIN rentals r ON r.id = o.rental_id
+    JOIN cars c ON o.car_id = c.id
+    JOIN customers cu ON o.customer_id = cu.id
+    WHERE r.returned_date IS NULL
+    ORDER BY o.days_late DESC
+""")
+
+# Settled amounts are stored at return time, so monthly sums are index range scans
+MONTHLY_REVENUE = register('monthly_revenue', """
+    SELECT COALESCE(SUM(final_amount), 0) as total_revenue
+    FROM rentals
+    WHERE settled_at >= LAST_DAY(CURDATE() - INTERVAL 1 MONTH) + INTERVAL 1 DAY
+    AND settled_at < LAST_DAY(CURDATE()) + INTERVAL 1 DAY
+""")
+
+MONTHLY_LATE_FEES = register('monthly_late_fees', """
+    SELECT COALESCE(SUM(late_fee), 0) as total_late_fees
+    FROM rentals
+    WHERE settled_at >= LAST_DAY(CURDATE() - INTERVAL 1 MONTH) + INTERVAL 1 DAY
+    AND settled_at < LAST_DAY(CURDATE()) + INTERVAL 1 DAY
+""")
+
+ACTIVE_RENTALS_COUNT = register('active_rentals_count', """
+    SELECT COUNT(*) as active_rentals
+    FROM rentals
+    WHERE returned_date IS NULL
+""")
+
+ACTIVE_RENTALS = register('active_rentals', """
+    SELECT r.id, c.brand, c.model, cu.name, c.price, r.rent_date, r.return_date, r.total_price
+    FROM rentals r
+    JOIN cars c ON r.car_id = c.id
+    JOIN customers cu ON r.customer_id = cu.id
+    WHERE r.returned_date IS NULL OR r.returned_date = ''
+""")
+
+RENTAL_RETURNED_DATE = register('rental_returned_date', "SELECT returned_date FROM rentals WHERE id = %s")
+
+INSERT_RENTAL = register('insert_rental', """
+    INSERT INTO rentals (customer_id, car_id, rent_date, return_date, total_price)
+    VALUES (%s, %s, %s, %s, %s)
+""")
+
+SEARCH_RENTALS = register('search_rentals', """
+    SELECT r.id,
+           CONCAT(c.name, ' - ', car.brand, ' ', car.model) as name,
+           CONCAT('من: ', DATE_FORMAT(r.rent_date, '%Y-%m-%d'),
+                 ' | إلى: ', DATE_FORMAT(r.return_date, '%Y-%m-%d')) as details
+    FROM rentals r
+    JOIN customers c ON r.customer_id = c.id
+    JOIN cars car ON r.car_id = car.id
+    WHERE c.name LIKE %s OR car.brand LIKE %s OR car.model LIKE %s
+""")
+
+FILTER_STATUSES = {
+    'active': 'قيد التأجير',
+    'completed': 'منتهية',
+    'cancelled': 'ملغية'
+}
+
+FLEET_CARS = "SELECT id, brand, model, plate FROM cars ORDER BY id"
+
+# One car's rentals still out or starting before a day, read through the car index;
+# a returned rental frees the car on its return day, so it books nothing
+CAR_BOOKINGS = register('car_bookings', """
+    SELECT rent_date, return_date
+    FROM rentals
+    WHERE car_id = %s
+    AND rent_date < %s
+    AND returned_date IS NULL
+    AND status <> %s
+""")
+
+# Rentals overlapping a date window: started in it, returned in it or later, or still out.
+# Each branch is a range scan on the rent date or the returned date index.
+OCCUPANCY = register('occupancy', """
+    SELECT r.id, r.car_id, r.rent_date, r.return_date, r.returned_date, c.name
+    FROM rentals r
+    JOIN customers c ON r.customer_id = c.id
+    WHERE r.rent_date >= %s AND r.rent_date < %s AND r.status <> %s
+    UNION ALL
+    SELECT r.id, r.car_id, r.rent_date, r.return_date, r.returned_date, c.name
+    FROM rentals r
+    JOIN customers c ON r.customer_id = c.id
+    WHERE r.returned_date >= %s AND r.rent_date < %s AND r.status <> %s
+    UNION ALL
+    SELECT r.id, r.car_id, r.rent_date, r.return_date, r.returned_date, c.name
+    FROM rentals r
+    JOIN customers c ON r.customer_id = c.id
+    WHERE r.returned_date IS NULL AND r.rent_date < %s AND r.status <> %s
+""")
+
+# Row types read in bulk declare the kind of each column, see compact_rows
+
+class CarChoice(NamedTuple):
+    id: int
+    brand: str
+    model: str
+    plate: str
+    price: float
+
+    COLUMNS = (INT, TEXT, TEXT, OBJECT, FLOAT)
+
+class CustomerChoice(NamedTuple):
+    id: int
+    name: str
+    national_id: str
+
+    COLUMNS = (INT, TEXT, OBJECT)
+
+class SearchResult(NamedTuple):
+    id: int
+    name: str
+    details: str
+    branch: Optional[str] = None  # Set by searches across all branches
+
+class Booking(NamedTuple):
+    id: int
+    car: str
+    customer: str
+    time: str
+
+class LateReturn(NamedTuple):
+    rental_id: int
+    car: str
+    customer: str
+    days_late: int
+
+class ActiveRental(NamedTuple):
+    id: int
+    brand: str
+    model: str
+    customer: str
+    daily_rate: float
+    rent_date: datetime
+    return_date: date
+    total_price: Optional[float]
+
+    COLUMNS = (INT, TEXT, TEXT, TEXT, FLOAT, DATETIME, DATE, FLOAT)
+
+    @property
+    def terms(self) -> RentalTerms:
+        return RentalTerms(self.daily_rate, self.rent_date, self.return_date, self.total_price)
+
+class RentalListRow(NamedTuple):
+    id: int
+    car_info: str
+    customer: str
+    rent_date: datetime
+    return_date: date
+    status: str
+
+    COLUMNS = (INT, TEXT, TEXT, DATETIME, DATE, TEXT)
+
+class CarBooking(NamedTuple):
+    rent_date: datetime
+    return_date: date
+
+class FleetCar(NamedTuple):
+    id: int
+    brand: str
+    model: str
+    plate: str
+
+    COLUMNS = (INT, TEXT, TEXT, OBJECT)
+
+class OccupancyBar(NamedTuple):
+    id: int
+    car_id: int
+    rent_date: date
+    return_date: date
+    returned_date: Optional[date]
+    customer: str
+
+    COLUMNS = (INT, INT, DATE, DATE, DATE, TEXT)
+
+class DashboardTotals(NamedTuple):
+    revenue: float
+    late_fees: float
+    active_rentals: int
+    available_cars: int
+
+def fetch(row_type, query, params=(), conn=None) -> list:
+    """Run a read, on its own read-only connection unless one is given, and wrap its rows."""
+    if conn is None:
+        with database.get_db_connection(read_only=True) as conn:
+            return fetch(row_type, query, params, conn)
+    return [row_type._make(row) for row in database.fetch_rows(conn, query, params)]
+
+def fetch_columns(row_type, query, params=(), conn=None) -> ColumnarRows:
+    """Run a large read and keep its rows column by column, streaming plain SQL from the server in batches."""
+    if conn is None:
+        with database.get_db_connection(read_only=True) as conn:
+            return fetch_columns(row_type, query, params, conn)
+    if isinstance(query, Statement):
+        return ColumnarRows(row_type, row_type.COLUMNS, conn.execute(query, params).fetchall())
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return ColumnarRows(row_type, row_type.COLUMNS, stream(cursor))
+    finally:
+        cursor.close()
+
+def stream(cursor, batch_size: int = 1000):
+    """Yield the rows of a cursor a batch at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def like_params(text: str, count: int) -> tuple:
+    """Build the LIKE parameters of a search."""
+    return (f'%{text}%',) * count
+
+class CarRepository:
+    def find_by_plate(self, conn, plate: str) -> Optional[int]:
+        """Return the id of the car with a plate, if any."""
+        row = conn.execute(FIND_CAR_BY_PLATE, (plate,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, conn, brand: str, model: str, plate: str, color: str, year: int, price: float) -> int:
+        """Insert an available car and return its id; the caller commits."""
+        return conn.execute(INSERT_CAR, (brand, model, plate, color, year, price)).lastrowid
+
+    def is_available(self, conn, car_id: int) -> bool:
+        row = conn.execute(CHECK_CAR_AVAILABLE, (car_id,)).fetchone()
+        return bool(row and row[0])
+
+    def available_choices(self, conn=None) -> ColumnarRows:
+        return fetch_columns(CarChoice, AVAILABLE_CAR_CHOICES, (), conn)
+
+    def fleet(self, conn=None) -> ColumnarRows:
+        return fetch_columns(FleetCar, FLEET_CARS, (), conn)
+
+    def search_query(self, text: str) -> Tuple[Statement, tuple]:
+        return SEARCH_CARS, like_params(text, 3)
+
+class CustomerRepository:
+    def find_by_national_id(self, conn, national_id: str) -> Optional[int]:
+        """Return the id of the customer with a national id, if any."""
+        row = conn.execute(FIND_CUSTOMER_BY_NATIONAL_ID, (national_id,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, conn, name: str, national_id: str, phone: str, email: str, address: str,
+            license_number: str) -> int:
+        """Insert a customer and return its id; the caller commits."""
+        return conn.execute(INSERT_CUSTOMER, (name, national_id, phone, email, address, license_number)).lastrowid
+
+    def choices(self, conn=None) -> ColumnarRows:
+        return fetch_columns(CustomerChoice, CUSTOMER_CHOICES, (), conn)
+
+    def search_query(self, text: str) -> Tuple[Statement, tuple]:
+        return SEARCH_CUSTOMERS, like_params(text, 2)
+
+class RentalRepository:
+    def open_rental(self, conn, customer_id: int, car_id: int, start: date, end: date, total_price: float) -> Optional[int]:
+        """Rent a car that is still available and return the rental id, None if it is not; the caller commits."""
+        if not car_repository.is_available(conn, car_id):
+            return None
+        rental_id = conn.execute(INSERT_RENTAL, (customer_id, car_id, start, end, total_price)).lastrowid
+        conn.execute(MARK_CAR_RENTED, (car_id,))
+        return rental_id
+
+    def close_rental(self, conn, rental_id: int, terms: RentalTerms, returned_date: date) -> Settlement:
+        """Settle a rental and make its car available again; the caller commits."""
+        settlement = rental_settlement.settle(conn, rental_id, terms, returned_date)
+        conn.execute(RELEASE_CAR, (rental_id,))
+        return settlement
+
+    def is_open(self, conn, rental_id: int) -> bool:
+        """Check that a rental exists and was not returned yet."""
+        row = conn.execute(RENTAL_RETURNED_DATE, (rental_id,)).fetchone()
+        return row is not None and row[0] is None
+
+    def active(self, conn=None) -> ColumnarRows:
+        return fetch_columns(ActiveRental, ACTIVE_RENTALS, (), conn)
+
+    def today_bookings(self, conn=None) -> List[Booking]:
+        return fetch(Booking, TODAY_BOOKINGS, (), conn)
+
+    def late_returns(self, conn=None) -> List[LateReturn]:
+        """Overdue rentals from the table kept by the overdue sweeper, longest delay first."""
+        return fetch(LateReturn, LATE_RETURNS, (), conn)
+
+    def form_choices(self, conn=None) -> Tuple[ColumnarRows, ColumnarRows]:
+        """Read the customers and available cars of the rent form, concurrently on the async backend."""
+        customers, cars = database.run_queries([(CUSTOMER_CHOICES, ()), (AVAILABLE_CAR_CHOICES, ())], conn)
+        return (ColumnarRows(CustomerChoice, CustomerChoice.COLUMNS, customers),
+                ColumnarRows(CarChoice, CarChoice.COLUMNS, cars))
+
+    def dashboard_totals(self, conn=None) -> Tuple[DashboardTotals, List[str]]:
+        """Monthly revenue and late fees, active rentals and available cars; across branches at HQ.
+
+        Also returns the names of the branches that did not answer. A given connection reads one database only.
+        """
+        rental_settlement.ensure_ready()
+        queries = [(MONTHLY_REVENUE, ()), (MONTHLY_LATE_FEES, ()), (ACTIVE_RENTALS_COUNT, ()), (AVAILABLE_CARS_COUNT, ())]
+        if conn is None and database.is_multi_branch():
+            totals, missing = federated_reader.totals(queries)
+            return DashboardTotals(*totals), missing
+        return DashboardTotals(*(rows[0][0] for rows in database.run_queries(queries, conn))), []
+
+    def list_query(self, current_filter: str, search_text: str) -> Tuple[str, list]:
+        """Build the rentals list query for a status filter and search text."""
+        query = '''
+            SELECT r.id, CONCAT(car.brand, ' ', car.model, ' - ', car.plate) as car_info,
+                   c.name as customer, r.rent_date, r.return_date, r.status
+            FROM rentals r
+            JOIN customers c ON r.customer_id = c.id
+            JOIN cars car ON r.car_id = car.id
+            WHERE 1=1
+        '''
+        params = []
+        if current_filter in FILTER_STATUSES:
+            query += " AND r.status = %s"
+            params.append(FILTER_STATUSES[current_filter])
+        if search_text:
+            query += ''' AND (
+                c.name LIKE %s OR
+                car.model LIKE %s OR
+                car.plate LIKE %s OR
+                car.brand LIKE %s OR
+                CAST(r.id AS CHAR) LIKE %s
+            )'''
+            params.extend(like_params(search_text, 5))
+        query += " ORDER BY r.rent_date DESC"
+        return query, params
+
+    def list_rentals(self, current_filter: str, search_text: str, conn=None) -> ColumnarRows:
+        return fetch_columns(RentalListRow, *self.list_query(current_filter, search_text), conn)
+
+    def occupancy(self, start: date, end: date, conn=None) -> ColumnarRows:
+        """Rentals holding a car on any day from start up to, not including, end."""
+        cancelled = FILTER_STATUSES['cancelled']
+        return fetch_columns(OccupancyBar, OCCUPANCY, (start, end, cancelled, start, start, cancelled, start, cancelled), conn)
+
+    def car_bookings(self, car_id: int, end: date, conn=None) -> List[CarBooking]:
+        """Open rentals of one car that start before end; a late one holds the car until it comes back."""
+        return fetch(CarBooking, CAR_BOOKINGS, (car_id, end, FILTER_STATUSES['cancelled']), conn)
+
+    def search_query(self, text: str) -> Tuple[Statement, tuple]:
+        return SEARCH_RENTALS, like_params(text, 3)
+
+car_repository = CarRepository()
+customer_repository = CustomerRepository()
+rental_repository = RentalRepository()
+
+# Search types of the search window and the repository answering each
+SEARCHES = {'cars': car_repository, 'customers': customer_repository, 'rentals': rental_repository}
+
+def search(search_types: Iterable[str], text: str, conn=None) -> Dict[str, List[SearchResult]]:
+    """Search several types at once, concurrently on the async backend."""
+    search_types = list(search_types)
+    results = database.run_queries([SEARCHES[name].search_query(text) for name in search_types], conn)
+    return {name: [SearchResult(*row) for row in rows] for name, rows in zip(search_types, results)}
+
+def search_branches(search_type: str, text: str) -> Tuple[List[SearchResult], List[str]]:
+    """Search one type in every branch database; also returns the branches that did not answer."""
+    rows, missing = federated_reader.search(*SEARCHES[search_type].search_query(text))
+    return [SearchResult(*row[1:], branch=row[0]) for row in rows], missing
@@ -1,19 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import logging
 import mysql.connector
+import database
 from datetime import datetime
 import sys
 from typing import Dict, Optional
-from tkcalendar import DateEntry
+from car_availability import car_availability
+from customer_profile import customer_profiles
+from notification_scheduler import notification_scheduler
+from pricing_engine import pricing_engine
+from rental_settlement import rental_settlement
+from repositories import rental_repository
+from selection_model import SelectionModel
+from offline_store import SAVED_OFFLINE_MESSAGE, SyncConflict, is_connection_error, offline_store
+
+logger = logging.getLogger(__name__)
 
 class ReturnCarWindow:
     def __init__(self, root: tk.Tk):
         """Initialize the return car window with modern UI."""
         self.root = root
+        self.rentals = SelectionModel()
         self.setup_window()
         self.create_styles()
         self.create_ui()
-        self.load_active_rentals()
+        # A window built hidden ahead of time loads its data through refresh when first shown
+        if self.root.state() != 'withdrawn':
+            self.load_active_rentals()
 
     def setup_window(self):
         """Set up the main window properties."""
@@ -81,14 +95,6 @@ class ReturnCarWindow:
             borderwidth=0
         )
 
-        # Entry style for calendar
-        style.configure(
-            'Custom.TEntry',
-            fieldbackground=self.colors['surface'],
-            foreground=self.colors['text'],
-            borderwidth=0
-        )
-
     def create_ui(self):
         """Create the user interface elements."""
         # Top bar
@@ -194,7 +200,8 @@ class ReturnCarWindow:
             bg=self.colors['surface_dark']
         ).pack(side='left', padx=10, pady=8)
 
-        # Date entry with modern styling
+        # Date entry with modern styling, imported on first use to keep startup fast
+        from tkcalendar import DateEntry
         self.return_date_entry = DateEntry(
             date_container,
             width=15,
@@ -207,6 +214,19 @@ class ReturnCarWindow:
         )
         self.return_date_entry.pack(side='left', padx=(0, 10), pady=8)
 
+        # Late penalty, priced locally whenever the rental or date changes
+        self.penalty_label = tk.Label(
+            date_section,
+            text="",
+            font=("Segoe UI", 11),
+            fg=self.colors['warning'],
+            bg=self.colors['surface'],
+            anchor='e'
+        )
+        self.penalty_label.pack(fill='x', pady=(8, 0))
+        self.rental_cb.bind('<<ComboboxSelected>>', lambda e: self.update_penalty())
+        self.return_date_entry.bind('<<DateEntrySelected>>', lambda e: self.update_penalty())
+
     def create_section(self, title: str, description: str) -> tk.Frame:
         """Create a form section with title and description."""
         section = tk.Frame(self.inner_frame, bg=self.colors['surface'])
@@ -281,32 +301,60 @@ class ReturnCarWindow:
     def load_active_rentals(self):
         """Load active rentals from the database."""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT r.id, c.brand, c.model, cu.name 
-                    FROM rentals r
-                    JOIN cars c ON r.car_id = c.id
-                    JOIN customers cu ON r.customer_id = cu.id
-                    WHERE r.returned_date IS NULL OR r.returned_date = ''
-                """)
-                rentals = cursor.fetchall()
-
-                self.rentals_dict = {}
-                display_values = []
-                for rental in rentals:
-                    rental_id, brand, model, customer_name = rental
-                    display_text = f"#{rental_id} - {brand} {model} - {customer_name}"
-                    display_values.append(display_text)
-                    self.rentals_dict[display_text] = rental_id
-
-                self.rental_cb['values'] = display_values
+            rentals = self.fetch_active_rentals()
+
+            self.rentals = SelectionModel(
+                rentals, lambda rental: f"#{rental.id} - {rental.brand} {rental.model} - {rental.customer}"
+            )
+            self.rentals.attach(self.rental_cb)
 
         except mysql.connector.Error as err:
             self.show_error("خطأ في قاعدة البيانات", f"فشل تحميل بيانات الإيجارات: {err}")
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ غير متوقع: {e}")
 
+    def fetch_active_rentals(self):
+        """Read the active rentals, from the local replica while offline."""
+        if not offline_store.offline:
+            try:
+                with self.get_db_connection() as conn:
+                    return rental_repository.active(conn)
+            except mysql.connector.Error as err:
+                if not is_connection_error(err):
+                    raise
+                offline_store.mark_offline()
+        return offline_store.active_rentals()
+
+    def refresh(self):
+        """Reset the form and reload active rentals."""
+        self.rental_cb.set('')
+        self.return_date_entry.set_date(datetime.now().date())
+        self.penalty_label.config(text="")
+        self.load_active_rentals()
+
+    def late_penalty(self, rental_id: int, return_date):
+        """Price the late return of a rental with the pricing engine."""
+        rental = self.rentals.row_for(rental_id)
+        if rental is None:
+            return None
+        terms = rental.terms
+        return pricing_engine.late_penalty(terms.daily_rate, terms.return_date, return_date)
+
+    def update_penalty(self):
+        """Show the late penalty for the selected rental and return date."""
+        try:
+            rental_id = self.rentals.selected_id(self.rental_cb)
+            return_date = datetime.strptime(self.return_date_entry.get(), "%Y-%m-%d").date()
+        except ValueError:
+            return
+        penalty = self.late_penalty(rental_id, return_date) if rental_id else None
+        if penalty and penalty.late_days:
+            self.penalty_label.config(
+                text=f"{self.icons['warning']} تأخير {penalty.late_days} يوم - غرامة {penalty.fee:.2f} درهم"
+            )
+        else:
+            self.penalty_label.config(text="")
+
     def return_car(self):
         """Process the car return."""
         if not self.validate_inputs():
@@ -315,35 +363,58 @@ class ReturnCarWindow:
         try:
             selected_rental = self.rental_cb.get()
             return_date = datetime.strptime(self.return_date_entry.get(), "%Y-%m-%d").date()
-            rental_id = self.rentals_dict.get(selected_rental)
+            rental_id = self.rentals.selected_id(self.rental_cb)
+            if offline_store.offline:
+                self.return_car_offline(rental_id, return_date)
+                return
 
+            # Settlement columns are added outside the return's transaction, usually already at startup
+            rental_settlement.ensure_ready()
             with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Update rental record
-                cursor.execute("""
-                    UPDATE rentals 
-                    SET returned_date = %s 
-                    WHERE id = %s
-                """, (return_date, rental_id))
-
-                # Update car status
-                cursor.execute("""
-                    UPDATE cars 
-                    SET available = TRUE, status = 'متوفرة' 
-                    WHERE id = (SELECT car_id FROM rentals WHERE id = %s)
-                """, (rental_id,))
+                # Close the rental with its late days, fee and final amount, and free the car
+                settlement = rental_repository.close_rental(conn, rental_id, self.rentals.row_for(rental_id).terms, return_date)
 
                 conn.commit()
-                
-                self.show_success("تم إرجاع السيارة بنجاح")
+                # The returning customer's recent history and the car's booked days changed
+                customer_profiles.invalidate()
+                car_availability.invalidate()
+
+                try:
+                    notification_scheduler.notify_event(
+                        'return_notification',
+                        rental_id,
+                        f"تم إرجاع السيارة: {selected_rental} ({return_date})"
+                    )
+                except Exception:
+                    # Notifications must never block a return
+                    logger.exception("Return notification failed for rental %s", rental_id)
+
+                message = "تم إرجاع السيارة بنجاح"
+                if settlement.extra_days:
+                    message += f"\nغرامة التأخير: {settlement.late_fee:.2f} درهم ({settlement.extra_days} يوم)"
+                message += f"\nالمبلغ النهائي: {settlement.final_amount:.2f} درهم"
+                self.show_success(message)
                 self.root.destroy()
 
         except mysql.connector.Error as err:
-            self.show_error("خطأ في قاعدة البيانات", f"فشل عملية الإرجاع: {err}")
+            if is_connection_error(err):
+                offline_store.mark_offline()
+                self.return_car_offline(rental_id, return_date)
+            else:
+                self.show_error("خطأ في قاعدة البيانات", f"فشل عملية الإرجاع: {err}")
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ غير متوقع: {e}")
 
+    def return_car_offline(self, rental_id: int, return_date):
+        """Queue the return locally while the server is unreachable."""
+        try:
+            offline_store.return_car(rental_id, return_date, self.rentals.row_for(rental_id).terms)
+        except SyncConflict as conflict:
+            self.show_error("خطأ", str(conflict))
+            return
+        self.show_success(SAVED_OFFLINE_MESSAGE)
+        self.root.destroy()
+
     def validate_inputs(self) -> bool:
         """Validate form inputs."""
         selected_rental = self.rental_cb.get()
@@ -368,14 +439,11 @@ class ReturnCarWindow:
     def get_db_connection(self) -> mysql.connector.MySQLConnection:
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection()
         except mysql.connector.Error as err:
-            self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
+            # An unreachable server is handled by switching to offline mode
+            if not is_connection_error(err):
+                self.show_error("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
 
     def show_error(self, title: str, message: str):
@@ -0,0 +1,12 @@
+import os
+import subprocess
+
+def git_revision() -> dict:
+    """Return the current commit so results can be compared across commits."""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            return ''
+    return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
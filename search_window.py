@@ -1,11 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import mysql.connector
+import database
+import repositories
 
 class SearchWindow:
     def __init__(self, root: tk.Tk):
         """Initialize the search window."""
         self.root = root
+        self.cached_query = None
+        self.cached_results = {}
         self.setup_window()
         self.create_ui()
 
@@ -89,7 +93,8 @@ class SearchWindow:
                 bg=self.colors['background'],
                 selectcolor=self.colors['surface'],
                 activebackground=self.colors['background'],
-                activeforeground=self.colors['text']
+                activeforeground=self.colors['text'],
+                command=self.show_cached_results
             ).pack(side='left', padx=10)
         
         # Search input
@@ -124,8 +129,10 @@ class SearchWindow:
         results_frame = tk.Frame(container, bg=self.colors['surface'])
         results_frame.pack(fill='both', expand=True)
         
-        # Create Treeview for results
+        # Create Treeview for results, with the branch of each result when searching all branches
         columns = ('id', 'name', 'details')
+        if database.is_multi_branch():
+            columns = ('branch',) + columns
         self.results_tree = ttk.Treeview(
             results_frame,
             columns=columns,
@@ -134,6 +141,9 @@ class SearchWindow:
         )
         
         # Configure columns
+        if database.is_multi_branch():
+            self.results_tree.heading('branch', text='الفرع')
+            self.results_tree.column('branch', width=100)
         self.results_tree.heading('id', text='الرقم')
         self.results_tree.heading('name', text='الاسم')
         self.results_tree.heading('details', text='التفاصيل')
@@ -167,58 +177,63 @@ class SearchWindow:
             for item in self.results_tree.get_children():
                 self.results_tree.delete(item)
             
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                if search_type == "cars":
-                    cursor.execute("""
-                        SELECT id, CONCAT(brand, ' ', model) as name, 
-                               CONCAT('اللون: ', color, ' | السعر: ', price, ' درهم') as details
-                        FROM cars
-                        WHERE brand LIKE %s OR model LIKE %s OR plate LIKE %s
-                    """, (f'%{query}%', f'%{query}%', f'%{query}%'))
-                
-                elif search_type == "customers":
-                    cursor.execute("""
-                        SELECT id, name, CONCAT('الهاتف: ', phone) as details
-                        FROM customers
-                        WHERE name LIKE %s OR phone LIKE %s
-                    """, (f'%{query}%', f'%{query}%'))
-                
-                else:  # rentals
-                    cursor.execute("""
-                        SELECT r.id, 
-                               CONCAT(c.name, ' - ', car.brand, ' ', car.model) as name,
-                               CONCAT('من: ', DATE_FORMAT(r.rent_date, '%Y-%m-%d'), 
-                                     ' | إلى: ', DATE_FORMAT(r.return_date, '%Y-%m-%d')) as details
-                        FROM rentals r
-                        JOIN customers c ON r.customer_id = c.id
-                        JOIN cars car ON r.car_id = car.id
-                        WHERE c.name LIKE %s OR car.brand LIKE %s OR car.model LIKE %s
-                    """, (f'%{query}%', f'%{query}%', f'%{query}%'))
-                
-                results = cursor.fetchall()
-                
-                if not results:
-                    messagebox.showinfo("نتائج البحث", "لم يتم العثور على نتائج")
-                    return
-                
-                # Insert results
-                for result in results:
-                    self.results_tree.insert('', 'end', values=result)
+            missing = []
+            if database.is_multi_branch():
+                # Every branch database is searched in parallel and the results merged
+                results, missing = repositories.search_branches(search_type, query)
+                self.cached_results = {search_type: results}
+            else:
+                # With concurrent reads all three types are searched at once, so switching type needs no query
+                search_types = list(repositories.SEARCHES) if database.supports_concurrency() else [search_type]
+                self.cached_results = repositories.search(search_types, query)
+            self.cached_query = query
+            results = self.cached_results[search_type]
+
+            if missing:
+                messagebox.showwarning("تنبيه", f"تعذر البحث في الفروع: {', '.join(missing)}")
+            
+            if not results:
+                messagebox.showinfo("نتائج البحث", "لم يتم العثور على نتائج")
+                return
+            
+            # Insert results
+            for result in results:
+                self.results_tree.insert('', 'end', values=self.result_values(result))
                 
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء البحث: {str(e)}")
 
+    def show_cached_results(self):
+        """Show the results of the selected type if they were fetched with the current query."""
+        search_type = self.search_type.get()
+        if self.cached_query is None or self.cached_query != self.search_entry.get().strip():
+            return
+        if search_type not in self.cached_results:
+            self.perform_search()
+            return
+        for item in self.results_tree.get_children():
+            self.results_tree.delete(item)
+        for result in self.cached_results[search_type]:
+            self.results_tree.insert('', 'end', values=self.result_values(result))
+
+    def result_values(self, result):
+        """Row of the results table, led by the branch when searching all branches."""
+        if result.branch is None:
+            return result[:3]
+        return (result.branch, *result[:3])
+
+    def refresh(self):
+        """Clear the previous search."""
+        self.cached_query = None
+        self.cached_results = {}
+        self.search_entry.delete(0, 'end')
+        for item in self.results_tree.get_children():
+            self.results_tree.delete(item)
+
     def get_db_connection(self):
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection(read_only=True)
         except mysql.connector.Error as err:
             messagebox.showerror("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
@@ -0,0 +1,53 @@
+from array import array
+from typing import Callable, Dict, Optional, Sequence
+from compact_rows import ColumnarRows
+
+class SelectionModel:
+    """Combobox choices kept as rows and integer ids; the widget's selected index is the lookup key."""
+
+    __slots__ = ('rows', 'ids', 'label', '_positions')
+
+    def __init__(self, rows: Sequence = (), label: Callable[[tuple], str] = str):
+        """Index rows, each with an id field, by their position in the combobox."""
+        self.rows = rows
+        self.ids = array('q', rows.column('id') if isinstance(rows, ColumnarRows) else (row.id for row in rows))
+        self.label = label
+        self._positions: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def labels(self) -> tuple:
+        """Format the display labels; they are handed to the widget and not kept here."""
+        return tuple(self.label(row) for row in self.rows)
+
+    def attach(self, combobox) -> None:
+        """Show the choices in a combobox and clear its current text."""
+        combobox['values'] = self.labels()
+        combobox.set('')
+
+    def id_at(self, index: int) -> Optional[int]:
+        """Return the id shown at a combobox index, None when nothing is selected."""
+        return self.ids[index] if 0 <= index < len(self.ids) else None
+
+    def row_at(self, index: int):
+        """Return the row shown at a combobox index, None when nothing is selected."""
+        return self.rows[index] if 0 <= index < len(self.ids) else None
+
+    def selected_id(self, combobox) -> Optional[int]:
+        """Return the id of the combobox's selected choice."""
+        return self.id_at(combobox.current())
+
+    def selected_row(self, combobox):
+        """Return the row of the combobox's selected choice."""
+        return self.row_at(combobox.current())
+
+    def index_of(self, row_id: int) -> int:
+        """Return the combobox index of an id, or -1; the reverse index is built on first use."""
+        if self._positions is None:
+            self._positions = {row_id: index for index, row_id in enumerate(self.ids)}
+        return self._positions.get(row_id, -1)
+
+    def row_for(self, row_id: int):
+        """Return the row with an id, None when it is not among the choices."""
+        return self.row_at(self.index_of(row_id))
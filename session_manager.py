@@ -0,0 +1,54 @@
+import gc
+import tkinter as tk
+
+class SessionManager:
+    def __init__(self, root: tk.Tk, login_class):
+        """Initialize the session manager that owns the single Tk root."""
+        self.root = root
+        self.login_class = login_class
+        self.view = None
+        self.user = None
+
+    def show_login(self):
+        """Switch the root window to the login view."""
+        self.user = None
+        self.switch_view(lambda: self.login_class(self.root, session=self))
+
+    def start_session(self, user):
+        """Switch the root window to the main view for the logged in user."""
+        from main_window import MainWindow
+        self.user = user
+        self.switch_view(lambda: MainWindow(self.root, session=self))
+
+    def logout(self):
+        """End the current session and return to the login view."""
+        self.show_login()
+
+    def switch_view(self, build_view):
+        """Destroy the current view in place and build the next one on the same root."""
+        self.clear_view()
+        self.view = build_view()
+
+    def clear_view(self):
+        """Destroy every widget of the current view while keeping the root alive."""
+        shell = getattr(self.view, 'shell', None)
+        if shell:
+            shell.clear()
+        self.view = None
+
+        for child in list(self.root.winfo_children()):
+            child.destroy()
+
+        # Drop the old close handler so it does not keep the old view alive
+        handler = self.root.protocol("WM_DELETE_WINDOW")
+        if handler:
+            self.root.protocol("WM_DELETE_WINDOW", "")
+            self.root.deletecommand(handler)
+
+        # Release the old view's callbacks before the next one is built
+        gc.collect()
+
+    def quit(self):
+        """Close the application."""
+        self.clear_view()
+        self.root.destroy()
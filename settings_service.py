@@ -0,0 +1,121 @@
+import threading
+import time
+from typing import Dict, NamedTuple
+import mysql.connector
+import database
+
+class NotificationSettings(NamedTuple):
+    new_rental: bool = True
+    rental_expiry: bool = True
+    daily_report: bool = True
+    return_notification: bool = True
+    late_return: bool = True
+    daily_return_report: bool = True
+
+class SettingsService:
+    VERSION_NAME = 'notification_settings'
+
+    def __init__(self, check_interval: float = 30):
+        """Initialize the settings cache; the shared version is rechecked every check_interval seconds."""
+        self.check_interval = check_interval
+        self._settings = None
+        self._version = None
+        self._checked_at = 0.0
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def ensure_schema(self, cursor):
+        """Create the version table used to invalidate caches on other workstations."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS settings_version (
+                name VARCHAR(50) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            INSERT IGNORE INTO settings_version (name, version)
+            VALUES (%s, 0)
+        """, (self.VERSION_NAME,))
+
+    def get(self) -> NotificationSettings:
+        """Return the cached notification settings, reloading them if another workstation changed them."""
+        with self._lock:
+            if self._settings is None or time.monotonic() - self._checked_at >= self.check_interval:
+                self._refresh()
+            return self._settings
+
+    def invalidate(self):
+        """Force a reload on the next read."""
+        with self._lock:
+            self._settings = None
+            self._version = None
+
+    def _refresh(self):
+        """Reload all settings in one query if the shared version moved."""
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            if not self._schema_ready:
+                self.ensure_schema(cursor)
+                conn.commit()
+                self._schema_ready = True
+
+            cursor.execute("SELECT version FROM settings_version WHERE name = %s", (self.VERSION_NAME,))
+            row = cursor.fetchone()
+            version = row[0] if row else 0
+
+            if self._settings is None or version != self._version:
+                cursor.execute("SELECT setting_name, enabled FROM notification_settings")
+                stored = {name: bool(enabled) for name, enabled in cursor.fetchall()
+                          if name in NotificationSettings._fields}
+                self._settings = NotificationSettings(**stored)
+                self._version = version
+
+        self._checked_at = time.monotonic()
+
+    def save(self, changes: Dict[str, bool]):
+        """Save changed settings with a single multi-row upsert and bump the shared version."""
+        changes = {name: bool(enabled) for name, enabled in changes.items()
+                   if name in NotificationSettings._fields}
+        if not changes:
+            return
+
+        with self._lock:
+            with self.get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                if not self._schema_ready:
+                    self.ensure_schema(cursor)
+                    self._schema_ready = True
+
+                placeholders = ', '.join(['(%s, %s)'] * len(changes))
+                params = [value for item in changes.items() for value in item]
+                cursor.execute(f"""
+                    INSERT INTO notification_settings (setting_name, enabled)
+                    VALUES {placeholders}
+                    ON DUPLICATE KEY UPDATE enabled = VALUES(enabled)
+                """, params)
+
+                cursor.execute("""
+                    UPDATE settings_version SET version = version + 1
+                    WHERE name = %s
+                """, (self.VERSION_NAME,))
+                conn.commit()
+
+                cursor.execute("SELECT version FROM settings_version WHERE name = %s", (self.VERSION_NAME,))
+                version = cursor.fetchone()[0]
+
+            # Apply the change locally unless another workstation saved in between
+            if self._settings is not None and self._version is not None and version == self._version + 1:
+                self._settings = self._settings._replace(**changes)
+                self._version = version
+                self._checked_at = time.monotonic()
+            else:
+                self._settings = None
+                self._version = None
+
+    def get_db_connection(self) -> mysql.connector.MySQLConnection:
+        """Get database connection."""
+        return database.get_db_connection()
+
+settings_service = SettingsService()
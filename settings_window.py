@@ -1,8 +1,15 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import mysql.connector
+import database
 from tkinter import ttk
 from password_change_window import PasswordChangeWindow
+from overdue_sweeper import overdue_sweeper
+from rental_settlement import rental_settlement
+from settings_service import settings_service
+from db_instrumentation import monitor
+from ui_monitor import ui_monitor
+from offline_store import OPERATION_NAMES, offline_store
 import os
 import shutil
 from datetime import datetime
@@ -18,14 +25,14 @@ class SettingsWindow:
     def setup_window(self):
         """Set up the main window properties."""
         self.root.title("الإعدادات")
-        self.root.geometry("500x850")
+        self.root.geometry("500x960")
         
         # Center the window
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         x = (screen_width - 500) // 2
-        y = (screen_height - 850) // 2
-        self.root.geometry(f"500x850+{x}+{y}")
+        y = (screen_height - 960) // 2
+        self.root.geometry(f"500x960+{x}+{y}")
         
         # Modern color scheme
         self.colors = {
@@ -56,7 +63,9 @@ class SettingsWindow:
             'account': '👤',
             'notification': '🔔',
             'rental': '🚗',
-            'return': '↩️'
+            'return': '↩️',
+            'diagnostics': '📊',
+            'sync': '🔄'
         }
         
         self.root.configure(bg=self.colors['background'])
@@ -83,7 +92,9 @@ class SettingsWindow:
             ("إعدادات النظام", [
                 (self.icons['database'], "تحديث قاعدة البيانات", "update_database", self.colors['info']),
                 (self.icons['backup'], "النسخ الاحتياطي", "backup_database", self.colors['success']),
-                (self.icons['restore'], "استعادة النسخة الاحتياطية", "restore_database", self.colors['warning'])
+                (self.icons['restore'], "استعادة النسخة الاحتياطية", "restore_database", self.colors['warning']),
+                (self.icons['diagnostics'], "تشخيص أداء قاعدة البيانات", "query_diagnostics", self.colors['info']),
+                (self.icons['sync'], "العمليات المرفوضة عند المزامنة", "sync_conflicts", self.colors['danger'])
             ]),
             ("إعدادات الحساب", [
                 (self.icons['password'], "تغيير كلمة المرور", "change_password", self.colors['primary']),
@@ -153,7 +164,9 @@ class SettingsWindow:
             'change_password': self.change_password,
             'update_account': self.update_account,
             'rental_notifications': self.rental_notifications,
-            'return_notifications': self.return_notifications
+            'return_notifications': self.return_notifications,
+            'query_diagnostics': self.query_diagnostics,
+            'sync_conflicts': self.sync_conflicts
         }
         
         if command_name in commands:
@@ -164,12 +177,7 @@ class SettingsWindow:
     def get_db_connection(self):
         """Get database connection."""
         try:
-            return mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="car_rental"
-            )
+            return database.get_db_connection()
         except mysql.connector.Error as err:
             messagebox.showerror("خطأ في الاتصال", "فشل الاتصال بقاعدة البيانات")
             raise
@@ -210,7 +218,10 @@ class SettingsWindow:
                     ADD COLUMN IF NOT EXISTS notes TEXT,
                     ADD COLUMN IF NOT EXISTS notification_sent BOOLEAN DEFAULT FALSE
                 """)
-                
+
+                # Create overdue rentals table used by the late returns view
+                overdue_sweeper.ensure_schema(cursor)
+
                 # Insert default notification settings if they don't exist
                 default_settings = [
                     ('new_rental', True),
@@ -221,11 +232,16 @@ class SettingsWindow:
                     ('daily_return_report', True)
                 ]
                 
-                for setting_name, enabled in default_settings:
-                    cursor.execute("""
-                        INSERT IGNORE INTO notification_settings (setting_name, enabled)
-                        VALUES (%s, %s)
-                    """, (setting_name, enabled))
+                cursor.executemany("""
+                    INSERT IGNORE INTO notification_settings (setting_name, enabled)
+                    VALUES (%s, %s)
+                """, default_settings)
+
+                # Create settings version table used to invalidate cached settings
+                settings_service.ensure_schema(cursor)
+
+                # Settlement columns, filled in for rentals returned before they existed
+                rental_settlement.backfill(conn)
                 
                 # Insert default admin user if it doesn't exist
                 cursor.execute("""
@@ -234,6 +250,7 @@ class SettingsWindow:
                 """)
                 
                 conn.commit()
+                settings_service.invalidate()
                 messagebox.showinfo("تحديث قاعدة البيانات", "تم تحديث قاعدة البيانات بنجاح")
                 
         except mysql.connector.Error as err:
@@ -241,6 +258,19 @@ class SettingsWindow:
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء تحديث قاعدة البيانات: {str(e)}")
 
+    def mysql_client(self, program):
+        """Build a mysql client command line and environment for this branch's server."""
+        config = database.pool.config
+        command = [
+            program,
+            f"--host={config.get('host', 'localhost')}",
+            f"--port={config.get('port', 3306)}",
+            f"--user={config.get('user', 'root')}"
+        ]
+        # Given through the environment so it does not show in the process list
+        env = {**os.environ, 'MYSQL_PWD': config.get('password', '')}
+        return command, env
+
     def backup_database(self):
         """Create database backup."""
         try:
@@ -251,7 +281,15 @@ class SettingsWindow:
             
             # Generate backup filename with timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(backup_dir, f"car_rental_backup_{timestamp}.sql")
+            if database.DB_BACKEND == "sqlite":
+                # The embedded database is copied page by page, no external tool needed
+                backup_file = os.path.join(backup_dir, f"car_rental_backup_{timestamp}.sqlite3")
+                database.get_sqlite_backend().backup(backup_file)
+                messagebox.showinfo("النسخ الاحتياطي", f"تم إنشاء نسخة احتياطية بنجاح\nتم حفظ النسخة في: {backup_file}")
+                return
+
+            database_name = database.pool.config['database']
+            backup_file = os.path.join(backup_dir, f"{database_name}_backup_{timestamp}.sql")
             
             # Create backup using mysqldump
             try:
@@ -260,13 +298,8 @@ class SettingsWindow:
                     messagebox.showerror("خطأ", "لم يتم العثور على mysqldump. يرجى التأكد من تثبيت MySQL")
                     return
                 
-                subprocess.run([
-                    "mysqldump",
-                    "-u", "root",
-                    "--password=",
-                    "car_rental",
-                    f"--result-file={backup_file}"
-                ], check=True)
+                command, env = self.mysql_client("mysqldump")
+                subprocess.run(command + [database_name, f"--result-file={backup_file}"], env=env, check=True)
                 
                 if os.path.exists(backup_file) and os.path.getsize(backup_file) > 0:
                     messagebox.showinfo("النسخ الاحتياطي", f"تم إنشاء نسخة احتياطية بنجاح\nتم حفظ النسخة في: {backup_file}")
@@ -285,17 +318,25 @@ class SettingsWindow:
             # Open file dialog to select backup file
             backup_file = filedialog.askopenfilename(
                 title="اختر ملف النسخة الاحتياطية",
-                filetypes=[("SQL files", "*.sql"), ("All files", "*.*")],
+                filetypes=[("SQL files", "*.sql"), ("SQLite files", "*.sqlite3"), ("All files", "*.*")],
                 initialdir="backups"
             )
             
             if not backup_file:
                 return
             
-            # Confirm restoration
-            if not messagebox.askyesno("تأكيد", "هل أنت متأكد من استعادة النسخة الاحتياطية؟\nسيتم استبدال جميع البيانات الحالية."):
+            # Confirm restoration, naming the server whose data is replaced
+            target = ""
+            if database.DB_BACKEND != "sqlite":
+                target = f"\nالخادم: {database.pool.config.get('host', 'localhost')} - {database.pool.config['database']}"
+            if not messagebox.askyesno("تأكيد", f"هل أنت متأكد من استعادة النسخة الاحتياطية؟\nسيتم استبدال جميع البيانات الحالية.{target}"):
                 return
             
+            if database.DB_BACKEND == "sqlite":
+                database.get_sqlite_backend().restore(backup_file)
+                messagebox.showinfo("استعادة النسخة الاحتياطية", "تم استعادة النسخة الاحتياطية بنجاح")
+                return
+
             # Check if mysql is available
             if not shutil.which('mysql'):
                 messagebox.showerror("خطأ", "لم يتم العثور على mysql. يرجى التأكد من تثبيت MySQL")
@@ -303,13 +344,9 @@ class SettingsWindow:
             
             # Restore database using mysql command
             try:
-                subprocess.run([
-                    "mysql",
-                    "-u", "root",
-                    "--password=",
-                    "car_rental",
-                    f"--execute=source {backup_file}"
-                ], check=True)
+                command, env = self.mysql_client("mysql")
+                subprocess.run(command + [database.pool.config['database'], f"--execute=source {backup_file}"],
+                               env=env, check=True)
                 
                 messagebox.showinfo("استعادة النسخة الاحتياطية", "تم استعادة النسخة الاحتياطية بنجاح")
             except subprocess.CalledProcessError as e:
@@ -451,11 +488,8 @@ class SettingsWindow:
             form_frame = tk.Frame(dialog, bg=self.colors['background'])
             form_frame.pack(expand=True, fill='both', padx=20, pady=20)
             
-            # Get current settings
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT setting_name, enabled FROM notification_settings WHERE setting_name LIKE 'rental%'")
-                current_settings = {row[0]: row[1] for row in cursor.fetchall()}
+            # Get current settings from the shared cache
+            current_settings = settings_service.get()
             
             # Notification options
             options = [
@@ -467,7 +501,7 @@ class SettingsWindow:
             # Create checkboxes
             vars = {}
             for text, var_name in options:
-                var = tk.BooleanVar(value=current_settings.get(var_name, True))
+                var = tk.BooleanVar(value=getattr(current_settings, var_name))
                 vars[var_name] = var
                 
                 tk.Checkbutton(
@@ -485,20 +519,10 @@ class SettingsWindow:
             # Save button
             def save_settings():
                 try:
-                    with self.get_db_connection() as conn:
-                        cursor = conn.cursor()
-                        
-                        # Update notification settings
-                        for var_name, var in vars.items():
-                            cursor.execute("""
-                                INSERT INTO notification_settings (setting_name, enabled) 
-                                VALUES (%s, %s) 
-                                ON DUPLICATE KEY UPDATE enabled = %s
-                            """, (var_name, var.get(), var.get()))
-                        
-                        conn.commit()
-                        messagebox.showinfo("نجاح", "تم حفظ إعدادات الإشعارات بنجاح")
-                        dialog.destroy()
+                    # Save all checkboxes in one statement
+                    settings_service.save({var_name: var.get() for var_name, var in vars.items()})
+                    messagebox.showinfo("نجاح", "تم حفظ إعدادات الإشعارات بنجاح")
+                    dialog.destroy()
                 except Exception as e:
                     messagebox.showerror("خطأ", f"فشل حفظ الإعدادات: {str(e)}")
             
@@ -537,12 +561,19 @@ class SettingsWindow:
             form_frame = tk.Frame(dialog, bg=self.colors['background'])
             form_frame.pack(expand=True, fill='both', padx=20, pady=20)
             
-            # Get current settings
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT setting_name, enabled FROM notification_settings WHERE setting_name LIKE 'return%'")
-                current_settings = {row[0]: row[1] for row in cursor.fetchall()}
-            
+            # Get current settings from the shared cache
+            current_settings = settings_service.get()
+
+            # Current late returns from the precomputed overdue table
+            overdue_count, max_days_late = overdue_sweeper.summary()
+            tk.Label(
+                form_frame,
+                text=f"الإيجارات المتأخرة حالياً: {overdue_count} (أقصى تأخير: {max_days_late} يوم)",
+                font=("Segoe UI", 11),
+                fg=self.colors['warning'] if overdue_count else self.colors['text_secondary'],
+                bg=self.colors['background']
+            ).pack(fill='x', pady=(0, 10))
+
             # Notification options
             options = [
                 ("إشعارات التسليم", "return_notification"),
@@ -553,7 +584,7 @@ class SettingsWindow:
             # Create checkboxes
             vars = {}
             for text, var_name in options:
-                var = tk.BooleanVar(value=current_settings.get(var_name, True))
+                var = tk.BooleanVar(value=getattr(current_settings, var_name))
                 vars[var_name] = var
                 
                 tk.Checkbutton(
@@ -571,20 +602,10 @@ class SettingsWindow:
             # Save button
             def save_settings():
                 try:
-                    with self.get_db_connection() as conn:
-                        cursor = conn.cursor()
-                        
-                        # Update notification settings
-                        for var_name, var in vars.items():
-                            cursor.execute("""
-                                INSERT INTO notification_settings (setting_name, enabled) 
-                                VALUES (%s, %s) 
-                                ON DUPLICATE KEY UPDATE enabled = %s
-                            """, (var_name, var.get(), var.get()))
-                        
-                        conn.commit()
-                        messagebox.showinfo("نجاح", "تم حفظ إعدادات الإشعارات بنجاح")
-                        dialog.destroy()
+                    # Save all checkboxes in one statement
+                    settings_service.save({var_name: var.get() for var_name, var in vars.items()})
+                    messagebox.showinfo("نجاح", "تم حفظ إعدادات الإشعارات بنجاح")
+                    dialog.destroy()
                 except Exception as e:
                     messagebox.showerror("خطأ", f"فشل حفظ الإعدادات: {str(e)}")
             
@@ -606,6 +627,213 @@ class SettingsWindow:
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء إعداد الإشعارات: {str(e)}")
 
+    def query_diagnostics(self):
+        """Show the slowest queries recorded by the query monitor."""
+        try:
+            dialog = tk.Toplevel(self.root)
+            dialog.title("تشخيص أداء قاعدة البيانات")
+            dialog.geometry("1000x520")
+            dialog.configure(bg=self.colors['background'])
+            dialog.transient(self.root)
+
+            frame = tk.Frame(dialog, bg=self.colors['background'])
+            frame.pack(expand=True, fill='both', padx=20, pady=20)
+
+            tk.Label(
+                frame,
+                text=f"الاستعلامات التي تتجاوز {monitor.slow_threshold * 1000:.0f} ms تُسجل في {monitor.log_path}",
+                font=("Segoe UI", 11),
+                fg=self.colors['text_secondary'],
+                bg=self.colors['background']
+            ).pack(fill='x', pady=(0, 10))
+
+            notebook = ttk.Notebook(frame)
+            notebook.pack(expand=True, fill='both')
+
+            columns = {
+                'caller': ("الشاشة / الدالة", 220),
+                'count': ("العدد", 60),
+                'total': ("الإجمالي ms", 90),
+                'mean': ("المتوسط ms", 90),
+                'max': ("الأقصى ms", 90),
+                'rows': ("الصفوف", 70),
+                'wait': ("انتظار الاتصال ms", 110),
+                'fingerprint': ("الاستعلام", 400)
+            }
+
+            def create_tree(title, names):
+                tab = tk.Frame(notebook, bg=self.colors['background'])
+                notebook.add(tab, text=title)
+                tree = ttk.Treeview(tab, columns=names, show='headings', style='Custom.Treeview')
+                for name in names:
+                    heading, width = columns[name]
+                    tree.heading(name, text=heading)
+                    tree.column(name, width=width, anchor='w' if name in ('caller', 'fingerprint') else 'center')
+                scrollbar = ttk.Scrollbar(tab, orient='vertical', command=tree.yview)
+                tree.configure(yscrollcommand=scrollbar.set)
+                scrollbar.pack(side='right', fill='y')
+                tree.pack(expand=True, fill='both')
+                return tree
+
+            queries_tree = create_tree("أبطأ الاستعلامات", list(columns))
+            screens_tree = create_tree("حسب الشاشة", [name for name in columns if name != 'fingerprint'])
+
+            # Event loop stalls recorded by the UI monitor
+            ui_tab = tk.Frame(notebook, bg=self.colors['background'])
+            notebook.add(ui_tab, text="استجابة الواجهة")
+            lag_label = tk.Label(
+                ui_tab,
+                font=("Segoe UI", 11),
+                fg=self.colors['text'],
+                bg=self.colors['background'],
+                justify='right',
+                anchor='e'
+            )
+            lag_label.pack(fill='x', pady=(5, 10))
+            stalls_tree = ttk.Treeview(ui_tab, columns=('handler', 'count', 'total', 'max'),
+                                       show='headings', style='Custom.Treeview')
+            for name, heading, width in (('handler', "المعالج", 500), ('count', "العدد", 80),
+                                         ('total', "الإجمالي ms", 120), ('max', "الأقصى ms", 120)):
+                stalls_tree.heading(name, text=heading)
+                stalls_tree.column(name, width=width, anchor='w' if name == 'handler' else 'center')
+            stalls_tree.pack(expand=True, fill='both')
+
+            def fill(tree, stats):
+                tree.delete(*tree.get_children())
+                for s in stats:
+                    values = {
+                        'caller': s.caller,
+                        'count': s.count,
+                        'total': f"{s.total * 1000:.1f}",
+                        'mean': f"{s.mean * 1000:.1f}",
+                        'max': f"{s.max * 1000:.1f}",
+                        'rows': s.rows,
+                        'wait': f"{s.wait * 1000:.1f}",
+                        'fingerprint': s.fingerprint
+                    }
+                    tree.insert('', 'end', values=[values[name] for name in tree['columns']])
+
+            def refresh():
+                fill(queries_tree, monitor.top_offenders())
+                fill(screens_tree, monitor.top_offenders(by_caller=True))
+
+                histogram = "  ".join(
+                    f"{'>5000' if bound == float('inf') else f'≤{bound}'} ms: {count}"
+                    for bound, count in ui_monitor.histogram()
+                )
+                lag_label.configure(text=f"تأخر حلقة الأحداث (الأقصى {ui_monitor.max_lag * 1000:.0f} ms)\n{histogram}")
+                stalls_tree.delete(*stalls_tree.get_children())
+                for handler, count, total, longest in ui_monitor.stalls_by_handler():
+                    stalls_tree.insert('', 'end', values=(handler, count, f"{total * 1000:.0f}", f"{longest * 1000:.0f}"))
+
+            def clear():
+                monitor.clear()
+                ui_monitor.reset()
+                refresh()
+
+            def export():
+                try:
+                    path = ui_monitor.export()
+                    messagebox.showinfo("نجاح", f"تم حفظ تقرير استجابة الواجهة في:\n{path}", parent=dialog)
+                except Exception as e:
+                    messagebox.showerror("خطأ", f"فشل حفظ التقرير: {str(e)}", parent=dialog)
+
+            buttons = tk.Frame(frame, bg=self.colors['background'])
+            buttons.pack(fill='x', pady=(10, 0))
+            for text, command, color in (("تحديث", refresh, self.colors['info']),
+                                         ("تصدير تقرير الواجهة", export, self.colors['success']),
+                                         ("مسح البيانات", clear, self.colors['danger'])):
+                tk.Button(
+                    buttons,
+                    text=text,
+                    font=("Segoe UI", 12),
+                    fg=self.colors['text'],
+                    bg=color,
+                    activebackground=self.colors['hover'],
+                    activeforeground=self.colors['text'],
+                    bd=0,
+                    padx=20,
+                    pady=8,
+                    cursor='hand2',
+                    command=command
+                ).pack(side='right', padx=(10, 0))
+
+            refresh()
+
+        except Exception as e:
+            messagebox.showerror("خطأ", f"حدث خطأ أثناء عرض التشخيص: {str(e)}")
+
+    def sync_conflicts(self):
+        """Show the operations saved offline that the server refused, so they can be redone by hand."""
+        try:
+            dialog = tk.Toplevel(self.root)
+            dialog.title("العمليات المرفوضة عند المزامنة")
+            dialog.geometry("900x450")
+            dialog.configure(bg=self.colors['background'])
+            dialog.transient(self.root)
+
+            frame = tk.Frame(dialog, bg=self.colors['background'])
+            frame.pack(expand=True, fill='both', padx=20, pady=20)
+
+            tk.Label(
+                frame,
+                text="هذه العمليات حُفظت دون اتصال ورفضها الخادم، يجب إعادة إدخالها يدوياً",
+                font=("Segoe UI", 11),
+                fg=self.colors['text_secondary'],
+                bg=self.colors['background']
+            ).pack(fill='x', pady=(0, 10))
+
+            columns = (('created_at', "التاريخ", 150), ('kind', "العملية", 110),
+                       ('reason', "السبب", 250), ('payload', "البيانات", 350))
+            tree = ttk.Treeview(frame, columns=[name for name, _, _ in columns], show='headings',
+                                style='Custom.Treeview', selectmode='browse')
+            for name, heading, width in columns:
+                tree.heading(name, text=heading)
+                tree.column(name, width=width, anchor='w' if name == 'payload' else 'center')
+            scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side='right', fill='y')
+            tree.pack(expand=True, fill='both')
+
+            def refresh():
+                tree.delete(*tree.get_children())
+                for seq, kind, payload, created_at, result in offline_store.conflicts():
+                    tree.insert('', 'end', iid=str(seq), values=(
+                        created_at[:19].replace('T', ' '), OPERATION_NAMES.get(kind, kind), result or "", payload
+                    ))
+
+            def dismiss():
+                selection = tree.selection()
+                if not selection:
+                    messagebox.showwarning("تنبيه", "الرجاء اختيار عملية", parent=dialog)
+                    return
+                offline_store.dismiss(int(selection[0]))
+                refresh()
+
+            buttons = tk.Frame(frame, bg=self.colors['background'])
+            buttons.pack(fill='x', pady=(10, 0))
+            for text, command, color in (("تحديث", refresh, self.colors['info']),
+                                         ("تمت المعالجة", dismiss, self.colors['success'])):
+                tk.Button(
+                    buttons,
+                    text=text,
+                    font=("Segoe UI", 12),
+                    fg=self.colors['text'],
+                    bg=color,
+                    activebackground=self.colors['hover'],
+                    activeforeground=self.colors['text'],
+                    bd=0,
+                    padx=20,
+                    pady=8,
+                    cursor='hand2',
+                    command=command
+                ).pack(side='right', padx=(10, 0))
+
+            refresh()
+
+        except Exception as e:
+            messagebox.showerror("خطأ", f"حدث خطأ أثناء عرض العمليات المرفوضة: {str(e)}")
+
     def on_closing(self):
         """Handle window closing."""
         self.root.destroy()
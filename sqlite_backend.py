@@ -0,0 +1,435 @@
+import calendar
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+import mysql.connector
+
+ER_DUP_ENTRY = 1062
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    # Durable at checkpoints; with WAL a crash can lose at most the last commits, never corrupt the file
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -32000",
+    "PRAGMA mmap_size = 268435456"
+)
+
+# The application tables, as created on the MySQL server, with the indexes the services add
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cars (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        brand VARCHAR(50) NOT NULL,
+        model VARCHAR(50) NOT NULL,
+        plate VARCHAR(20) UNIQUE NOT NULL,
+        color VARCHAR(30),
+        year INT,
+        price DECIMAL(10, 2) NOT NULL,
+        available BOOLEAN DEFAULT TRUE,
+        status VARCHAR(30) DEFAULT 'متوفرة'
+    );
+    CREATE INDEX IF NOT EXISTS idx_cars_available ON cars (available);
+
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100) NOT NULL,
+        national_id VARCHAR(20),
+        phone VARCHAR(20),
+        email VARCHAR(100),
+        address VARCHAR(255),
+        license_number VARCHAR(30)
+    );
+    CREATE INDEX IF NOT EXISTS idx_customers_national_id ON customers (national_id);
+
+    CREATE TABLE IF NOT EXISTS rentals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INT NOT NULL REFERENCES customers (id),
+        car_id INT NOT NULL REFERENCES cars (id),
+        rent_date DATETIME NOT NULL,
+        return_date DATE NOT NULL,
+        returned_date DATE NULL,
+        total_price DECIMAL(10, 2),
+        status VARCHAR(30) DEFAULT 'قيد التأجير',
+        notes TEXT,
+        notification_sent BOOLEAN DEFAULT FALSE,
+        extra_days INT NULL,
+        late_fee DECIMAL(10, 2) NULL,
+        final_amount DECIMAL(10, 2) NULL,
+        settled_at DATETIME NULL,
+        pricing_version INT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_rentals_car ON rentals (car_id);
+    CREATE INDEX IF NOT EXISTS idx_rentals_customer ON rentals (customer_id);
+    CREATE INDEX IF NOT EXISTS idx_rentals_rent_date ON rentals (rent_date);
+    CREATE INDEX IF NOT EXISTS idx_rentals_open_return ON rentals (returned_date, return_date);
+    CREATE INDEX IF NOT EXISTS idx_rentals_notification ON rentals (notification_sent, returned_date, return_date);
+    CREATE INDEX IF NOT EXISTS idx_rentals_settlement ON rentals (settled_at, final_amount, late_fee);
+
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        email VARCHAR(100),
+        role VARCHAR(20) DEFAULT 'user',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT OR IGNORE INTO users (username, password, role) VALUES ('admin', 'admin123', 'admin');
+
+    CREATE TABLE IF NOT EXISTS notification_settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        setting_name VARCHAR(50) UNIQUE NOT NULL,
+        enabled BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# MySQL date format codes that differ from strftime
+DATE_FORMAT_CODES = {'%i': '%M', '%s': '%S', '%M': '%B', '%W': '%A', '%T': '%H:%M:%S', '%h': '%I', '%r': '%I:%M:%S %p'}
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_PARAM = re.compile(r"%\((\w+)\)s|%s")
+_INTERVAL = re.compile(r"\s*([+-])\s*INTERVAL\s+(\?|\d+)\s+(SECOND|MINUTE|HOUR|DAY|MONTH|YEAR)\b", re.I)
+_IDENTIFIER = re.compile(r"[\w.]")
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+_INLINE_INDEX = re.compile(r",\s*INDEX\s+(\w+)\s*\(([^)]*)\)", re.I)
+_ADD_COLUMN = re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+(ADD\s+COLUMN\s.*)$", re.I | re.S)
+_IF_NOT_EXISTS = re.compile(r"IF\s+NOT\s+EXISTS\s+", re.I)
+_ON_DUPLICATE = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.I)
+_VALUES_REF = re.compile(r"\bVALUES\((\w+)\)", re.I)
+
+class Translated(NamedTuple):
+    sql: str
+    ignore_duplicate_column: bool = False
+
+def _to_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromisoformat(str(value))
+
+def _date_add(value, amount, unit: str) -> Optional[str]:
+    """Shim for `value + INTERVAL amount unit`."""
+    moment = _to_datetime(value)
+    if moment is None or amount is None:
+        return None
+    amount = int(amount)
+    unit = unit.upper()
+    if unit in ('MONTH', 'YEAR'):
+        months = moment.month - 1 + (amount * 12 if unit == 'YEAR' else amount)
+        year, month = moment.year + months // 12, months % 12 + 1
+        moment = moment.replace(year=year, month=month,
+                                day=min(moment.day, calendar.monthrange(year, month)[1]))
+    else:
+        moment += timedelta(**{unit.lower() + 's': amount})
+    # Dates stay dates so they compare with DATE columns
+    if len(str(value)) == 10 and unit not in ('SECOND', 'MINUTE', 'HOUR'):
+        return moment.date().isoformat()
+    return moment.isoformat(' ')
+
+def _date_format(value, fmt: str) -> Optional[str]:
+    moment = _to_datetime(value)
+    if moment is None:
+        return None
+    return moment.strftime(re.sub(r"%.", lambda m: DATE_FORMAT_CODES.get(m.group(0), m.group(0)), fmt))
+
+def _concat(*values) -> Optional[str]:
+    if any(value is None for value in values):
+        return None
+    return ''.join(str(value) for value in values)
+
+def _datediff(first, second) -> Optional[int]:
+    if first is None or second is None:
+        return None
+    return (_to_datetime(first).date() - _to_datetime(second).date()).days
+
+def _last_day(value) -> Optional[str]:
+    moment = _to_datetime(value)
+    if moment is None:
+        return None
+    return moment.date().replace(day=calendar.monthrange(moment.year, moment.month)[1]).isoformat()
+
+def register_functions(connection: sqlite3.Connection):
+    """Add the MySQL functions the application's SQL uses."""
+    connection.create_function('CURDATE', 0, lambda: date.today().isoformat())
+    connection.create_function('NOW', 0, lambda: datetime.now().isoformat(' ', 'seconds'))
+    connection.create_function('CONCAT', -1, _concat, deterministic=True)
+    connection.create_function('DATE_FORMAT', 2, _date_format, deterministic=True)
+    connection.create_function('DATEDIFF', 2, _datediff, deterministic=True)
+    connection.create_function('LAST_DAY', 1, _last_day, deterministic=True)
+    connection.create_function('DATE_ADD_INTERVAL', 3, _date_add, deterministic=True)
+    connection.create_function('VERSION', 0, lambda: f"SQLite {sqlite3.sqlite_version}")
+
+def _convert_date(value: bytes):
+    text = value.decode()
+    try:
+        return date.fromisoformat(text[:10]) if text else None
+    except ValueError:
+        return text
+
+def _convert_datetime(value: bytes):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text) if text else None
+    except ValueError:
+        return text
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+
+def _outside_strings(sql: str, replace) -> str:
+    """Apply a rewrite to the parts of a statement that are not string literals."""
+    parts = []
+    position = 0
+    for literal in _STRING.finditer(sql):
+        parts.append(replace(sql[position:literal.start()]))
+        parts.append(literal.group(0))
+        position = literal.end()
+    parts.append(replace(sql[position:]))
+    return ''.join(parts)
+
+def _operand_start(sql: str, end: int) -> int:
+    """Find where the operand before an INTERVAL starts: a column, or a call with balanced parentheses."""
+    position = end
+    while position > 0 and sql[position - 1].isspace():
+        position -= 1
+    if position > 0 and sql[position - 1] == ')':
+        depth = 0
+        while position > 0:
+            position -= 1
+            if sql[position] == ')':
+                depth += 1
+            elif sql[position] == '(':
+                depth -= 1
+                if depth == 0:
+                    break
+    while position > 0 and _IDENTIFIER.match(sql[position - 1]):
+        position -= 1
+    return position
+
+def _rewrite_intervals(sql: str) -> str:
+    match = _INTERVAL.search(sql)
+    while match:
+        start = _operand_start(sql, match.start())
+        sign, amount, unit = match.groups()
+        operand = sql[start:match.start()].strip()
+        sql = (f"{sql[:start]}DATE_ADD_INTERVAL({operand}, {'-' if sign == '-' else ''}{amount}, "
+               f"'{unit.upper()}'){sql[match.end():]}")
+        match = _INTERVAL.search(sql)
+    return sql
+
+def _rewrite_create_table(sql: str) -> List[Translated]:
+    table = _CREATE_TABLE.match(sql).group(1)
+    indexes = [Translated(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+               for name, columns in _INLINE_INDEX.findall(sql)]
+    sql = _INLINE_INDEX.sub('', sql)
+    sql = re.sub(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", sql, flags=re.I)
+    sql = re.sub(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", '', sql, flags=re.I)
+    sql = re.sub(r"\)\s*(?:DEFAULT\s+)?(?:CHARSET|CHARACTER\s+SET)\s*=?\s*\w+\s*$", ')', sql.rstrip(), flags=re.I)
+    return [Translated(sql)] + indexes
+
+@lru_cache(maxsize=512)
+def translate(sql: str) -> Tuple[Translated, ...]:
+    """Rewrite a MySQL statement of this application into one or more SQLite statements."""
+    stripped = sql.strip()
+    keyword = stripped.split(None, 1)[0].upper() if stripped else ''
+
+    if keyword == 'CREATE' and _CREATE_TABLE.match(stripped):
+        return tuple(_rewrite_create_table(stripped))
+    if keyword == 'ALTER':
+        match = _ADD_COLUMN.match(stripped)
+        if match:
+            table, additions = match.groups()
+            return tuple(
+                Translated(f"ALTER TABLE {table} {_IF_NOT_EXISTS.sub('', part)}", True)
+                for part in re.split(r",\s*(?=ADD\s+COLUMN\b)", additions, flags=re.I)
+            )
+    if keyword == 'TRUNCATE':
+        # Ids restart from 1 as after a MySQL truncate
+        table = stripped.split()[-1]
+        return (Translated(f"DELETE FROM {table}"),
+                Translated(f"DELETE FROM sqlite_sequence WHERE name = '{table}'"))
+    if keyword == 'ANALYZE':
+        return (Translated("ANALYZE"),)
+    if keyword == 'SET' and 'FOREIGN_KEY_CHECKS' in stripped.upper():
+        return (Translated(f"PRAGMA foreign_keys = {stripped.rsplit('=', 1)[1].strip()}"),)
+
+    def rewrite(part: str) -> str:
+        part = _PARAM.sub(lambda m: f":{m.group(1)}" if m.group(1) else '?', part)
+        part = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", part, flags=re.I)
+        if _ON_DUPLICATE.search(part):
+            part = _ON_DUPLICATE.sub("ON CONFLICT DO UPDATE SET", part)
+            part = _VALUES_REF.sub(r"excluded.\1", part)
+        return part
+
+    return (Translated(_rewrite_intervals(_outside_strings(sql, rewrite))),)
+
+def to_mysql_error(err: sqlite3.Error) -> mysql.connector.Error:
+    """Raise SQLite errors as the driver errors the windows already handle."""
+    message = str(err)
+    if isinstance(err, sqlite3.IntegrityError):
+        return mysql.connector.errors.IntegrityError(msg=message, errno=ER_DUP_ENTRY if 'UNIQUE' in message else None)
+    if isinstance(err, sqlite3.OperationalError):
+        return mysql.connector.errors.OperationalError(msg=message)
+    return mysql.connector.errors.DatabaseError(msg=message)
+
+class SQLiteCursor:
+    def __init__(self, connection: sqlite3.Connection, dictionary: bool = False):
+        """Initialize a cursor that accepts the application's MySQL statements."""
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def with_rows(self) -> bool:
+        return self._cursor.description is not None
+
+    @property
+    def column_names(self) -> Tuple[str, ...]:
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def execute(self, operation: str, params=None, *args, **kwargs):
+        statements = translate(operation)
+        if params is None:
+            params = ()
+        elif not isinstance(params, dict):
+            params = tuple(params)
+        try:
+            for statement in statements:
+                try:
+                    self._cursor.execute(statement.sql, params if len(statements) == 1 else ())
+                except sqlite3.OperationalError as err:
+                    if not (statement.ignore_duplicate_column and 'duplicate column' in str(err)):
+                        raise
+        except sqlite3.Error as err:
+            raise to_mysql_error(err) from err
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def executemany(self, operation: str, seq_params, *args, **kwargs):
+        statement, = translate(operation)
+        try:
+            self._cursor.executemany(statement.sql, [tuple(params) for params in seq_params])
+        except sqlite3.Error as err:
+            raise to_mysql_error(err) from err
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def _rows(self, rows: List[tuple]) -> list:
+        if not self._dictionary:
+            return rows
+        names = self.column_names
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None or not self._dictionary:
+            return row
+        return self._rows([row])[0]
+
+    def fetchmany(self, size: int = 1):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    def __init__(self, connection: sqlite3.Connection):
+        """Wrap a thread's SQLite connection in the mysql.connector connection interface."""
+        self._connection = connection
+        self.connection_id = id(connection)
+        self.depth = 0  # Checkouts currently open on this thread
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._connection.in_transaction
+
+    def cursor(self, dictionary: bool = False, prepared: bool = False, **kwargs) -> SQLiteCursor:
+        # SQLite keeps its own prepared statement cache, so prepared cursors need nothing extra
+        return SQLiteCursor(self._connection, dictionary)
+
+    def commit(self):
+        try:
+            self._connection.commit()
+        except sqlite3.Error as err:
+            raise to_mysql_error(err) from err
+
+    def rollback(self):
+        # A nested checkout on the same thread must not undo its caller's transaction
+        if self.depth <= 1:
+            try:
+                self._connection.rollback()
+            except sqlite3.Error as err:
+                raise to_mysql_error(err) from err
+
+    def close(self):
+        self.depth -= 1
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        """Initialize the embedded backend; each thread gets one connection to the database file."""
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        connection = sqlite3.connect(self.path, timeout=5, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False, cached_statements=512)
+        for pragma in PRAGMAS:
+            connection.execute(pragma)
+        register_functions(connection)
+        with self._schema_lock:
+            if not self._schema_ready:
+                connection.executescript(SCHEMA)
+                self._schema_ready = True
+        return connection
+
+    def thread_connection(self) -> SQLiteConnection:
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = SQLiteConnection(self._open())
+        return connection
+
+    def connect(self) -> SQLiteConnection:
+        """Check out this thread's connection; nested checkouts share its transaction."""
+        connection = self.thread_connection()
+        connection.depth += 1
+        return connection
+
+    def backup(self, target: str):
+        """Copy the database, consistently even while other threads write, to another file."""
+        with closing(sqlite3.connect(target)) as destination:
+            self.thread_connection()._connection.backup(destination)
+
+    def restore(self, source: str):
+        """Replace the database contents with a backup file."""
+        with closing(sqlite3.connect(source)) as origin:
+            origin.backup(self.thread_connection()._connection)
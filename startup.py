@@ -0,0 +1,118 @@
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+PROFILE_FLAG = '--profile-startup'
+
+class StartupProfiler:
+    def __init__(self):
+        """Initialize the profiler; time is measured from this point."""
+        self.started_at = time.perf_counter()
+        self.imports: List[Tuple[str, float, float]] = []
+        self.marks: List[Tuple[str, float]] = []
+        self._stack: List[float] = []
+        self._original_import = None
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Start timing import statements."""
+        self._original_import = builtins.__import__
+        original = self._original_import
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Only the main thread is timed so nested timings stay consistent
+            if level or name in sys.modules or threading.current_thread() is not threading.main_thread():
+                return original(name, globals, locals, fromlist, level)
+            start = time.perf_counter()
+            self._stack.append(0.0)
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                self.imports.append((name, elapsed - children, elapsed))
+
+        builtins.__import__ = timed_import
+
+    def uninstall(self):
+        """Stop timing imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def mark(self, label: str):
+        """Record a named point in time since startup."""
+        with self._lock:
+            self.marks.append((label, time.perf_counter() - self.started_at))
+
+    def report(self, limit: int = 20, stream=None):
+        """Print import times and startup marks."""
+        stream = stream or sys.stdout
+        print("=== Startup profile ===", file=stream)
+        print(f"{'self ms':>10} {'total ms':>10}  module", file=stream)
+        for name, self_time, total in sorted(self.imports, key=lambda i: i[2], reverse=True)[:limit]:
+            print(f"{self_time * 1000:10.1f} {total * 1000:10.1f}  {name}", file=stream)
+        print(f"imports timed: {len(self.imports)}, "
+              f"total {sum(i[1] for i in self.imports) * 1000:.1f} ms", file=stream)
+        with self._lock:
+            marks = sorted(self.marks, key=lambda m: m[1])
+        for label, at in marks:
+            print(f"{at * 1000:10.1f} ms  {label}", file=stream)
+        stream.flush()
+
+profiler: Optional[StartupProfiler] = None
+
+def begin(argv=None):
+    """Start the startup profiler when --profile-startup is on the command line."""
+    global profiler
+    argv = sys.argv if argv is None else argv
+    if PROFILE_FLAG in argv and profiler is None:
+        profiler = StartupProfiler()
+        profiler.install()
+    return profiler
+
+def mark(label: str):
+    """Record a startup mark if profiling is enabled."""
+    if profiler:
+        profiler.mark(label)
+
+def watch_first_frame(root):
+    """Report time-to-first-frame once the root window has been drawn."""
+    if not profiler:
+        return
+
+    def on_drawn():
+        profiler.mark("first frame")
+        profiler.uninstall()
+        profiler.report()
+
+    def on_map(event):
+        if event.widget is root:
+            root.unbind('<Map>', binding)
+            root.after_idle(on_drawn)
+
+    binding = root.bind('<Map>', on_map, add='+')
+
+def lazy_import(name: str):
+    """Register a module that is only executed on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # Make `import package.module` resolve to the lazy module
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
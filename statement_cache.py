@@ -0,0 +1,116 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional
+import mysql.connector
+
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+class Statement(NamedTuple):
+    name: str
+    sql: str
+
+# Every named statement of the application, by name
+REGISTRY: Dict[str, Statement] = {}
+_registry_lock = threading.Lock()
+
+enabled = True
+
+def register(name: str, sql: str) -> Statement:
+    """Declare a fixed statement under a unique name."""
+    with _registry_lock:
+        existing = REGISTRY.get(name)
+        if existing and existing.sql != sql:
+            raise ValueError(f"Statement {name!r} is already registered with different SQL")
+        REGISTRY[name] = Statement(name, sql)
+        return REGISTRY[name]
+
+class StatementResult:
+    def __init__(self, rows: List[tuple], rowcount: int, lastrowid: Optional[int]):
+        """Hold the rows of a statement, read in full so the connection is free for the next one."""
+        self.rows = rows
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+        self._position = 0
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def fetchone(self):
+        if self._position >= len(self.rows):
+            return None
+        self._position += 1
+        return self.rows[self._position - 1]
+
+    def fetchall(self):
+        rows = self.rows[self._position:]
+        self._position = len(self.rows)
+        return rows
+
+class StatementCache:
+    def __init__(self, connection):
+        """Initialize the prepared cursors of one server connection."""
+        self.connection = connection
+        self.connection_id = connection.connection_id
+        self.cursors = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cursor(self, statement: Statement):
+        """Return the prepared cursor for a statement, preparing it on first use or after a reconnect."""
+        if self.connection.connection_id != self.connection_id:
+            self.clear()
+        cursor = self.cursors.get(statement.name)
+        if cursor is None:
+            cursor = self.connection.cursor(prepared=True)
+            self.cursors[statement.name] = cursor
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cursor
+
+    def clear(self):
+        """Drop every prepared cursor, e.g. after the server closed the session."""
+        for cursor in self.cursors.values():
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass  # Statement already gone with the old session
+        self.cursors.clear()
+        self.connection_id = self.connection.connection_id
+
+def cache_for(connection) -> StatementCache:
+    """Return the statement cache attached to the real connection behind a pooled one."""
+    connection = getattr(connection, '_cnx', connection)
+    cache = getattr(connection, '_statement_cache', None)
+    if cache is None:
+        cache = StatementCache(connection)
+        connection._statement_cache = cache
+    return cache
+
+def execute(connection, statement: Statement, params=(), wrap=None) -> StatementResult:
+    """Execute a named statement on its prepared cursor, re-preparing it once if the server lost it."""
+    if not enabled:
+        cursor = connection.cursor()
+        if wrap:
+            cursor = wrap(cursor)
+        try:
+            return run(cursor, statement, params)
+        finally:
+            cursor.close()
+
+    cache = cache_for(connection)
+    for attempt in range(2):
+        cursor = cache.cursor(statement)
+        if wrap:
+            cursor = wrap(cursor)
+        try:
+            return run(cursor, statement, params)
+        except mysql.connector.Error as err:
+            cache.clear()
+            if attempt or err.errno != ER_UNKNOWN_STMT_HANDLER:
+                raise
+
+def run(cursor, statement: Statement, params) -> StatementResult:
+    """Execute a statement and read its whole result."""
+    cursor.execute(statement.sql, params)
+    rows = cursor.fetchall() if cursor.with_rows else []
+    return StatementResult(rows, cursor.rowcount, cursor.lastrowid)
@@ -0,0 +1,70 @@
+import sqlite3
+import unittest
+from unittest import mock
+import mysql.connector
+import database
+from async_db import translate_error
+from offline_store import is_connection_error
+from repositories import CUSTOMER_CHOICES
+
+class RecordingBackend:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def run_queries(self, queries, timeout=30):
+        self.calls.append(queries)
+        if self.error:
+            raise self.error
+        return [[(len(sql),)] for sql, params in queries]
+
+class AsyncRunQueriesTest(unittest.TestCase):
+    def setUp(self):
+        self.primary = RecordingBackend()
+        self.replica = RecordingBackend(mysql.connector.errors.OperationalError(msg="gone", errno=2013))
+        self.router = database.ReplicaRouter(None, "test_replica")
+        for target, attribute, value in [
+            (database, 'DB_BACKEND', "async"),
+            (database, '_async_available', True),
+            (database, '_async_backends', {(database.BRANCH, False): self.primary,
+                                           (database.BRANCH, True): self.replica}),
+            (database, 'replica_for', lambda branch: self.router),
+        ]:
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_statements_run_as_sql_on_the_branch_backend(self):
+        rows = database.run_queries([(CUSTOMER_CHOICES, ()), ("SELECT 1", ())])
+        self.assertEqual(self.primary.calls, [[(CUSTOMER_CHOICES.sql, ()), ("SELECT 1", ())]])
+        self.assertEqual(rows, [[(len(CUSTOMER_CHOICES.sql),)], [(len("SELECT 1"),)]])
+
+    def test_given_connection_is_used(self):
+        connection = sqlite3.connect(":memory:")
+        self.addCleanup(connection.close)
+        self.assertEqual(database.run_queries([("SELECT 1", ())], connection), [[(1,)]])
+        self.assertEqual(self.primary.calls, [])
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(self.router, 'use_replica', return_value=True):
+            database.run_queries([("SELECT 1", ())])
+        self.assertEqual(len(self.replica.calls), 1)
+        self.assertEqual(len(self.primary.calls), 1)
+        self.assertIsNone(self.router.lag)
+
+class TranslateErrorTest(unittest.TestCase):
+    def test_driver_error_keeps_its_class_and_errno(self):
+        OperationalError = type('OperationalError', (Exception,), {})
+        err = translate_error(OperationalError(2003, "Can't connect to MySQL server"))
+        self.assertIsInstance(err, mysql.connector.errors.OperationalError)
+        self.assertEqual(err.errno, 2003)
+        self.assertTrue(is_connection_error(err))
+
+    def test_unknown_error_becomes_a_database_error(self):
+        err = translate_error(type('InternalError', (Exception,), {})("lost"))
+        self.assertIsInstance(err, mysql.connector.errors.DatabaseError)
+        self.assertIsNone(err.errno)
+        self.assertFalse(is_connection_error(err))
+
+if __name__ == '__main__':
+    unittest.main()
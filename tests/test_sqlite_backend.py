@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+import mysql.connector
+import database
+from car_availability import car_availability
+from rental_settlement import rental_settlement
+from repositories import car_repository, customer_repository, rental_repository
+from sqlite_backend import ER_DUP_ENTRY, Translated, translate
+
+class TranslateTest(unittest.TestCase):
+    def test_placeholders(self):
+        self.assertEqual(translate("SELECT * FROM cars WHERE id = %s AND plate = %s"),
+                         (Translated("SELECT * FROM cars WHERE id = ? AND plate = ?"),))
+        self.assertEqual(translate("SELECT * FROM cars WHERE plate = %(plate)s")[0].sql,
+                         "SELECT * FROM cars WHERE plate = :plate")
+
+    def test_placeholders_inside_strings_are_kept(self):
+        self.assertEqual(translate("SELECT '%s', id FROM cars WHERE id = %s")[0].sql,
+                         "SELECT '%s', id FROM cars WHERE id = ?")
+
+    def test_interval(self):
+        self.assertEqual(translate("SELECT id FROM rentals WHERE return_date < CURDATE() - INTERVAL 3 DAY")[0].sql,
+                         "SELECT id FROM rentals WHERE return_date < DATE_ADD_INTERVAL(CURDATE(), -3, 'DAY')")
+        self.assertEqual(translate("SELECT rent_date + INTERVAL %s DAY FROM rentals")[0].sql,
+                         "SELECT DATE_ADD_INTERVAL(rent_date, ?, 'DAY') FROM rentals")
+
+    def test_nested_interval(self):
+        self.assertEqual(translate("SELECT LAST_DAY(CURDATE() - INTERVAL 1 MONTH) + INTERVAL 1 DAY")[0].sql,
+                         "SELECT DATE_ADD_INTERVAL(LAST_DAY(DATE_ADD_INTERVAL(CURDATE(), -1, 'MONTH')), 1, 'DAY')")
+
+    def test_insert_ignore(self):
+        self.assertEqual(translate("INSERT IGNORE INTO users (username) VALUES (%s)")[0].sql,
+                         "INSERT OR IGNORE INTO users (username) VALUES (?)")
+
+    def test_on_duplicate_key_update(self):
+        self.assertEqual(
+            translate("INSERT INTO t (a, b) VALUES (%s, %s) ON DUPLICATE KEY UPDATE b = VALUES(b)")[0].sql,
+            "INSERT INTO t (a, b) VALUES (?, ?) ON CONFLICT DO UPDATE SET b = excluded.b"
+        )
+
+    def test_add_column_if_not_exists(self):
+        self.assertEqual(
+            translate("ALTER TABLE rentals ADD COLUMN IF NOT EXISTS a INT NULL, ADD COLUMN IF NOT EXISTS b INT NULL"),
+            (Translated("ALTER TABLE rentals ADD COLUMN a INT NULL", True),
+             Translated("ALTER TABLE rentals ADD COLUMN b INT NULL", True))
+        )
+
+    def test_truncate(self):
+        self.assertEqual(translate("TRUNCATE TABLE cars"), (
+            Translated("DELETE FROM cars"),
+            Translated("DELETE FROM sqlite_sequence WHERE name = 'cars'")
+        ))
+
+    def test_create_table(self):
+        self.assertEqual(translate("""CREATE TABLE IF NOT EXISTS jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            n INT,
+            t TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_jobs_n (n)
+        ) DEFAULT CHARSET=utf8mb4"""), (
+            Translated("""CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            n INT,
+            t TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )"""),
+            Translated("CREATE INDEX IF NOT EXISTS idx_jobs_n ON jobs (n)")
+        ))
+
+class RepositorySmokeTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for target, name, value in (
+            (database, 'DB_BACKEND', "sqlite"),
+            (database, 'SQLITE_PATH', os.path.join(directory.name, "car_rental.sqlite3")),
+            (database, '_sqlite_backend', None),
+            (rental_settlement, '_schema_ready', False)
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: database.get_sqlite_backend().thread_connection()._connection.close())
+
+    def test_rent_and_return(self):
+        today = date.today()
+        with database.get_db_connection() as conn:
+            car_id = car_repository.add(conn, "Dacia", "Logan", "12345-A-6", "أبيض", 2022, 250)
+            customer_id = customer_repository.add(conn, "أحمد", "AB123", "0600000000", "a@example.com", "", "L1")
+            conn.commit()
+            self.assertEqual(car_repository.find_by_plate(conn, "12345-A-6"), car_id)
+            self.assertEqual(customer_repository.find_by_national_id(conn, "AB123"), customer_id)
+
+            rental_id = rental_repository.open_rental(conn, customer_id, car_id, today - timedelta(days=3),
+                                                      today - timedelta(days=1), 500)
+            conn.commit()
+            self.assertIsNotNone(rental_id)
+            # The car is out, so it cannot be rented twice
+            self.assertIsNone(rental_repository.open_rental(conn, customer_id, car_id, today, today, 250))
+            self.assertTrue(rental_repository.is_open(conn, rental_id))
+
+        # A late rental holds its car until it comes back
+        self.assertEqual(car_availability.load(car_id), frozenset([today]))
+        active = rental_repository.active()
+        self.assertEqual([rental.id for rental in active], [rental_id])
+
+        with database.get_db_connection() as conn:
+            settlement = rental_repository.close_rental(conn, rental_id, active[0].terms, today)
+            conn.commit()
+            self.assertFalse(rental_repository.is_open(conn, rental_id))
+            self.assertTrue(car_repository.is_available(conn, car_id))
+        self.assertEqual(settlement.extra_days, 1)
+        self.assertGreater(settlement.final_amount, 500)
+
+        totals, missing = rental_repository.dashboard_totals()
+        self.assertEqual(missing, [])
+        self.assertAlmostEqual(float(totals.revenue), settlement.final_amount)
+        self.assertEqual(totals.active_rentals, 0)
+        self.assertEqual(totals.available_cars, 1)
+        self.assertEqual(len(rental_repository.list_rentals('all', "")), 1)
+        # Returned today, the car can be rented again from today
+        self.assertEqual(car_availability.load(car_id), frozenset())
+
+    def test_duplicate_plate_is_a_mysql_integrity_error(self):
+        with database.get_db_connection() as conn:
+            car_repository.add(conn, "Dacia", "Logan", "12345-A-6", "أبيض", 2022, 250)
+            with self.assertRaises(mysql.connector.IntegrityError) as raised:
+                car_repository.add(conn, "Renault", "Clio", "12345-A-6", "أسود", 2021, 300)
+        self.assertEqual(raised.exception.errno, ER_DUP_ENTRY)
+
+    def test_close_survives_a_failed_rollback(self):
+        conn = database.get_db_connection()
+        conn.cursor().execute("INSERT INTO customers (name) VALUES (%s)", ("أحمد",))
+        raw = conn._connection._connection
+        with mock.patch.object(conn._connection, '_connection', mock.Mock(wraps=raw)) as broken:
+            broken.rollback.side_effect = sqlite3.OperationalError("disk I/O error")
+            conn.close()
+        raw.rollback()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import json
+import os
+import sys
+import threading
+import time
+import tkinter
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from revision import git_revision
+
+HEARTBEAT_INTERVAL = 100  # Milliseconds
+STALL_THRESHOLD = 0.2  # Seconds
+STALL_LOG = os.path.join("logs", "ui_stalls.log")
+REPORT_FLAG = '--ui-report'
+
+# Upper bounds in milliseconds of the heartbeat lag histogram
+LAG_BUCKETS = (16, 33, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+class Stall(NamedTuple):
+    at: datetime
+    handler: str
+    duration: float
+
+def handler_name(func) -> str:
+    """Describe a Tk callback as Class.method, looking through the wrapper used by after()."""
+    code = getattr(func, '__code__', None)
+    if code is not None and code.co_name == 'callit' and 'func' in code.co_freevars:
+        func = func.__closure__[code.co_freevars.index('func')].cell_contents
+    func = getattr(func, '__func__', func)
+    name = getattr(func, '__qualname__', None) or getattr(func, '__name__', None) or repr(func)
+    return name.replace('<locals>.', '')
+
+class UIMonitor:
+    def __init__(self, interval: int = HEARTBEAT_INTERVAL, stall_threshold: float = STALL_THRESHOLD,
+                 log_path: str = STALL_LOG):
+        """Initialize the event loop monitor with its heartbeat interval and stall threshold."""
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.log_path = log_path
+        self.lag_counts = [0] * len(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.stalls = deque(maxlen=500)
+        self._running: List[list] = []
+        self._root = None
+        self._after_id = None
+        self._expected = 0.0
+        self._installed = False
+        self._original_wrapper = tkinter.CallWrapper
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Time every Tk callback registered from now on."""
+        if self._installed:
+            return
+        monitor = self
+
+        class TimedCallWrapper(tkinter.CallWrapper):
+            def __call__(self, *args):
+                return monitor.run_handler(self, args)
+
+        tkinter.CallWrapper = TimedCallWrapper
+        self._installed = True
+
+    def uninstall(self):
+        """Stop wrapping newly registered callbacks."""
+        if self._installed:
+            tkinter.CallWrapper = self._original_wrapper
+            self._installed = False
+
+    def start(self, root: tkinter.Misc):
+        """Start the heartbeat on the given root."""
+        self.stop()
+        self._root = root
+        self._schedule()
+
+    def stop(self):
+        """Stop the heartbeat."""
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except tkinter.TclError:
+                pass  # Root already destroyed
+        self._after_id = None
+
+    def _schedule(self):
+        self._expected = time.perf_counter() + self.interval / 1000
+        self._after_id = self._root.after(self.interval, self._beat)
+
+    def _beat(self):
+        """Record how late the heartbeat ran and mark running handlers as not blocking."""
+        lag = max(time.perf_counter() - self._expected, 0.0)
+        lag_ms = lag * 1000
+        with self._lock:
+            for index, bound in enumerate(LAG_BUCKETS):
+                if lag_ms <= bound:
+                    self.lag_counts[index] += 1
+                    break
+            self.max_lag = max(self.max_lag, lag)
+
+        # A heartbeat inside a handler means it runs a nested loop, e.g. a message box
+        for running in self._running:
+            running[2] = True
+        self._schedule()
+
+    def run_handler(self, wrapper, args):
+        """Run a Tk callback and record it as a stall if it blocked the loop too long."""
+        running = [wrapper.func, time.perf_counter(), False]
+        self._running.append(running)
+        try:
+            return self._original_wrapper.__call__(wrapper, *args)
+        finally:
+            self._running.pop()
+            duration = time.perf_counter() - running[1]
+            if duration >= self.stall_threshold and not running[2]:
+                self.record_stall(handler_name(running[0]), duration)
+
+    def record_stall(self, handler: str, duration: float):
+        """Keep a stall in memory and append it to the local log."""
+        stall = Stall(datetime.now(), handler, duration)
+        with self._lock:
+            self.stalls.append(stall)
+        try:
+            directory = os.path.dirname(self.log_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f"{stall.at:%Y-%m-%d %H:%M:%S}\t{duration * 1000:.1f} ms\t{handler}\n")
+        except OSError:
+            pass  # Diagnostics must never break the UI
+
+    def histogram(self) -> List[Tuple[float, int]]:
+        """Return (upper bound in ms, count) pairs for the heartbeat lag."""
+        with self._lock:
+            return list(zip(LAG_BUCKETS, self.lag_counts))
+
+    def stalls_by_handler(self) -> List[Tuple[str, int, float, float]]:
+        """Return (handler, count, total seconds, max seconds) ordered by total stall time."""
+        totals: Dict[str, list] = {}
+        with self._lock:
+            stalls = list(self.stalls)
+        for stall in stalls:
+            entry = totals.setdefault(stall.handler, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += stall.duration
+            entry[2] = max(entry[2], stall.duration)
+        return sorted(((name, *entry) for name, entry in totals.items()), key=lambda s: s[2], reverse=True)
+
+    def reset(self):
+        """Forget recorded lag and stalls."""
+        with self._lock:
+            self.lag_counts = [0] * len(LAG_BUCKETS)
+            self.max_lag = 0.0
+            self.stalls.clear()
+
+    def export(self, path: Optional[str] = None) -> str:
+        """Write the lag histogram and stalls to a JSON file that can be compared between releases."""
+        revision = git_revision()
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = path or os.path.join("logs", f"ui_latency-{revision['commit'][:10] or 'nogit'}-{stamp}.json")
+        report = {
+            **revision,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'interval_ms': self.interval,
+            'stall_threshold_ms': self.stall_threshold * 1000,
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'histogram': [{'le_ms': None if bound == float('inf') else bound, 'count': count}
+                          for bound, count in self.histogram()],
+            'stalls': [{'handler': name, 'count': count, 'total_ms': round(total * 1000, 1),
+                        'max_ms': round(longest * 1000, 1)}
+                       for name, count, total, longest in self.stalls_by_handler()]
+        }
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+ui_monitor = UIMonitor()
+
+def begin(root: tkinter.Misc, argv=None):
+    """Start monitoring the event loop of the application root."""
+    ui_monitor.install()
+    ui_monitor.start(root)
+    argv = sys.argv if argv is None else argv
+    return REPORT_FLAG in argv
@@ -1,14 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import mysql.connector
+import database
+from app_shell import build_styles
+from repositories import rental_repository
 
 class ViewRentalsWindow:
     def __init__(self, root: tk.Tk):
         self.root = root
         self.setup_window()
-        self.create_styles()
+        build_styles()
         self.create_ui()
-        self.load_rentals()
+        # A window built hidden ahead of time loads its data through refresh when first shown
+        if self.root.state() != 'withdrawn':
+            self.load_rentals()
 
     def setup_window(self):
         self.root.title("عرض التأجيرات")
@@ -42,19 +46,6 @@ class ViewRentalsWindow:
         }
         self.root.configure(bg=self.colors['background'])
 
-    def create_styles(self):
-        style = ttk.Style()
-        style.theme_use('clam')
-        style.configure('Custom.TEntry', fieldbackground='white', foreground='black', borderwidth=1)
-        style.configure('Custom.Treeview', background='#F3F4F6', foreground='black', fieldbackground='#F3F4F6', borderwidth=1)
-        style.configure(
-            'Custom.Treeview.Heading',
-            background='#6B7280',
-            foreground='white',
-            font=('Segoe UI', 12, 'bold'),
-            relief='raised'
-        )
-
     def create_ui(self):
         self.create_top_bar()
         self.container = tk.Frame(self.root, bg=self.colors['background'])
@@ -136,64 +127,31 @@ class ViewRentalsWindow:
         for item in self.tree.get_children():
             self.tree.delete(item)
         try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            query = '''
-                SELECT r.id, CONCAT(car.brand, ' ', car.model, ' - ', car.plate) as car_info,
-                       c.name as customer, r.rent_date, r.return_date, r.status
-                FROM rentals r
-                JOIN customers c ON r.customer_id = c.id
-                JOIN cars car ON r.car_id = car.id
-                WHERE 1=1
-            '''
-            params = []
-            if self.current_filter == 'active':
-                query += " AND r.status = 'قيد التأجير'"
-            elif self.current_filter == 'completed':
-                query += " AND r.status = 'منتهية'"
-            elif self.current_filter == 'cancelled':
-                query += " AND r.status = 'ملغية'"
-            if search_text:
-                query += ''' AND (
-                    c.name LIKE %s OR 
-                    car.model LIKE %s OR 
-                    car.plate LIKE %s OR 
-                    car.brand LIKE %s OR
-                    CAST(r.id AS CHAR) LIKE %s
-                )'''
-                search_pattern = f"%{search_text}%"
-                params.extend([search_pattern] * 5)
-            query += " ORDER BY r.rent_date DESC"
-            cursor.execute(query, params)
-            rentals = cursor.fetchall()
+            with self.get_db_connection() as conn:
+                rentals = rental_repository.list_rentals(self.current_filter, search_text, conn)
             for rental in rentals:
                 self.tree.insert('', 'end', values=(
-                    rental['id'],
-                    rental['car_info'],
-                    rental['customer'],
-                    rental['rent_date'].strftime('%Y-%m-%d') if rental['rent_date'] else '',
-                    rental['return_date'].strftime('%Y-%m-%d') if rental['return_date'] else '',
-                    rental['status']
+                    rental.id,
+                    rental.car_info,
+                    rental.customer,
+                    rental.rent_date.strftime('%Y-%m-%d') if rental.rent_date else '',
+                    rental.return_date.strftime('%Y-%m-%d') if rental.return_date else '',
+                    rental.status
                 ))
         except Exception as e:
             self.show_error("خطأ", f"حدث خطأ أثناء البحث: {str(e)}")
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     def load_rentals(self):
         self.current_filter = 'all'
         self.filter_rentals()
 
+    def refresh(self):
+        self.search_entry.delete(0, 'end')
+        self.apply_filter('all')
+
     def get_db_connection(self):
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="car_rental"
-        )
+        # The rentals list only reads, so it may be served by the replica
+        return database.get_db_connection(read_only=True)
 
     def show_error(self, title, message):
         messagebox.showerror(title, message)